@@ -2,16 +2,34 @@ import os
 import io
 import re
 import json
+import time
+import random
+import sqlite3
+import hashlib
+import uuid
+import shutil
+import string
+import signal
+import sys
+import socket
+import bisect
 import zipfile
 import difflib
-import fitz  # PyMuPDF
-import docx
-import pandas as pd
-import google.generativeai as genai
-from flask import Flask, request, jsonify, render_template, send_file, make_response
+import tempfile
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from copy import deepcopy
+from collections import Counter, OrderedDict
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from flask import Flask, Response, g, request, jsonify, render_template, send_file, make_response
 from dotenv import load_dotenv
-from docx.enum.text import WD_COLOR_INDEX
-from docx.shared import Pt, Inches
+from werkzeug.utils import secure_filename
+# PyMuPDF, python-docx, pandas, dan google-generativeai diimpor di dalam fungsi yang
+# memakainya: request "/" atau perbandingan saja tidak perlu menunggu semuanya dimuat.
+# Untuk gunicorn --preload, warm_up() memuat semuanya sekali di proses master.
 
 # Muat environment variables (GOOGLE_API_KEY) dari file .env
 load_dotenv()
@@ -19,37 +37,1032 @@ load_dotenv()
 # --- Konfigurasi App & AI ---
 app = Flask(__name__)
 
-try:
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY tidak ditemukan di file .env")
-    
-    genai.configure(api_key=api_key)
-    # Ganti dengan model yang Anda inginkan
-    model = genai.GenerativeModel('gemini-2.5-pro') 
-except Exception as e:
-    print(f"Error saat mengkonfigurasi Google AI: {e}")
-    # Aplikasi akan tetap berjalan, tetapi endpoint AI akan gagal
-
-def _extract_text_with_pages(file_bytes, file_extension):
-    """Mengekstrak teks dari file PDF atau DOCX (versi backend)."""
-    pages_content = []
-    
-    if file_extension == 'pdf':
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+# Dibuat saat panggilan Gemini pertama (lihat _get_model); benchmark boleh mengisinya langsung
+model = None
+_model_lock = threading.Lock()
+
+def _get_model():
+    """Model Gemini proses ini; google-generativeai baru diimpor dan dikonfigurasi di sini."""
+    global model
+    with _model_lock:
+        if model is None:
+            import google.generativeai as genai
+
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY tidak ditemukan di file .env")
+            genai.configure(api_key=api_key)
+            # Ganti dengan model yang Anda inginkan (atau set GEMINI_MODEL di .env)
+            model = genai.GenerativeModel(MODEL_NAME)
+        return model
+
+# --- Instrumentasi: Durasi per Tahap & Metrik ---
+
+# Batas atas bucket histogram durasi (detik)
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+timing_log = logging.getLogger("proofread.timing")
+if not timing_log.handlers:
+    # Satu baris JSON per request/job/panggilan model. Set TIMING_LOG=0 untuk mematikan.
+    _timing_handler = logging.StreamHandler()
+    _timing_handler.setFormatter(logging.Formatter("%(message)s"))
+    timing_log.addHandler(_timing_handler)
+    timing_log.propagate = False
+timing_log.setLevel(logging.INFO if os.getenv("TIMING_LOG", "1") != "0" else logging.WARNING)
+
+def _log_timing(event, **fields):
+    if timing_log.isEnabledFor(logging.INFO):
+        timing_log.info(json.dumps(dict(event=event, waktu=round(time.time(), 3), **fields)))
+
+class Metrics:
+    """Counter, gauge, dan histogram dalam format teks Prometheus.
+
+    Angka disimpan per proses: setiap worker gunicorn melaporkan metriknya sendiri.
+    """
+
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._types = OrderedDict()
+        self._values = {}
+
+    def describe(self, name, metric_type, help_text):
+        self._types[name] = (metric_type, help_text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def add(self, name, delta, **labels):
+        """Menaikkan/menurunkan gauge."""
+        self.inc(name, delta, **labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items(), key=lambda item: item[0])
+            values = [(key, deepcopy(value)) for key, value in values]
+        lines = []
+        for name, (metric_type, help_text) in self._types.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (metric_name, labels), value in values:
+                if metric_name != name:
+                    continue
+                if metric_type != "histogram":
+                    lines.append(f"{name}{self._labels(labels)} {value}")
+                    continue
+                for bound, count in zip(self.buckets, value["buckets"]):
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {value['count']}")
+                lines.append(f"{name}_sum{self._labels(labels)} {value['sum']}")
+                lines.append(f"{name}_count{self._labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("http_request_duration_seconds", "histogram", "Durasi request per endpoint")
+metrics.describe("http_requests_total", "counter", "Jumlah request per endpoint dan status")
+metrics.describe("proofread_stage_duration_seconds", "histogram", "Durasi per tahap pemrosesan dan endpoint/job")
+metrics.describe("job_duration_seconds", "histogram", "Durasi job asinkron per jenis")
+metrics.describe("gemini_calls_in_flight", "gauge", "Panggilan Gemini yang sedang berjalan")
+metrics.describe("gemini_calls_total", "counter", "Percobaan panggilan Gemini per hasil")
+metrics.describe("gemini_call_failures_total", "counter", "Panggilan Gemini yang gagal per penyebab")
+metrics.describe("gemini_tokens_total", "counter", "Token prompt/respons menurut usage_metadata")
+metrics.add("gemini_calls_in_flight", 0)
+
+class StageTimings:
+    """Total durasi per tahap untuk satu request/job; diisi juga dari thread pekerja.
+
+    `endpoint` menjadi label histogram tahap: rute request, atau "job:<jenis>" untuk job asinkron.
+    """
+
+    def __init__(self, endpoint="none"):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages = OrderedDict()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total, count = self._stages.get(stage, (0.0, 0))
+            self._stages[stage] = (total + seconds, count + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {stage: {"detik": round(total, 4), "jumlah": count} for stage, (total, count) in self._stages.items()}
+
+    def server_timing(self):
+        """Nilai header Server-Timing; tahap paralel (mis. model) bisa lebih besar dari total."""
+        with self._lock:
+            entries = [f'{stage};dur={total * 1000:.1f};desc="{count}x"' for stage, (total, count) in self._stages.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_stage_timings = contextvars.ContextVar("stage_timings", default=None)
+_active_stages = contextvars.ContextVar("active_stages", default=frozenset())
+
+@contextmanager
+def _stage(name):
+    """Mengukur satu tahap (bisa juga dipakai sebagai decorator).
+
+    Tahap yang sama yang bersarang (mis. ekstraksi di dalam ekstraksi) hanya dihitung sekali.
+    """
+    active = _active_stages.get()
+    if name in active:
+        yield
+        return
+    token = _active_stages.set(active | {name})
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _active_stages.reset(token)
+        timings = _stage_timings.get()
+        metrics.observe("proofread_stage_duration_seconds", elapsed, stage=name,
+                        endpoint=timings.endpoint if timings is not None else "none")
+        if timings is not None:
+            timings.add(name, elapsed)
+
+# Batas panggilan Gemini yang berjalan bersamaan per proses, timeout per panggilan,
+# dan retry dengan backoff acak saat terkena rate limit
+GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "8"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "180"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+GEMINI_BACKOFF_BASE_SECONDS = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", "2"))
+GEMINI_BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "60"))
+_gemini_slots = threading.BoundedSemaphore(GEMINI_MAX_IN_FLIGHT)
+
+# Kuota bersama semua worker gunicorn (0 = tanpa batas) dan circuit breaker:
+# setelah sekian kegagalan berturut-turut, panggilan langsung ditolak selama beberapa detik
+GEMINI_LIMITER_DB = os.getenv("GEMINI_LIMITER_DB", os.path.join(tempfile.gettempdir(), "proofread_gemini_limiter.sqlite3"))
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_TOKENS_PER_MINUTE = float(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+GEMINI_CIRCUIT_FAILURES = int(os.getenv("GEMINI_CIRCUIT_FAILURES", "5"))
+GEMINI_CIRCUIT_OPEN_SECONDS = float(os.getenv("GEMINI_CIRCUIT_OPEN_SECONDS", "60"))
+
+class GeminiUnavailable(Exception):
+    """Panggilan ditolak tanpa menghubungi API karena circuit breaker sedang terbuka."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"API Gemini sedang tidak tersedia, coba lagi dalam {retry_after:.0f} detik")
+        self.retry_after = retry_after
+
+def _is_rate_limit_error(error):
+    """True untuk error 429 (kuota/rate limit) dan 503 (server sedang penuh)."""
+    code = getattr(error, "code", None)
+    if code in (429, 503):
+        return True
+    message = str(error).lower()
+    return "429" in message or "resource exhausted" in message or "rate limit" in message
+
+def _failure_reason(error):
+    if isinstance(error, GeminiUnavailable):
+        return "circuit_open"
+    if _is_rate_limit_error(error):
+        return "rate_limit"
+    if isinstance(error, TimeoutError) or "timeout" in str(error).lower() or "deadline" in str(error).lower():
+        return "timeout"
+    return "other"
+
+_RETRY_HINT_PATTERNS = (
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+)
+
+def _retry_hint(error):
+    """Jeda (detik) yang disarankan API lewat RetryInfo/pesan error/header Retry-After, atau None."""
+    for detail in getattr(error, "details", None) or ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None and getattr(delay, "seconds", None) is not None:
+            return float(delay.seconds) + getattr(delay, "nanos", 0) / 1e9
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("Retry-After"):
+            return float(headers["Retry-After"])
+    except (TypeError, ValueError):
+        pass
+    for pattern in _RETRY_HINT_PATTERNS:
+        match = pattern.search(str(error))
+        if match:
+            return float(match.group(1))
+    return None
+
+def _counts_toward_circuit(error):
+    """Rate limit ditangani jeda bersama; error 4xx lain adalah kesalahan permintaan, bukan API mati."""
+    if _is_rate_limit_error(error) and getattr(error, "code", None) != 503:
+        return False
+    code = getattr(error, "code", None)
+    return not (isinstance(code, int) and 400 <= code < 500)
+
+class GeminiLimiter:
+    """Token bucket permintaan/menit dan token/menit + circuit breaker, dibagi lewat SQLite.
+
+    Semua worker gunicorn yang memakai file `db_path` yang sama berbagi kuota, jeda
+    rate limit (termasuk petunjuk retry dari API), dan status circuit breaker.
+    """
+
+    def __init__(self, db_path, requests_per_minute=0, tokens_per_minute=0, failure_threshold=5, open_seconds=60):
+        self.db_path = db_path
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS limiter_state (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _state(self):
+        """Membaca lalu menulis ulang seluruh status dalam satu transaksi eksklusif."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            state = dict(conn.execute("SELECT name, value FROM limiter_state").fetchall())
+            before = dict(state)
+            yield state
+            changed = [(name, value) for name, value in state.items() if before.get(name) != value]
+            if changed:
+                conn.executemany("INSERT OR REPLACE INTO limiter_state (name, value) VALUES (?, ?)", changed)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state.get("refilled_at", now))
+        state["refilled_at"] = now
+        for name, per_minute in (("requests", self.requests_per_minute), ("tokens", self.tokens_per_minute)):
+            if per_minute > 0:
+                state[name] = min(per_minute, state.get(name, per_minute) + elapsed * per_minute / 60)
+
+    def acquire(self, tokens):
+        """Menunggu sampai kuota cukup untuk satu permintaan sebesar `tokens`.
+
+        Melempar GeminiUnavailable jika circuit breaker terbuka. Setelah jeda circuit
+        habis, hanya satu pemanggil yang diloloskan sebagai percobaan.
+        """
+        while True:
+            with self._state() as state:
+                now = time.time()
+                circuit_open = state.get("failures", 0) >= self.failure_threshold
+                if circuit_open and now < state.get("open_until", 0):
+                    raise GeminiUnavailable(state["open_until"] - now)
+                self._refill(state, now)
+                wait_seconds = state.get("paused_until", 0) - now
+                needed = min(tokens, self.tokens_per_minute)
+                if self.requests_per_minute > 0 and state["requests"] < 1:
+                    wait_seconds = max(wait_seconds, (1 - state["requests"]) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute > 0 and state["tokens"] < needed:
+                    wait_seconds = max(wait_seconds, (needed - state["tokens"]) * 60 / self.tokens_per_minute)
+                if wait_seconds <= 0:
+                    if circuit_open:
+                        # Percobaan setelah circuit terbuka; pemanggil lain tetap ditolak sampai ada hasil
+                        state["open_until"] = now + self.open_seconds
+                    if self.requests_per_minute > 0:
+                        state["requests"] -= 1
+                    if self.tokens_per_minute > 0:
+                        state["tokens"] -= needed
+                    return
+            time.sleep(min(wait_seconds, 5))
+
+    def charge(self, extra_tokens):
+        """Menyesuaikan kuota token dengan pemakaian sebenarnya (bisa negatif = dikembalikan)."""
+        if self.tokens_per_minute > 0 and extra_tokens:
+            with self._state() as state:
+                self._refill(state, time.time())
+                state["tokens"] = min(self.tokens_per_minute, state["tokens"] - extra_tokens)
+
+    def record_success(self):
+        with self._state() as state:
+            for name in ("failures", "rate_limited"):
+                if state.get(name):
+                    state[name] = 0
+
+    def record_failure(self, error):
+        """Mencatat satu percobaan gagal -> jeda (detik) sebelum percobaan berikutnya, atau None.
+
+        Tanpa petunjuk dari API, jeda rate limit tumbuh eksponensial menurut jumlah
+        rate limit berturut-turut di semua worker, dan berlaku untuk semua worker.
+        """
+        with self._state() as state:
+            now = time.time()
+            if _counts_toward_circuit(error):
+                state["failures"] = state.get("failures", 0) + 1
+                if state["failures"] >= self.failure_threshold:
+                    state["open_until"] = now + self.open_seconds
+            if not _is_rate_limit_error(error):
+                return None
+            state["rate_limited"] = state.get("rate_limited", 0) + 1
+            delay = _retry_hint(error)
+            if delay is None:
+                delay = min(GEMINI_BACKOFF_MAX_SECONDS,
+                            GEMINI_BACKOFF_BASE_SECONDS * (2 ** (state["rate_limited"] - 1)))
+                delay = random.uniform(delay / 2, delay)
+            state["paused_until"] = max(state.get("paused_until", 0), now + delay)
+            return state["paused_until"] - now
+
+    def stats(self):
+        with self._state() as state:
+            now = time.time()
+            self._refill(state, now)
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "requests_available": round(state.get("requests", self.requests_per_minute), 2),
+                "tokens_available": round(state.get("tokens", self.tokens_per_minute)),
+                "paused_seconds": round(max(0.0, state.get("paused_until", 0) - now), 2),
+                "consecutive_failures": int(state.get("failures", 0)),
+                "circuit_open": state.get("failures", 0) >= self.failure_threshold
+                                and now < state.get("open_until", 0),
+            }
+
+
+gemini_limiter = GeminiLimiter(
+    GEMINI_LIMITER_DB,
+    requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+    failure_threshold=GEMINI_CIRCUIT_FAILURES,
+    open_seconds=GEMINI_CIRCUIT_OPEN_SECONDS,
+)
+
+_system_models = {}
+_system_models_lock = threading.Lock()
+
+def _model_for(system_instruction):
+    """Model dengan instruksi sistem terpasang, dibuat sekali per instruksi.
+
+    Blok aturan statis dikirim sebagai system instruction, bukan disalin ke setiap prompt halaman.
+    """
+    base = _get_model()
+    if not system_instruction:
+        return base
+    key = (id(base), system_instruction)
+    with _system_models_lock:
+        cached = _system_models.get(key)
+        if cached is None:
+            if hasattr(base, "with_system_instruction"):
+                cached = base.with_system_instruction(system_instruction)
+            else:
+                cached = type(base)(base.model_name, system_instruction=system_instruction)
+            _system_models[key] = cached
+        return cached
+
+def _call_model(prompt, attempt, system_instruction=None, **kwargs):
+    """Satu percobaan panggilan Gemini beserta metrik, token, dan log terstruktur."""
+    # Sebelum antre kuota: panggilan pertama di proses ini mengimpor dan mengonfigurasi genai
+    target = _model_for(system_instruction)
+    estimated_tokens = _estimate_tokens(prompt) + (_estimate_tokens(system_instruction) if system_instruction else 0)
+    with _stage("model_antre"):
+        try:
+            gemini_limiter.acquire(estimated_tokens)
+        except GeminiUnavailable:
+            metrics.inc("gemini_call_failures_total", reason="circuit_open")
+            raise
+        _gemini_slots.acquire()
+    metrics.add("gemini_calls_in_flight", 1)
+    started = time.perf_counter()
+    try:
+        with _stage("model"):
+            response = target.generate_content(
+                prompt, request_options={"timeout": GEMINI_TIMEOUT_SECONDS}, **kwargs)
+    except Exception as e:
+        reason = _failure_reason(e)
+        metrics.inc("gemini_calls_total", outcome="error")
+        metrics.inc("gemini_call_failures_total", reason=reason)
+        _log_timing("model_call", status="error", penyebab=reason, percobaan=attempt + 1,
+                    detik=round(time.perf_counter() - started, 4), karakter_prompt=len(prompt))
+        raise
+    finally:
+        metrics.add("gemini_calls_in_flight", -1)
+        _gemini_slots.release()
+
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    response_tokens = getattr(usage, "candidates_token_count", None)
+    gemini_limiter.record_success()
+    if prompt_tokens is not None:
+        gemini_limiter.charge(prompt_tokens + (response_tokens or 0) - estimated_tokens)
+    metrics.inc("gemini_calls_total", outcome="ok")
+    if prompt_tokens:
+        metrics.inc("gemini_tokens_total", prompt_tokens, type="prompt")
+    if response_tokens:
+        metrics.inc("gemini_tokens_total", response_tokens, type="response")
+    _log_timing("model_call", status="ok", percobaan=attempt + 1, detik=round(time.perf_counter() - started, 4),
+                token_prompt=prompt_tokens, token_respons=response_tokens)
+    return response
+
+def _generate_content(prompt, **kwargs):
+    """Memanggil Gemini lewat limiter bersama; retry dengan jeda dari API/backoff saat rate limit."""
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        try:
+            return _call_model(prompt, attempt, **kwargs)
+        except GeminiUnavailable:
+            raise
+        except Exception as e:
+            delay = gemini_limiter.record_failure(e)
+            if attempt >= GEMINI_MAX_RETRIES or delay is None:
+                raise
+            # Jedanya tercatat di limiter: percobaan berikutnya (dan worker lain) menunggu di acquire()
+
+def _iter_concurrently(func, items):
+    """Menjalankan func untuk setiap item secara paralel dan menghasilkan (indeks, hasil)
+    begitu masing-masing item selesai (tidak menunggu urutan)."""
+    items = list(items)
+    if len(items) <= 1:
+        for index, item in enumerate(items):
+            yield index, func(item)
+        return
+    pool = ThreadPoolExecutor(max_workers=min(len(items), GEMINI_MAX_IN_FLIGHT))
+    try:
+        # Setiap item membawa salinan context (timing per request) ke thread pekerja
+        futures = {pool.submit(contextvars.copy_context().run, func, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # Jika pemanggil berhenti di tengah jalan (mis. klien memutus stream), batalkan sisa item
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _map_concurrently(func, items, on_progress=None):
+    """Menjalankan func untuk setiap item secara paralel; urutan hasil sama dengan urutan item.
+
+    `on_progress(selesai, total)` dipanggil setiap kali satu item selesai.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    for done, (index, result) in enumerate(_iter_concurrently(func, items), start=1):
+        results[index] = result
+        if on_progress:
+            on_progress(done, len(items))
+    return results
+
+# --- Cache Hasil Analisis ---
+
+class ResultCache:
+    """Cache hasil AI berdasarkan hash isi file (LRU + TTL), opsional disimpan di SQLite.
+
+    Tanpa `db_path` cache hanya hidup di memori satu proses. Dengan `db_path`,
+    semua worker gunicorn berbagi file SQLite yang sama sehingga hasil dari satu
+    worker bisa dipakai worker lain.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=24 * 3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS result_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS result_cache_stats ("
+                    "name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+                )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _count(self, name):
+        setattr(self, name, getattr(self, name) + 1)
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO result_cache_stats (name, value) VALUES (?, 1) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+                    (name,)
+                )
+
+    def _remember(self, key, value, expires_at):
+        """Simpan ke memori lalu buang entri paling lama tidak dipakai bila penuh."""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            if not self.db_path:
+                self.evictions += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    if self.db_path:
+                        # Jaga urutan LRU di SQLite tetap sama dengan yang dipakai worker ini
+                        with self._connect() as conn:
+                            conn.execute("UPDATE result_cache SET last_access = ? WHERE key = ?", (now, key))
+                    self._count("hits")
+                    return entry[1]
+                del self._entries[key]
+
+            if self.db_path:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT value, expires_at FROM result_cache WHERE key = ? AND expires_at > ?",
+                        (key, now)
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute("UPDATE result_cache SET last_access = ? WHERE key = ?", (now, key))
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self._count("hits")
+                    return value
+
+            self._count("misses")
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            if self.db_path:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO result_cache (key, value, expires_at, last_access) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, json.dumps(value), expires_at, now)
+                    )
+                    conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (now,))
+                    trimmed = conn.execute(
+                        "DELETE FROM result_cache WHERE key NOT IN ("
+                        "SELECT key FROM result_cache ORDER BY last_access DESC LIMIT ?)",
+                        (self.max_entries,)
+                    ).rowcount
+                    self.evictions += trimmed
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "backend": "sqlite" if self.db_path else "memory",
+            }
+            if self.db_path:
+                # Angka gabungan dari semua worker yang memakai file SQLite yang sama
+                with self._connect() as conn:
+                    stats["shared"] = dict(conn.execute("SELECT name, value FROM result_cache_stats").fetchall())
+                    stats["shared"]["entries"] = conn.execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+            return stats
+
+
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(24 * 3600))),
+    db_path=os.getenv("RESULT_CACHE_DB") or None,
+)
+
+# Naikkan jika bentuk hasil yang disimpan berubah (mis. kolom baru), terlepas dari prompt
+RESULT_FORMAT_VERSION = "2"
+
+def _cache_key(kind, source):
+    """Kunci cache: jenis analisis + versi analisis (model, prompt, aturan) + hash isi file."""
+    digest = _source_digest(source)
+    return f"{kind}:{_analysis_version(kind)}:f{RESULT_FORMAT_VERSION}:{digest}"
+
+def _cached(kind, source, compute, is_cacheable=lambda result: True):
+    """Ambil hasil dari cache, atau hitung lalu simpan jika hasilnya layak disimpan."""
+    key = _cache_key(kind, source)
+    result = result_cache.get(key)
+    if result is not None:
+        return result
+    result = compute()
+    if is_cacheable(result):
+        result_cache.set(key, result)
+    return result
+
+# --- Penyimpanan Temuan per Unit (Proofread Inkremental) ---
+
+FINDINGS_DB_PATH = os.getenv("FINDINGS_DB_PATH", os.path.join(tempfile.gettempdir(), "proofread_findings.sqlite3"))
+FINDINGS_RETENTION_SECONDS = int(os.getenv("FINDINGS_RETENTION_SECONDS", str(90 * 24 * 3600)))
+# Paragraf DOCX yang berubah dikirim berkelompok sampai kira-kira sebanyak ini token per panggilan
+PROOFREAD_GROUP_TOKENS = int(os.getenv("PROOFREAD_GROUP_TOKENS", "3000"))
+# Mode batch: beberapa halaman per panggilan dengan keluaran JSON per id halaman.
+# Set PROOFREAD_BATCH_MODE=0 untuk kembali ke satu panggilan per halaman/kelompok.
+PROOFREAD_BATCH_MODE = os.getenv("PROOFREAD_BATCH_MODE", "1") != "0"
+PROOFREAD_BATCH_TOKENS = int(os.getenv("PROOFREAD_BATCH_TOKENS", "8000"))
+
+class FindingStore:
+    """Temuan proofread per unit teks (halaman PDF / paragraf DOCX), dikunci dengan sidik jari isinya.
+
+    Saat dokumen yang sama diunggah lagi setelah sedikit revisi, hanya unit yang
+    berubah yang perlu dikirim ke model.
+    """
+
+    def __init__(self, db_path, retention_seconds=90 * 24 * 3600):
+        self.db_path = db_path
+        self.retention_seconds = retention_seconds
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS unit_findings ("
+                "fingerprint TEXT NOT NULL, version TEXT NOT NULL, findings TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, PRIMARY KEY (fingerprint, version))"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get_many(self, fingerprints, version):
+        fingerprints = list(fingerprints)
+        found = {}
+        with self._connect() as conn:
+            # Dipecah per 500 agar tidak melewati batas parameter SQLite
+            for start in range(0, len(fingerprints), 500):
+                batch = fingerprints[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT fingerprint, findings FROM unit_findings WHERE version = ? "
+                    f"AND fingerprint IN ({','.join('?' * len(batch))})",
+                    [version] + batch
+                ).fetchall()
+                found.update((fingerprint, json.loads(findings)) for fingerprint, findings in rows)
+        return found
+
+    def put_many(self, findings_by_fingerprint, version):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO unit_findings (fingerprint, version, findings, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(fingerprint, version, json.dumps(findings), now)
+                 for fingerprint, findings in findings_by_fingerprint.items()]
+            )
+            conn.execute("DELETE FROM unit_findings WHERE updated_at < ?", (now - self.retention_seconds,))
+
+
+finding_store = FindingStore(FINDINGS_DB_PATH, FINDINGS_RETENTION_SECONDS)
+
+# --- Aturan Lokal (Pra-filter sebelum Model) ---
+
+PROOFREAD_RULES_FILE = os.getenv(
+    "PROOFREAD_RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "proofread_rules.json")
+)
+_ROMAN_NUMERAL = re.compile(r"^[IVXLCDM]+$")
+# Naikkan jika cara aturan lokal memutuskan unit tanpa model berubah (temuan tersimpan jadi usang)
+LOCAL_RULES_VERSION = "2"
+
+def _sentence_around(text, start, end):
+    """Kalimat lengkap tempat teks[start:end] berada (dibatasi . ! ? atau baris baru)."""
+    left = max(text.rfind(mark, 0, start) for mark in ".!?\n") + 1
+    right_marks = [pos for pos in (text.find(mark, end) for mark in ".!?\n") if pos != -1]
+    right = min(right_marks) if right_marks else len(text)
+    if right < len(text) and text[right] in ".!?":
+        right += 1
+    return text[left:right].strip()
+
+class LocalRules:
+    """Aturan proofread yang murni leksikal, dicek lokal tanpa memanggil model.
+
+    Aturan dibaca sekali dari file JSON (PROOFREAD_RULES_FILE) dan dikompilasi:
+    - `penggantian`: pola regex -> perbaikan, menghasilkan temuan dengan format yang sama seperti model;
+    - `istilah_dilindungi`, `kata_diizinkan`, `nama_staf`: tidak boleh dilaporkan sebagai salah,
+      dan tidak dihitung saat menilai apakah sebuah unit perlu dikirim ke model. Istilah dan nama
+      dicocokkan sebagai frasa utuh: "Hari" dari "Hari Sundoro" tetap kata biasa di "hari kerja";
+    - `min_kata_untuk_model` (bawaan 1): unit dengan kata "biasa" lebih sedikit dari ini tidak dikirim
+      ke model. Unit DOCX bisa berupa satu paragraf/sel tabel pendek, jadi nilai di atas 1 membuat
+      typo di kalimat pendek tidak pernah diperiksa.
+    """
+
+    def __init__(self, rules, version=""):
+        self.version = version
+        self.replacements = [
+            (re.compile(rule["pola"], re.IGNORECASE if rule.get("abaikan_kapital") else 0), rule["benar"])
+            for rule in rules.get("penggantian", [])
+        ]
+        self.protected_terms = set(rules.get("istilah_dilindungi", []))
+        self.allowed_words = {word.lower() for word in rules.get("kata_diizinkan", [])}
+        self.staff_names = set(rules.get("nama_staf", []))
+        self.min_words_for_model = int(rules.get("min_kata_untuk_model", 1))
+        # Istilah/nama utuh yang dihapus dari teks sebelum kata biasanya dihitung (frasa terpanjang dulu)
+        phrases = sorted((phrase for phrase in self.protected_terms | self.staff_names if phrase.split()),
+                         key=len, reverse=True)
+        self._known_phrases = re.compile(
+            "|".join(r"(?<!\w)" + r"\s+".join(map(re.escape, phrase.split())) + r"(?!\w)" for phrase in phrases)
+        ) if phrases else None
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except OSError as e:
+            print(f"File aturan proofread tidak dapat dibaca ({path}): {e}")
+            return cls({})
+        return cls(json.loads(raw), f"{LOCAL_RULES_VERSION}-{hashlib.sha256(raw).hexdigest()[:12]}")
+
+    def _count(self, **amounts):
+        with self._lock:
+            self.counters.update(amounts)
+
+    def check(self, text):
+        """Temuan dari aturan penggantian, format {"salah", "benar", "kalimat"}."""
+        findings = []
+        for pattern, benar in self.replacements:
+            for match in pattern.finditer(text or ""):
+                group = "salah" if "salah" in pattern.groupindex else 0
+                start, end = match.span(group)
+                findings.append({
+                    "salah": match.group(group),
+                    "benar": benar,
+                    "kalimat": _sentence_around(text, start, end),
+                })
+        self._count(temuan_lokal=len(findings))
+        return findings
+
+    def needs_model(self, text):
+        """False jika unit tidak berisi kata biasa (hanya angka, akronim, nama, dll.)."""
+        text = text or ""
+        if self._known_phrases:
+            text = self._known_phrases.sub(" ", text)
+        ordinary_words = [
+            word for word in re.findall(r"[^\W\d_]+", text)
+            if len(word) > 1 and word.lower() not in self.allowed_words and not _ROMAN_NUMERAL.match(word)
+        ]
+        needed = len(ordinary_words) >= self.min_words_for_model
+        self._count(unit_diperiksa=1, unit_tanpa_model=0 if needed else 1)
+        return needed
+
+    def is_allowed(self, salah):
+        salah = (salah or "").strip()
+        return (salah in self.protected_terms or salah in self.staff_names
+                or salah.lower() in self.allowed_words)
+
+    def merge(self, local_findings, model_findings):
+        """Temuan lokal + temuan model yang tidak melanggar aturan dan belum ada di temuan lokal."""
+        merged = list(local_findings)
+        seen = {(f["salah"].lower(), f["benar"].lower()) for f in local_findings}
+        suppressed = 0
+        for finding in model_findings:
+            key = (finding["salah"].lower(), finding["benar"].lower())
+            if finding["salah"] != "ERROR" and (self.is_allowed(finding["salah"]) or key[0] == key[1]):
+                suppressed += 1
+                continue
+            if key not in seen:
+                seen.add(key)
+                merged.append(finding)
+        self._count(temuan_model_disaring=suppressed)
+        return merged
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        checked = counters.get("unit_diperiksa", 0)
+        counters["rasio_unit_tanpa_model"] = round(counters.get("unit_tanpa_model", 0) / checked, 4) if checked else 0.0
+        counters["versi_aturan"] = self.version
+        return counters
+
+
+local_rules = LocalRules.load(PROOFREAD_RULES_FILE)
+
+# Template prompt yang menentukan hasil setiap jenis analisis
+ANALYSIS_PROMPTS = {
+    "proofread": ("proofread", "proofread_batch"),
+    "coherence": ("coherence",),
+    "restructure": ("restructure",),
+}
+
+def _analysis_version(kind):
+    """Versi analisis untuk kunci cache: model + hash template prompt (+ versi aturan lokal untuk proofread).
+
+    Mengubah file di PROMPTS_DIR otomatis membuat kunci baru, jadi cache lama tidak dipakai lagi.
+    """
+    version = f"{MODEL_NAME}:p{prompts.version(*ANALYSIS_PROMPTS[kind])}"
+    if kind == "proofread":
+        version += f":r{local_rules.version}"
+    return version
+
+def _normalize_text(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+def _fingerprint(text):
+    """Sidik jari isi unit; perbedaan spasi/baris baru saja tidak dianggap perubahan."""
+    return hashlib.sha256(_normalize_text(text).encode("utf-8")).hexdigest()
+
+# --- Sumber File: bytes atau Path File Sementara ---
+
+# Unggahan disalin ke disk per potongan sebesar ini, tidak pernah dimuat utuh ke memori
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Ekstensi yang diterima: dokumen biasa, dan zip khusus untuk job batch
+UPLOAD_EXTENSIONS = ("pdf", "docx")
+BATCH_UPLOAD_EXTENSIONS = ("zip",)
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+def _open_docx(source):
+    """Membuka DOCX dari path (dibaca langsung dari disk) atau dari bytes."""
+    import docx
+
+    return docx.Document(source if _is_path(source) else io.BytesIO(source))
+
+def _open_pdf(source):
+    """Membuka PDF dari path (halaman dimuat saat dibutuhkan) atau dari bytes."""
+    import fitz  # PyMuPDF
+
+    if _is_path(source):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+def _source_digest(source):
+    """SHA-256 isi file; path di-hash per potongan."""
+    if not _is_path(source):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Ekstraksi PDF besar dibagi per rentang halaman ke beberapa proses; hasilnya di-cache
+# per hash file (teks saja, atau teks + tata letak baris untuk deteksi judul)
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "100"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+# Naikkan jika bentuk hasil ekstraksi halaman berubah
+PDF_EXTRACT_VERSION = "1"
+_PDF_BOLD_FLAG = 16
+
+page_cache = ResultCache(
+    max_entries=int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "32")),
+    ttl_seconds=int(os.getenv("PAGE_CACHE_TTL_SECONDS", str(3600))),
+)
+_pdf_pool = None
+_pdf_pool_warmup = []
+_pdf_pool_lock = threading.Lock()
+
+def _pdf_page_content(page, page_num, layout):
+    content = {"halaman": page_num + 1, "teks": page.get_text()}
+    if layout:
+        # Per baris: (ukuran font terbesar, seluruh baris tebal, teks)
+        lines = []
+        for block in page.get_text("dict")["blocks"]:
+            for line in block.get("lines", []):
+                spans = [span for span in line["spans"] if span["text"].strip()]
+                if spans:
+                    lines.append((
+                        round(max(span["size"] for span in spans), 1),
+                        all(span["flags"] & _PDF_BOLD_FLAG for span in spans),
+                        "".join(span["text"] for span in spans).strip(),
+                    ))
+        content["baris"] = lines
+    return content
+
+def _extract_pdf_page_range(path, start, stop, layout):
+    """Dijalankan di proses pool: halaman [start, stop) dari PDF di disk."""
+    pdf_document = _open_pdf(path)
+    try:
+        return [_pdf_page_content(pdf_document[page_num], page_num, layout) for page_num in range(start, stop)]
+    finally:
+        pdf_document.close()
+
+def _ready_pdf_pool():
+    """Pool ekstraksi PDF jika semua prosesnya sudah siap, selain itu None.
+
+    Proses "spawn" butuh beberapa detik untuk mengimpor app, lebih lama dari ekstraksi
+    serial dokumen biasa. Panggilan pertama hanya memanaskan pool di latar belakang.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # "spawn": proses anak tidak mewarisi thread/lock dari worker web yang sedang berjalan
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_PROCESSES,
+                                            mp_context=multiprocessing.get_context("spawn"))
+            _pdf_pool_warmup.extend(_pdf_pool.submit(os.getpid) for _ in range(PDF_EXTRACT_PROCESSES))
+        if all(future.done() for future in _pdf_pool_warmup):
+            return _pdf_pool
+        return None
+
+def _iter_pdf_page_ranges(source, page_count, layout):
+    """Halaman PDF berurutan; rentang halaman dikerjakan paralel bila dokumennya cukup besar."""
+    pool = None
+    if (_is_path(source) and PDF_EXTRACT_PROCESSES > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+            # Proses anak (mis. pool mode batch) tidak membuat pool sendiri
+            and multiprocessing.parent_process() is None):
+        pool = _ready_pdf_pool()
+    if pool is None:
+        pdf_document = _open_pdf(source)
         try:
-            pdf_document = fitz.open(stream=file_bytes, filetype="pdf")
             for page_num, page in enumerate(pdf_document):
-                pages_content.append({"halaman": page_num + 1, "teks": page.get_text()})
+                yield _pdf_page_content(page, page_num, layout)
+        finally:
             pdf_document.close()
+        return
+
+    futures = [pool.submit(_extract_pdf_page_range, os.fspath(source), start,
+                           min(start + PDF_PAGES_PER_TASK, page_count), layout)
+               for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+def iter_pdf_pages(source, layout=False):
+    """Menghasilkan {"halaman", "teks"[, "baris"]} per halaman PDF secara berurutan.
+
+    Halaman pertama bisa diproses sebelum halaman terakhir selesai diekstrak. Hasil
+    lengkap disimpan di `page_cache` berdasarkan hash file; ekstraksi dengan `layout`
+    juga dipakai untuk permintaan teks saja.
+    """
+    digest = _source_digest(source)
+    key = f"pdf:{PDF_EXTRACT_VERSION}:{'layout' if layout else 'teks'}:{digest}"
+    keys = [key] if layout else [key, f"pdf:{PDF_EXTRACT_VERSION}:layout:{digest}"]
+    for cache_key in keys:
+        cached_pages = page_cache.get(cache_key)
+        if cached_pages is not None:
+            yield from cached_pages
+            return
+
+    pages = []
+    for page in _iter_pdf_page_ranges(source, _pdf_page_count(source), layout):
+        pages.append(page)
+        yield page
+    page_cache.set(key, pages)
+
+def _pdf_page_count(source):
+    pdf_document = _open_pdf(source)
+    try:
+        return pdf_document.page_count
+    finally:
+        pdf_document.close()
+
+def _iter_pdf_text_pages(source):
+    """{"halaman", "teks"} per halaman PDF selama ekstraksi berjalan; waktu ekstraksi dicatat per halaman."""
+    pages = iter_pdf_pages(source)
+    while True:
+        try:
+            with _stage("ekstraksi"):
+                page = next(pages, None)
         except Exception as e:
-            raise ValueError(f"Gagal membaca file PDF: {e}")
+            raise ValueError(f"Gagal membaca file PDF: {e}") from e
+        if page is None:
+            return
+        yield {"halaman": page["halaman"], "teks": page["teks"]}
+
+@_stage("ekstraksi")
+def _extract_text_with_pages(source, file_extension):
+    """Mengekstrak teks dari file PDF atau DOCX (versi backend)."""
+    pages_content = []
+    
+    if file_extension == 'pdf':
+        pages_content = list(_iter_pdf_text_pages(source))
             
     elif file_extension == 'docx':
         try:
-            doc = docx.Document(io.BytesIO(file_bytes))
-            full_text = "\n".join([para.text for para in doc.paragraphs])
-            # Untuk docx, kita anggap sebagai 1 halaman besar
-            pages_content.append({"halaman": 1, "teks": full_text})
+            doc = _open_docx(source)
+            # DOCX dibagi per halaman/section/heading (lihat _docx_units), bukan satu halaman besar
+            for unit in _docx_units(doc):
+                pages_content.append({"halaman": unit["halaman"], "teks": unit["teks"], "lokasi": unit["lokasi"]})
         except Exception as e:
             raise ValueError(f"Gagal membaca file DOCX: {e}")
     else:
@@ -57,233 +1070,2039 @@ def _extract_text_with_pages(file_bytes, file_extension):
         
     return pages_content
 
-def _get_text_from_flask_file(file):
-    """Utility untuk membaca file dari request Flask."""
-    file_bytes = file.read()
-    file_extension = file.filename.split('.')[-1].lower()
-    return _extract_text_with_pages(file_bytes, file_extension)
+@_stage("ekstraksi")
+def _proofread_units(source, file_extension):
+    """Unit pemeriksaan proofread: satu per halaman PDF, satu per paragraf DOCX.
+
+    Paragraf DOCX membawa nomor bagian (`bagian`) dari _docx_units sehingga satu
+    panggilan model tidak melewati batas halaman/section/heading.
+    """
+    return list(_proofread_unit_source(source, file_extension)[0])
+
+@_stage("ekstraksi")
+def _proofread_unit_source(source, file_extension):
+    """(unit, jumlah_unit) untuk proofread.
+
+    Unit PDF berupa iterator: halaman pertama sudah bisa dikirim ke model selagi
+    halaman berikutnya masih diekstrak. Halaman kosong tetap menjadi unit (tanpa
+    temuan) agar jumlahnya sama dengan jumlah halaman untuk progres. DOCX selalu
+    dibaca utuh oleh python-docx, jadi unitnya langsung berupa list.
+    """
+    if file_extension == 'pdf':
+        try:
+            page_count = _pdf_page_count(source)
+        except Exception as e:
+            raise ValueError(f"Gagal membaca file PDF: {e}") from e
+        return _iter_pdf_text_pages(source), page_count
+    if file_extension == 'docx':
+        try:
+            doc = _open_docx(source)
+            units = []
+            for block_index, block in enumerate(_docx_units(doc)):
+                for paragraph_index, text in block["paragraf"]:
+                    units.append({
+                        "halaman": block["halaman"],
+                        "teks": text,
+                        "bagian": block_index,
+                        "lokasi": dict(block["lokasi"], paragraf=paragraph_index),
+                    })
+            return units, len(units)
+        except Exception as e:
+            raise ValueError(f"Gagal membaca file DOCX: {e}")
+    raise ValueError("Format file tidak didukung. Harap unggah .pdf atau .docx")
+
+def _upload_extension(filename, allowed):
+    """Ekstensi nama file unggahan (huruf kecil) jika termasuk `allowed`, selain itu None."""
+    name, dot, extension = (filename or "").rpartition(".")
+    extension = extension.lower()
+    return extension if dot and name and extension in allowed else None
+
+def _read_flask_file(file):
+    """Menyalin unggahan Flask ke file sementara -> (path, ekstensi).
+
+    Salinan dibuat per potongan sehingga file besar tidak pernah dimuat utuh ke
+    memori, dan dihapus otomatis saat request selesai. Nama file dari klien hanya
+    dipakai untuk ekstensi, dan itu pun harus salah satu ekstensi yang didukung.
+    """
+    file_extension = _upload_extension(file.filename, UPLOAD_EXTENSIONS + BATCH_UPLOAD_EXTENSIONS)
+    if file_extension is None:
+        raise ValueError("Format file tidak didukung. Harap unggah .pdf atau .docx")
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=f".{file_extension}", dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(file.stream, f, UPLOAD_CHUNK_BYTES)
+    except Exception:
+        os.remove(path)
+        raise
+    g.setdefault("spooled_uploads", []).append(path)
+    return path, file_extension
+
+
+# --- Pemotongan Dokumen untuk Analisis Koherensi & Restrukturisasi ---
+
+# Perkiraan kasar: satu token Gemini ~ 4 karakter teks Indonesia
+CHARS_PER_TOKEN = 4
+ANALYSIS_CHUNK_TOKENS = int(os.getenv("ANALYSIS_CHUNK_TOKENS", "12000"))
+ANALYSIS_CHUNK_OVERLAP_TOKENS = int(os.getenv("ANALYSIS_CHUNK_OVERLAP_TOKENS", "400"))
+# Batas ukuran satu unit DOCX (lihat _docx_units) bila tidak ada page break/heading
+DOCX_UNIT_MAX_TOKENS = int(os.getenv("DOCX_UNIT_MAX_TOKENS", "1500"))
+# Baris PDF dianggap judul bila fontnya minimal 15% lebih besar dari font badan teks
+PDF_HEADING_SIZE_RATIO = 1.15
+HEADING_MAX_CHARS = 150
+
+def _estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+def _heading_style_ids(doc):
+    """Id style heading dokumen, dihitung sekali per dokumen.
+
+    `para.style` di python-docx memindai seluruh daftar style pada setiap panggilan,
+    sehingga untuk ratusan paragraf jauh lebih lambat daripada membaca id style langsung.
+    """
+    return {style.style_id for style in doc.styles
+            if (style.name or "").startswith(("Heading", "Judul", "Title"))}
+
+def _is_docx_heading(para, heading_style_ids):
+    return para._p.style in heading_style_ids
+
+def _docx_sections(source):
+    """Membagi DOCX menjadi section berdasarkan style heading paragraf."""
+    doc = _open_docx(source)
+    heading_style_ids = _heading_style_ids(doc)
+    sections = [{"judul": "", "paragraf": []}]
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        if _is_docx_heading(para, heading_style_ids) and len(text) <= HEADING_MAX_CHARS:
+            sections.append({"judul": text, "paragraf": []})
+        else:
+            sections[-1]["paragraf"].append(text)
+    return [s for s in sections if s["judul"] or s["paragraf"]]
+
+def _is_pdf_heading(size, bold, text, body_size):
+    """Judul: font lebih besar dari badan teks, atau satu baris tebal yang bukan kalimat."""
+    if len(text) > HEADING_MAX_CHARS:
+        return False
+    if size >= body_size * PDF_HEADING_SIZE_RATIO:
+        return True
+    return bold and size >= body_size and not text.endswith((".", ",", ";", ":"))
+
+def _pdf_sections(source):
+    """Membagi PDF menjadi section berdasarkan tata letak baris (ukuran font dan huruf tebal)."""
+    # Judul dikenali relatif terhadap font badan teks seluruh dokumen, jadi semua baris dibutuhkan dulu
+    lines = [line for page in iter_pdf_pages(source, layout=True) for line in page["baris"]]
+    if not lines:
+        return []
+
+    # Ukuran font badan teks = ukuran yang dipakai oleh karakter terbanyak
+    size_weights = Counter()
+    for size, _, text in lines:
+        size_weights[size] += len(text)
+    body_size = size_weights.most_common(1)[0][0]
+
+    sections = [{"judul": "", "paragraf": []}]
+    for size, bold, text in lines:
+        if _is_pdf_heading(size, bold, text, body_size):
+            if sections[-1]["judul"] and not sections[-1]["paragraf"]:
+                # Judul yang terpotong menjadi beberapa baris
+                sections[-1]["judul"] += " " + text
+            else:
+                sections.append({"judul": text, "paragraf": []})
+        else:
+            sections[-1]["paragraf"].append(text)
+    return [s for s in sections if s["judul"] or s["paragraf"]]
+
+@_stage("ekstraksi")
+def _extract_sections(source, file_extension):
+    try:
+        if file_extension == 'pdf':
+            return _pdf_sections(source)
+        if file_extension == 'docx':
+            return _docx_sections(source)
+    except Exception as e:
+        raise ValueError(f"Gagal membaca file {file_extension.upper()}: {e}")
+    raise ValueError("Format file tidak didukung. Harap unggah .pdf atau .docx")
+
+def _split_long_text(text, max_tokens):
+    """Memotong satu paragraf yang melebihi anggaran token di batas spasi."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+def _chunk_sections(sections, max_tokens=None, overlap_tokens=None):
+    """Menggabungkan section menjadi potongan teks sesuai anggaran token.
+
+    Section utuh diusahakan tidak terpotong. Potongan berikutnya diawali beberapa
+    baris terakhir potongan sebelumnya (overlap) agar konteks tidak hilang.
+    """
+    max_tokens = max_tokens or ANALYSIS_CHUNK_TOKENS
+    overlap_tokens = ANALYSIS_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    budget = max(1, max_tokens - overlap_tokens)
+
+    chunks = []
+    overlap = []
+    current = []
+    current_tokens = 0
 
-def _get_full_text_from_file(file):
-    """Utility untuk mendapatkan seluruh teks sebagai satu string."""
-    pages = _get_text_from_flask_file(file)
-    return "\n".join([page['teks'] for page in pages])
+    def flush():
+        nonlocal overlap, current, current_tokens
+        if not current:
+            return
+        chunks.append("\n".join(overlap + current))
+        overlap = []
+        tail_tokens = 0
+        for line in reversed(current):
+            tail_tokens += _estimate_tokens(line)
+            if tail_tokens > overlap_tokens:
+                break
+            overlap.insert(0, line)
+        current = []
+        current_tokens = 0
+
+    for section in sections:
+        lines = [section["judul"]] if section["judul"] else []
+        for paragraph in section["paragraf"]:
+            lines.extend(_split_long_text(paragraph, budget))
+        section_tokens = sum(_estimate_tokens(line) for line in lines)
+        if current and current_tokens + section_tokens > budget:
+            flush()
+        for line in lines:
+            line_tokens = _estimate_tokens(line)
+            if current and current_tokens + line_tokens > budget:
+                flush()
+            current.append(line)
+            current_tokens += line_tokens
+    flush()
+    return chunks
+
+def _normalize_for_dedup(text):
+    return re.sub(r"\s+", " ", str(text or "")).strip().lower()
+
+def _merge_chunk_results(results_per_chunk, key):
+    """Menggabungkan hasil tiap potongan dan membuang temuan ganda (mis. dari bagian overlap)."""
+    merged = []
+    seen = set()
+    for results in results_per_chunk:
+        if not isinstance(results, list):
+            continue
+        for item in results:
+            if not isinstance(item, dict):
+                continue
+            marker = _normalize_for_dedup(item.get(key))
+            if marker in seen:
+                continue
+            seen.add(marker)
+            merged.append(item)
+    return merged
 
 
 # --- Fungsi Logika AI (Sebagian besar disalin langsung) ---
 
-def proofread_with_gemini(text_to_check):
-    """Mengirim teks ke Gemini untuk proofreading (tanpa st)."""
-    if not text_to_check or text_to_check.isspace():
-        return []
-    
-    # NOTE: Prompt Anda SANGAT spesifik. Saya salin apa adanya.
-    prompt = f"""
-    Anda adalah seorang auditor dan ahli bahasa Indonesia yang sangat teliti. Anda diberikan dokumen dan tugas Anda adalah melakukan proofread pada teks berikut. Fokus pada:
-    1. Memperbaiki kesalahan ketik (typo) agar semuanya sesuai dengan standar KBBI dan PUEBI.
-    1. Kalau ada kata-kata yang tidak sesuai KBBI dan PUEBI, tolong jangan highlight semua kalimatnya, tapi cukup highlight kata-kata yang salah serta perbaiki kata-kata itu aja, jangan perbaiki semua kalimatnya
-    3. Jika ada kata yang diitalic, biarkan saja
-    4. Nama-nama yang diberi ini pastikan benar juga "Yullyan, I Made Suandi Putra, Laila Fajriani, Hari Sundoro, Bakhas Nasrani Diso, Rizky Ananda Putra, Wirawan Arief Nugroho, Lelya Novita Kusumawati, Ryani Ariesti Syafitri, Darmo Saputro Wibowo, Lucky Parwitasari, Handarudigdaya Jalanidhi Kuncaratrah, Fajar Setianto, Jaka Tirtana Hanafiah,  Muhammad Rosyid Ridho Muttaqien, Octovian Abrianto, Deny Sjahbani, Jihan Abigail, Winda Anggraini, Fadian Dwiantara, Aliya Anindhita Rachman"
-    5. Fontnya arial dan jangan diganti. Khusus untuk judul paling atas, itu font sizenya 12 dan bodynya selalu 11
-    6. Khusus "Indonesia Financial Group (IFG)", meskipun bahasa inggris, tidak perlu di italic
-    7. Kalau ada kata yang sudah diberikan akronimnya di awal, maka di halaman berikut-berikutnya cukup akronimnya saja, tidak perlu ditulis lengkap lagi
-    8. Pada bagian Nomor surat dan Penutup tidak perlu dicek, biarkan seperti itu
-    9. Ketika Anda perbaiki, fontnya pastikan Arial dengan ukuran 11 juga (Tidak diganti)
-    10. Pada kalimat "Indonesia Financial Group", jika terdapat kata typo "Finansial", tolong Anda sarankan untuk ganti ke "Financial"
-    11. Yang benar adalah "Satuan Kerja Audit Internal", bukan "Satuan Pengendali Internal Audit"
-    12. Jika terdapat kata "reviu", biarkan itu sebagai benar
-    13. Kalau ada kata "IM", "ST", "SKAI", "IFG", "TV (Angka Romawi)", "RKAT", dan "RKAP", itu tidak perlu ditandai sebagai salah dan tidak perlu disarankan untuk italic / bold / underline
-    14. Untuk nama modul seperti "Modul Sourcing, dll", itu tidak perlu italic
-    15. Kalau ada kata dalam bahasa inggris yang masih masuk akal dan nyambung dengan kalimat yang dibahas, tidak perlu Anda sarankan untuk ganti ke bahasa indonesia
-    16. Jika ada bahasa inggris dan akronimnya seperti "General Ledger (GL)", tolong dilakukan italic pada kata tersebut pada saat download file hasil revisinya, akronimnya tidak perlu diitalic
-    17. Awal kalimat selalu dimulai dengan huruf kapital. Jika akhir poin diberi tanda ";", maka poin selanjutnya tidak perlu kapital
-    18. Di file hasil revisi, Anda jangan ganti dari yang aslinya. Misalnya kalau ada kata yang diitalic di file asli, jangan Anda hilangkan italicnya
-    19. Tolong perhatikan juga tanda bacanya, seperti koma, titik koma, titik, tanda hubung, dan lain-lain. Pastikan sesuai dan ada tanda titik di setiap akhir kalimat
-
-    PENTING: Berikan hasil dalam format yang SANGAT KETAT. Untuk setiap kesalahan, gunakan format:
-    [SALAH] kata atau frasa yang salah -> [BENAR] kata atau frasa perbaikan -> [KALIMAT] kalimat lengkap asli tempat kesalahan ditemukan
-
-    Contoh:
-    [SALAH] dikarenakan -> [BENAR] karena -> [KALIMAT] Hal itu terjadi dikarenakan kelalaian petugas.
-
-    Jika tidak ada kesalahan sama sekali, kembalikan teks: "TIDAK ADA KESALAHAN"
-
-    Berikut adalah teks yang harus Anda periksa:
-    ---
-    {text_to_check}
+# Template prompt dibaca sekali dari PROMPTS_DIR. Setiap file berisi instruksi sistem
+# (dikirim sebagai system instruction, sama untuk semua halaman) lalu, setelah baris
+# PROMPT_MESSAGE_SEPARATOR, pesan per panggilan dengan isian {nama}. Baris
+# "@sertakan <file>" di instruksi sistem diganti isi file tersebut, sehingga blok aturan
+# yang dipakai beberapa template (proofread_rules.txt) cukup ditulis sekali.
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts"))
+PROMPT_MESSAGE_SEPARATOR = "--- PESAN ---"
+_PROMPT_INCLUDE = re.compile(r"^@sertakan[ \t]+(\S+)[ \t]*$", re.MULTILINE)
+
+_PROOFREAD_LINE_PATTERN = re.compile(
+    r"\[SALAH\]\s*(.*?)\s*->\s*\[BENAR\]\s*(.*?)\s*->\s*\[KALIMAT\]\s*(.*?)\s*(\n|$)", re.IGNORECASE | re.DOTALL
+)
+_COHERENCE_LINE_PATTERN = re.compile(
+    r"\[TOPIK UTAMA\]\s*(.*?)\s*->\s*\[TEKS ASLI\]\s*(.*?)\s*->\s*\[SARAN REVISI\]\s*(.*?)\s*(\n|$)",
+    re.IGNORECASE | re.DOTALL
+)
+_JSON_FENCE = re.compile(r'```json\s*|\s*```')
+
+class InvalidModelResponse(ValueError):
+    """Respons model terbaca tetapi tidak sesuai format/schema yang diminta template."""
+
+def _parse_proofread_lines(response_text):
+    return [{"salah": salah.strip(), "benar": benar.strip(), "kalimat": kalimat.strip()}
+            for salah, benar, kalimat, _ in _PROOFREAD_LINE_PATTERN.findall(response_text)]
+
+def _parse_batch_response(response_text, expected_ids):
+    """Memvalidasi respons JSON mode batch; ValueError jika bentuknya tidak sesuai."""
+    data = json.loads(_JSON_FENCE.sub('', response_text.strip()))
+    if not isinstance(data, dict) or not isinstance(data.get("halaman"), list):
+        raise ValueError("Respons batch harus berupa objek dengan list \"halaman\"")
+    results = {}
+    for entry in data["halaman"]:
+        if not isinstance(entry, dict) or str(entry.get("id")) not in expected_ids:
+            raise ValueError(f"Id halaman tidak dikenal pada respons batch: {entry!r}")
+        errors = entry.get("kesalahan", [])
+        if not isinstance(errors, list):
+            raise ValueError(f"\"kesalahan\" untuk halaman {entry['id']} bukan list")
+        found = results.setdefault(str(entry["id"]), [])
+        for error in errors:
+            if not isinstance(error, dict) or not isinstance(error.get("salah"), str) \
+                    or not isinstance(error.get("benar"), str):
+                raise ValueError(f"Format kesalahan tidak valid pada halaman {entry['id']}: {error!r}")
+            found.append({
+                "salah": error["salah"].strip(),
+                "benar": error["benar"].strip(),
+                "kalimat": str(error.get("kalimat") or "").strip(),
+            })
+    missing = set(expected_ids) - set(results)
+    if missing:
+        raise ValueError(f"Respons batch tidak memuat halaman: {', '.join(sorted(missing))}")
+    return results
+
+def _parse_coherence_lines(response_text):
+    return [{"topik": topik.strip(), "asli": asli.strip(), "saran": saran.strip()}
+            for topik, asli, saran, _ in _COHERENCE_LINE_PATTERN.findall(response_text)]
+
+def _parse_restructure_response(response_text):
+    """Memvalidasi list rekomendasi; ValueError jika bentuknya tidak sesuai."""
+    data = json.loads(_JSON_FENCE.sub('', response_text.strip()))
+    if not isinstance(data, list):
+        raise ValueError("Respons restrukturisasi harus berupa list")
+    keys = ("misplaced_paragraph", "original_section", "recommended_section")
+    for item in data:
+        if not isinstance(item, dict) or not all(isinstance(item.get(key), str) for key in keys):
+            raise ValueError(f"Format rekomendasi tidak valid: {item!r}")
+    return [{key: item[key] for key in keys} for item in data]
+
+_STRING = {"type": "string"}
+# Parser dan konfigurasi keluaran per template; schema JSON juga dikirim ke Gemini (response_schema)
+PROMPT_SPECS = {
+    "proofread": {"parse": _parse_proofread_lines},
+    "proofread_batch": {
+        "parse": _parse_batch_response,
+        "generation_config": {
+            "response_mime_type": "application/json",
+            "response_schema": {
+                "type": "object",
+                "properties": {"halaman": {"type": "array", "items": {
+                    "type": "object",
+                    "properties": {"id": _STRING, "kesalahan": {"type": "array", "items": {
+                        "type": "object",
+                        "properties": {"salah": _STRING, "benar": _STRING, "kalimat": _STRING},
+                        "required": ["salah", "benar", "kalimat"],
+                    }}},
+                    "required": ["id", "kesalahan"],
+                }}},
+                "required": ["halaman"],
+            },
+        },
+    },
+    "coherence": {"parse": _parse_coherence_lines},
+    "restructure": {
+        "parse": _parse_restructure_response,
+        "generation_config": {
+            "response_mime_type": "application/json",
+            "response_schema": {"type": "array", "items": {
+                "type": "object",
+                "properties": {"misplaced_paragraph": _STRING, "original_section": _STRING,
+                               "recommended_section": _STRING},
+                "required": ["misplaced_paragraph", "original_section", "recommended_section"],
+            }},
+        },
+    },
+}
+
+class PromptTemplate:
+    """Satu prompt berversi: instruksi sistem statis, pesan per panggilan, dan parser responsnya.
+
+    Pesan dipecah sekali menjadi potongan teks dan isian, jadi render hanya menggabungkan string.
+    `version` adalah hash isi template dan konfigurasi keluarannya.
+    """
+
+    def __init__(self, name, system, message, parse, generation_config=None):
+        self.name = name
+        self.system = system
+        self.message = message
+        self.parse = parse
+        self.generation_config = generation_config
+        self._pieces = [(literal, field) for literal, field, _, _ in string.Formatter().parse(message)]
+        fingerprint = json.dumps([system, message, generation_config], sort_keys=True)
+        self.version = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+    def render(self, **fields):
+        return "".join(literal + (str(fields[field]) if field is not None else "") for literal, field in self._pieces).strip()
+
+class PromptRegistry:
+    """Semua template prompt, dimuat sekali saat aplikasi mulai."""
+
+    def __init__(self, templates):
+        self.templates = {template.name: template for template in templates}
+
+    @classmethod
+    def load(cls, directory, specs):
+        templates = []
+        included = {}
+
+        def include(match):
+            # Isi yang disertakan ikut di-hash, jadi mengubah aturan bersama mengganti versi semua templatenya
+            filename = match.group(1)
+            if filename not in included:
+                with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                    included[filename] = f.read().strip("\n")
+            return included[filename]
+
+        for name, spec in specs.items():
+            with open(os.path.join(directory, f"{name}.txt"), encoding="utf-8") as f:
+                system, separator, message = f.read().partition(f"\n{PROMPT_MESSAGE_SEPARATOR}\n")
+            if not separator:
+                raise ValueError(f"Template prompt {name} tidak memiliki baris {PROMPT_MESSAGE_SEPARATOR!r}")
+            system = _PROMPT_INCLUDE.sub(include, system)
+            templates.append(PromptTemplate(name, system.strip(), message.strip("\n"), spec["parse"],
+                                            spec.get("generation_config")))
+        return cls(templates)
+
+    def __getitem__(self, name):
+        return self.templates[name]
+
+    def version(self, *names):
+        return "+".join(self.templates[name].version for name in names)
+
+    def versions(self):
+        return {name: template.version for name, template in self.templates.items()}
+
+
+prompts = PromptRegistry.load(PROMPTS_DIR, PROMPT_SPECS)
+
+def _run_prompt(name, parse_context=None, **fields):
+    """Render template `name`, panggil Gemini dengan instruksi sistemnya, lalu parse responsnya.
+
+    Error API diteruskan apa adanya; respons yang gagal di-parse (tidak sesuai schema)
+    dilempar sebagai InvalidModelResponse agar bisa dibedakan dari error konfigurasi/API.
+    """
+    template = prompts[name]
+    kwargs = {"generation_config": template.generation_config} if template.generation_config else {}
+    response = _generate_content(template.render(**fields), system_instruction=template.system, **kwargs)
+    with _stage("parsing"):
+        try:
+            return template.parse(response.text, **(parse_context or {}))
+        except InvalidModelResponse:
+            raise
+        except ValueError as e:
+            raise InvalidModelResponse(f"Respons template {name} tidak valid: {e}") from e
+
+def proofread_with_gemini(text_to_check):
+    """Mengirim teks ke Gemini untuk proofreading (tanpa st).
+
+    Error API tidak diubah menjadi temuan; pemanggil yang menandai halamannya gagal.
+    """
+    if not text_to_check or text_to_check.isspace():
+        return []
+    return _run_prompt("proofread", teks=text_to_check)
+
+def proofread_batch_with_gemini(texts_by_id):
+    """Proofread beberapa halaman dalam satu panggilan; hasil JSON per id halaman.
+
+    Melempar InvalidModelResponse jika respons model tidak lolos validasi, sehingga
+    pemanggil bisa memecah batch dan mencoba lagi.
+    """
+    pages = "\n\n".join(f'=== HALAMAN id="{page_id}" ===\n{text}' for page_id, text in texts_by_id.items())
+    return _run_prompt("proofread_batch", {"expected_ids": set(texts_by_id)}, halaman=pages)
+
+class AnalysisUnavailable(Exception):
+    """Analisis koherensi/restrukturisasi gagal karena model tidak bisa dipakai (API, circuit breaker).
+
+    Tidak pernah dijadikan baris hasil, jadi tidak ikut tersimpan di cache atau terekspor.
+    """
+
+    def __init__(self, error):
+        super().__init__(f"Gagal menghubungi API: {error}")
+        self.penyebab = _failure_reason(error)
+        self.retry_after = _retry_after([error])
+
+def analyze_document_coherence(full_text):
+    """Menganalisis koherensi (tanpa st). Melempar AnalysisUnavailable jika model gagal."""
+    if not full_text or full_text.isspace():
+        return []
+    try:
+        return _run_prompt("coherence", teks=full_text)
+    except Exception as e:
+        print(f"Terjadi kesalahan saat menghubungi AI: {e}")
+        raise AnalysisUnavailable(e) from e
+
+def get_structural_recommendations(full_text, outline=None):
+    """Menganalisis restrukturisasi (tanpa st).
+
+    `outline` diisi saat teks hanya sebagian dokumen, agar model tetap tahu
+    section mana saja yang tersedia sebagai lokasi baru. Melempar AnalysisUnavailable
+    jika model gagal.
+    """
+    if not full_text or full_text.isspace():
+        return []
+
+    outline_text = ""
+    if outline:
+        outline_text = (
+            "Teks di bawah hanya sebagian dari dokumen. Daftar seluruh section dalam dokumen "
+            "(boleh dipakai sebagai \"recommended_section\"):\n" + "\n".join(f"- {judul}" for judul in outline)
+        )
+    try:
+        return _run_prompt("restructure", outline=outline_text, teks=full_text)
+    except Exception as e:
+        print(f"Failed to Generate Response from AI: {e}")
+        raise AnalysisUnavailable(e) from e
+
+# --- Mesin Penulisan Ulang DOCX (mempertahankan format run) ---
+
+# Elemen teks di dalam run paragraf, tanpa isi text box (paragraf tersendiri) dan teks yang dihapus
+_SEGMENT_XPATH = (
+    ".//w:r[not(ancestor::w:txbxContent) and not(ancestor::w:del)]"
+    "/*[self::w:t or self::w:tab or self::w:br or self::w:cr]"
+)
+
+# Nama tag lengkap (setara docx.oxml.ns.qn) agar modul ini tidak perlu mengimpor python-docx
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P, _W_TBL, _W_T, _W_TAB, _W_RPR = _W_NS + "p", _W_NS + "tbl", _W_NS + "t", _W_NS + "tab", _W_NS + "rPr"
+_XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+def _iter_block_items(parent_element, parent):
+    """Paragraf dan tabel langsung di dalam sebuah container, sesuai urutan dokumen."""
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    for child in parent_element.iterchildren():
+        if child.tag == _W_P:
+            yield Paragraph(child, parent)
+        elif child.tag == _W_TBL:
+            yield Table(child, parent)
+
+def _iter_container_paragraphs(parent_element, parent, seen_cells):
+    for block in _iter_block_items(parent_element, parent):
+        if block._element.tag == _W_P:
+            yield block
+            continue
+        for row in block.rows:
+            for cell in row.cells:
+                # Sel hasil merge muncul berulang kali di row.cells
+                if cell._tc in seen_cells:
+                    continue
+                seen_cells.add(cell._tc)
+                yield from _iter_container_paragraphs(cell._tc, cell, seen_cells)
+
+def _iter_docx_paragraphs_with_origin(doc):
+    """Seperti _iter_docx_paragraphs, tetapi juga menghasilkan asal paragraf:
+    None untuk badan teks, atau (nomor_section, "header"/"footer"/...) untuk header/footer."""
+    seen_cells = set()
+    for para in _iter_container_paragraphs(doc.element.body, doc._body, seen_cells):
+        yield para, None
+    for section_number, section in enumerate(doc.sections, start=1):
+        for name, part in (("header", section.header),
+                           ("header halaman pertama", section.first_page_header),
+                           ("header halaman genap", section.even_page_header),
+                           ("footer", section.footer),
+                           ("footer halaman pertama", section.first_page_footer),
+                           ("footer halaman genap", section.even_page_footer)):
+            if not part.is_linked_to_previous:
+                for para in _iter_container_paragraphs(part._element, part, seen_cells):
+                    yield para, (section_number, name)
+
+def _iter_docx_paragraphs(doc):
+    """Semua paragraf dokumen: badan teks, sel tabel (termasuk tabel bersarang), header dan footer.
+
+    Urutannya tetap, sehingga indeks paragraf di sini sama dengan `lokasi.paragraf`
+    yang dihasilkan _docx_units.
+    """
+    for para, _ in _iter_docx_paragraphs_with_origin(doc):
+        yield para
+
+def _page_breaks(p, use_rendered_breaks):
+    """Jumlah pergantian halaman (sebelum, sesudah) teks pertama paragraf.
+
+    Jika dokumen menyimpan posisi halaman hasil render Word (w:lastRenderedPageBreak),
+    posisi itu yang dipakai. Jika tidak, hanya page break eksplisit yang dihitung.
+    """
+    if use_rendered_breaks:
+        markers = p.xpath(".//*[self::w:lastRenderedPageBreak or self::w:t][not(ancestor::w:txbxContent)]")
+        before = 0
+    else:
+        markers = p.xpath(".//*[(self::w:br and @w:type='page') or self::w:t][not(ancestor::w:txbxContent)]")
+        before = len(p.xpath("./w:pPr/w:pageBreakBefore[not(@w:val='0' or @w:val='false')]"))
+    after = 0
+    seen_text = False
+    for element in markers:
+        if element.tag == _W_T:
+            seen_text = seen_text or bool(element.text)
+        elif seen_text:
+            after += 1
+        else:
+            before += 1
+    return before, after
+
+def _docx_units(doc):
+    """Membagi DOCX menjadi unit berukuran terbatas beserta lokasi paragrafnya.
+
+    Unit baru dimulai pada pergantian halaman, section break, heading, atau saat
+    ukurannya melewati DOCX_UNIT_MAX_TOKENS. Isi tabel ikut di badan teks; header
+    dan footer menjadi unit tersendiri. `lokasi.paragraf` adalah indeks paragraf
+    menurut _iter_docx_paragraphs.
+    """
+    use_rendered_breaks = bool(doc.element.body.xpath(".//w:lastRenderedPageBreak"))
+    heading_style_ids = _heading_style_ids(doc)
+    units = []
+    page = 1
+    section = 1
+    section_first_page = {1: 1}
+    current = None
+    current_tokens = 0
+
+    for index, (para, origin) in enumerate(_iter_docx_paragraphs_with_origin(doc)):
+        _, text = _paragraph_segments(para._p)
+        if origin is None:
+            before, after = _page_breaks(para._p, use_rendered_breaks)
+            page += before
+            key = ("body", section, page)
+        else:
+            key = origin
+
+        tokens = _estimate_tokens(text) if text.strip() else 0
+        starts_new_unit = (
+            current is None
+            or current["_key"] != key
+            or (origin is None and _is_docx_heading(para, heading_style_ids))
+            or current_tokens + tokens > DOCX_UNIT_MAX_TOKENS
+        )
+        if text.strip():
+            if starts_new_unit:
+                if origin is None:
+                    current = {"halaman": page, "lokasi": {"section": section}, "_key": key, "paragraf": []}
+                else:
+                    current = {
+                        "halaman": section_first_page.get(origin[0], 1),
+                        "lokasi": {"section": origin[0], "bagian": origin[1]},
+                        "_key": key,
+                        "paragraf": [],
+                    }
+                units.append(current)
+                current_tokens = 0
+            current["paragraf"].append((index, text))
+            current_tokens += tokens
+
+        if origin is None:
+            page += after
+            sect_pr = para._p.xpath("./w:pPr/w:sectPr")
+            if sect_pr:
+                # Section break: section baru dimulai di halaman baru kecuali tipenya "continuous"
+                section += 1
+                if not use_rendered_breaks and sect_pr[0].xpath("string(./w:type/@w:val)") != "continuous":
+                    page += 1
+                section_first_page[section] = page
+
+    for unit in units:
+        indices = [paragraph_index for paragraph_index, _ in unit["paragraf"]]
+        unit["lokasi"]["paragraf"] = [indices[0], indices[-1]]
+        unit["teks"] = "\n".join(text for _, text in unit["paragraf"])
+        del unit["_key"]
+    return units
+
+def _compile_terms(terms, ignore_case=False):
+    """Satu regex untuk semua istilah, disusun sebagai trie agar tetap cepat untuk ribuan istilah.
+
+    Pada setiap posisi, istilah yang lebih panjang selalu dicoba lebih dulu.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in (term.lower() if ignore_case else term):
+            node = node.setdefault(char, {})
+        node[""] = True
+    return re.compile(_trie_to_regex(trie), re.IGNORECASE if ignore_case else 0)
+
+def _trie_to_regex(node):
+    branches = [re.escape(char) + _trie_to_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+def _paragraph_segments(p):
+    """Potongan teks paragraf [(elemen, posisi_awal, teks)] beserta teks lengkapnya.
+
+    Tab dan baris baru ikut dihitung agar posisi sama dengan teks yang terlihat,
+    tetapi hanya elemen w:t yang teksnya diubah.
+    """
+    segments = []
+    position = 0
+    for element in p.xpath(_SEGMENT_XPATH):
+        if element.tag == _W_T:
+            text = element.text or ""
+        elif element.tag == _W_TAB:
+            text = "\t"
+        else:
+            text = "\n"
+        segments.append((element, position, text))
+        position += len(text)
+    return segments, "".join(text for _, _, text in segments)
+
+def _set_text(t_element, text):
+    t_element.text = text
+    t_element.set(_XML_SPACE, 'preserve')
+
+def _split_run(r, child, offset):
+    """Memecah run `r` tepat di karakter `offset` pada elemen anak `child`.
+
+    Run kanan adalah salinan lengkap (termasuk w:rPr), jadi format kedua bagian tetap sama.
+    """
+    right = deepcopy(r)
+    content = [c for c in r if c.tag != _W_RPR]
+    right_content = [c for c in right if c.tag != _W_RPR]
+    index = content.index(child)
+    for c in content[index if offset == 0 else index + 1:]:
+        r.remove(c)
+    for c in right_content[:index]:
+        right.remove(c)
+    if offset > 0:
+        text = child.text or ""
+        _set_text(child, text[:offset])
+        _set_text(right_content[index], text[offset:])
+    r.addnext(right)
+    return right
+
+def _split_runs_at(p, positions):
+    """Memastikan ada batas run di setiap posisi (dalam teks paragraf) pada `positions`."""
+    segments, _ = _paragraph_segments(p)
+    positions = sorted(set(positions), reverse=True)
+    # Dari segmen terakhir ke awal: pemecahan hanya memindahkan isi di sebelah kanan,
+    # jadi elemen segmen sebelumnya tetap berada di run aslinya
+    for element, start, text in reversed(segments):
+        if not text:
+            continue
+        end = start + len(text)
+        for position in [pos for pos in positions if start <= pos < end]:
+            r = element.getparent()
+            if position > start:
+                _split_run(r, element, position - start)
+            elif [c for c in r if c.tag != _W_RPR].index(element) > 0:
+                _split_run(r, element, 0)
+
+def _non_overlapping(spans):
+    """Rentang (awal, akhir, ...) terurut; rentang yang bertumpang tindih dengan sebelumnya dibuang."""
+    kept = []
+    for span in sorted(spans):
+        if not kept or span[0] >= kept[-1][1]:
+            kept.append(span)
+    return kept
+
+def _replace_in_paragraph(p, pattern, replacements):
+    """Mengganti semua kecocokan `pattern` langsung di elemen w:t tanpa membongkar run.
+
+    Teks pengganti mengikuti format run tempat kecocokan dimulai.
+    """
+    _, text = _paragraph_segments(p)
+    matches = list(pattern.finditer(text))
+    edits = [match.span() + (replacements[match.group(0)],) for match in matches if match.group(0) in replacements]
+    _replace_spans(p, edits)
+    return len(matches)
+
+def _replace_spans(p, edits):
+    """Mengganti teks pada rentang [(awal, akhir, pengganti), ...] yang tidak bertumpang tindih."""
+    segments, _ = _paragraph_segments(p)
+    # Diproses dari kanan ke kiri agar posisi rentang sebelumnya tidak bergeser
+    for start, end, replacement in sorted(edits, reverse=True):
+        first = True
+        for element, segment_start, segment_text in segments:
+            segment_end = segment_start + len(segment_text)
+            if segment_end <= start or segment_start >= end or element.tag != _W_T:
+                continue
+            current = element.text or ""
+            local_start = max(start, segment_start) - segment_start
+            local_end = min(end, segment_end) - segment_start
+            _set_text(element, current[:local_start] + (replacement if first else "") + current[local_end:])
+            first = False
+
+def _highlight_in_paragraph(para, pattern, color=None, previous_colors=None):
+    """Memberi highlight pada setiap kecocokan; run dipecah seperlunya, format lain tidak berubah.
+
+    Jika `previous_colors` (list) diberikan, diisi (run, warna sebelumnya) agar bisa dikembalikan.
+    """
+    _, text = _paragraph_segments(para._p)
+    spans = [match.span() for match in pattern.finditer(text)]
+    _highlight_spans(para, spans, color, previous_colors)
+    return len(spans)
+
+def _highlight_spans(para, spans, color=None, previous_colors=None):
+    """Highlight pada rentang [(awal, akhir), ...] yang terurut dan tidak bertumpang tindih (bawaan kuning)."""
+    if not spans:
+        return
+    from docx.enum.text import WD_COLOR_INDEX
+    from docx.text.run import Run
+
+    if color is None:
+        color = WD_COLOR_INDEX.YELLOW
+    p = para._p
+    _split_runs_at(p, [position for span in spans for position in span])
+
+    # Setelah dipecah, setiap segmen berada sepenuhnya di dalam atau di luar kecocokan
+    segments, _ = _paragraph_segments(p)
+    span_index = 0
+    for element, segment_start, segment_text in segments:
+        while span_index < len(spans) and spans[span_index][1] <= segment_start:
+            span_index += 1
+        if span_index == len(spans):
+            break
+        start, end = spans[span_index]
+        if segment_text and start <= segment_start and segment_start + len(segment_text) <= end:
+            run = Run(element.getparent(), para)
+            if previous_colors is not None:
+                previous_colors.append((run, run.font.highlight_color))
+            run.font.highlight_color = color
+
+def _error_replacements(errors):
+    """Pasangan salah -> benar dari daftar temuan; baris kosong dan baris ERROR dilewati."""
+    replacements = {}
+    for error in errors:
+        salah = error.get("Kata/Frasa Salah") or ""
+        if not salah.strip() or salah == "ERROR":
+            continue
+        # Seperti sebelumnya, temuan terakhir menang jika kata yang sama muncul lagi
+        replacements[salah] = error.get("Perbaikan Sesuai KBBI") or ""
+    return replacements
+
+# --- Pencari Posisi Temuan di Dokumen ---
+
+# Temuan model yang kemiripannya di bawah ini dianggap tidak ditemukan
+LOCATOR_MIN_CONFIDENCE = float(os.getenv("LOCATOR_MIN_CONFIDENCE", "0.8"))
+LOCATOR_NGRAM = 4
+# Jumlah n-gram paling jarang dari teks temuan yang dipakai untuk mencari kandidat paragraf
+LOCATOR_QUERY_NGRAMS = 24
+LOCATOR_MAX_CANDIDATES = 5
+
+_LOCATOR_CHAR_MAP = str.maketrans({
+    "“": '"', "”": '"', "„": '"', "‘": "'", "’": "'", "‚": "'",
+    "–": "-", "—": "-", "−": "-",
+})
+_NON_SPACE = re.compile(r"\S+")
+
+def _locator_normalize(text):
+    """Teks kecil dengan tanda kutip/tanda pisah seragam dan spasi diringkas."""
+    return " ".join((text or "").translate(_LOCATOR_CHAR_MAP).lower().split())
+
+def _normalize_with_offsets(text):
+    """Seperti _locator_normalize, beserta posisi karakter asli untuk setiap karakter hasilnya."""
+    text = text or ""
+    lowered = text.translate(_LOCATOR_CHAR_MAP).lower()
+    if len(lowered) != len(text):
+        # Huruf yang berubah panjang saat dikecilkan (jarang): dipetakan per karakter
+        pieces = [(index, char.translate(_LOCATOR_CHAR_MAP).lower()) for index, char in enumerate(text)]
+        offsets = [index for index, piece in pieces for _ in piece]
+        lowered = "".join(piece for _, piece in pieces)
+    else:
+        offsets = range(len(text))
+    normalized = []
+    normalized_offsets = []
+    for match in _NON_SPACE.finditer(lowered):
+        if normalized:
+            normalized.append(" ")
+            normalized_offsets.append(offsets[match.start() - 1])
+        normalized.append(match.group(0))
+        normalized_offsets.extend(offsets[match.start():match.end()])
+    return "".join(normalized), normalized_offsets
+
+def _normalize_needle(text):
+    """Teks temuan model: dinormalisasi, tanpa tanda kutip pembungkus dan elipsis pemotongan."""
+    needle = _locator_normalize(text).strip(" \"'")
+    for ellipsis in ("...", "…"):
+        needle = needle.removesuffix(ellipsis).removeprefix(ellipsis).strip()
+    return needle
+
+class ParagraphLocator:
+    """Indeks n-gram karakter atas paragraf dokumen, dibuat sekali per dokumen.
+
+    `locate` memetakan kalimat/paragraf dari model (spasi, tanda kutip, atau
+    pemotongan yang sedikit berbeda) ke satu paragraf dan rentang karakternya,
+    dengan skor keyakinan 0..1. Kandidat dicari dari n-gram paling jarang, jadi
+    biayanya tidak bergantung pada jumlah paragraf. Indeks baru dibuat saat
+    pertama kali dibutuhkan: temuan yang paragraf petunjuknya cocok tidak memakainya.
     """
-    try:
-        response = model.generate_content(prompt)
-        pattern = re.compile(r"\[SALAH\]\s*(.*?)\s*->\s*\[BENAR\]\s*(.*?)\s*->\s*\[KALIMAT\]\s*(.*?)\s*(\n|$)", re.IGNORECASE | re.DOTALL)
-        found_errors = pattern.findall(response.text)
-        return [{"salah": salah.strip(), "benar": benar.strip(), "kalimat": kalimat.strip()} for salah, benar, kalimat, _ in found_errors]
-    except Exception as e:
-        print(f"Terjadi kesalahan saat menghubungi AI: {e}")
-        # Kembalikan error sebagai list (agar JSON tidak error)
-        return [{"salah": "ERROR", "benar": str(e), "kalimat": "Gagal menghubungi API"}]
 
-def analyze_document_coherence(full_text):
-    """Menganalisis koherensi (tanpa st)."""
-    if not full_text or full_text.isspace():
-        return []
+    def __init__(self, texts, min_confidence=None, ngram=LOCATOR_NGRAM):
+        self.texts = list(texts)
+        self.min_confidence = LOCATOR_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.ngram = ngram
+        self._normalized = [_locator_normalize(text) for text in self.texts]
+        # Posisi asli hanya dihitung untuk paragraf yang benar-benar diperiksa
+        self._offsets = {}
+        self._postings = None
 
-    prompt = f"""
-    Anda adalah seorang auditor ahli yang bertugas menganalisis struktur dan koherensi sebuah tulisan.
-    Tugas Anda adalah membaca keseluruhan teks berikut dan mengidentifikasi setiap kalimat atau paragraf yang tidak koheren atau keluar dari topik utama di dalam sebuah sub-bagian.
-    
-    Untuk setiap ketidaksesuaian yang Anda temukan, lakukan hal berikut:
-    1. Bacalah mengenai judul dari section atau subsection yang ada pada file tersebut
-    2. Tentukan topik utama dari setiap section / subsection terutama isi paragrafnya.
-    3. Identifikasi kalimat asli yang menyimpang dari topik tersebut dari yang telah Anda temukan pada section / subsection tersebut.
-    4. Bila ada kalimat yang sekiranya memyimpang, Berikan saran dengan menghighlight kalimat tersebut untuk diulis ulang kalimat (rewording) tersebut agar relevan dan menyatu kembali dengan topik utamanya, sambil berusaha mempertahankan maksud aslinya jika memungkinkan.
-    5. Kalau ada kata yang merupakan bahasa inggris, biarkan saja dan tidak perlu ditranslate ke bahasa indonesia, Anda cukup highlight kata tersebut
-    6. Kalau ada kata yang tidak baku sesuai dengan standar KBBI, harap Anda perbaiki juga sehingga kata tersebut baku sesuai standar KBBI
+    def _build_index(self):
+        self._postings = {}
+        ngram = self.ngram
+        for index, normalized in enumerate(self._normalized):
+            for gram in {normalized[i:i + ngram] for i in range(len(normalized) - ngram + 1)}:
+                self._postings.setdefault(gram, []).append(index)
 
-    Berikan hasil dalam format yang SANGAT KETAT seperti di bawah ini. Ulangi format ini untuk setiap kalimat menyimpang yang Anda temukan:
-    [TOPIK UTAMA] topik utama dari bagian tersebut -> [TEKS ASLI] kalimat asli yang tidak koheren -> [SARAN REVISI] versi kalimat yang sudah diperbaiki agar koheren
+    def _candidates(self, needle, skip):
+        if self._postings is None:
+            self._build_index()
+        grams = {needle[i:i + self.ngram] for i in range(len(needle) - self.ngram + 1)}
+        postings = sorted((self._postings[gram] for gram in grams if gram in self._postings), key=len)
+        if not postings:
+            return []
+        votes = Counter()
+        for paragraph_ids in postings[:LOCATOR_QUERY_NGRAMS]:
+            votes.update(paragraph_ids)
+        for index in skip:
+            votes.pop(index, None)
+        return [index for index, _ in votes.most_common(LOCATOR_MAX_CANDIDATES)]
 
-    Jika seluruh dokumen sudah koheren dan tidak ada masalah, kembalikan teks: "TIDAK ADA MASALAH KOHERENSI"
+    def _match_in(self, index, needle):
+        normalized = self._normalized[index]
+        if not normalized:
+            return None
+        position = normalized.find(needle)
+        if position >= 0:
+            start, end, confidence = position, position + len(needle), 1.0
+        else:
+            blocks = [block for block in difflib.SequenceMatcher(None, needle, normalized, autojunk=False)
+                      .get_matching_blocks() if block.size >= 3]
+            if not blocks:
+                return None
+            start, end = blocks[0].b, blocks[-1].b + blocks[-1].size
+            matched = sum(block.size for block in blocks)
+            # Potongan yang cocok tetapi berserakan di paragraf yang jauh lebih panjang tidak dihitung penuh
+            confidence = matched / max(len(needle), end - start)
+        if index not in self._offsets:
+            self._offsets[index] = _normalize_with_offsets(self.texts[index])[1]
+        offsets = self._offsets[index]
+        return {
+            "paragraf": index,
+            "awal": offsets[start],
+            "akhir": offsets[end - 1] + 1,
+            "keyakinan": round(confidence, 3),
+        }
 
-    Teks:
-    ---
-    {full_text}
-    """
-    try:
-        response = model.generate_content(prompt)
-        pattern = re.compile(r"\[TOPIK UTAMA\]\s*(.*?)\s*->\s*\[TEKS ASLI\]\s*(.*?)\s*->\s*\[SARAN REVISI\]\s*(.*?)\s*(\n|$)", re.IGNORECASE | re.DOTALL)
-        found_issues = pattern.findall(response.text)
-        return [{"topik": topik.strip(), "asli": asli.strip(), "saran": saran.strip()} for topik, asli, saran, _ in found_issues]
-    except Exception as e:
-        print(f"Terjadi kesalahan saat menghubungi AI: {e}")
-        return [{"topik": "ERROR", "asli": str(e), "saran": "Gagal menghubungi API"}]
+    def locate(self, text, hint=None, skip=()):
+        """Posisi terbaik untuk `text` -> {"paragraf", "awal", "akhir", "keyakinan"} atau None.
 
-def get_structural_recommendations(full_text):
-    """Menganalisis restrukturisasi (tanpa st)."""
-    if not full_text or full_text.isspace():
-        return []
+        `hint` (indeks paragraf, mis. dari `Lokasi.paragraf`) diperiksa lebih dulu.
+        Paragraf di `skip` tidak dipertimbangkan, mis. untuk kalimat yang berulang
+        di beberapa paragraf dan sudah dipetakan ke salah satunya.
+        """
+        needle = _normalize_needle(text)
+        if not needle:
+            return None
+        best = None
+        if isinstance(hint, int) and 0 <= hint < len(self.texts):
+            best = self._match_in(hint, needle)
+            if best is not None and best["keyakinan"] == 1.0:
+                return best
+        if len(needle) >= self.ngram:
+            candidates = self._candidates(needle, skip)
+        else:
+            candidates = [index for index, normalized in enumerate(self._normalized)
+                          if needle in normalized and index not in skip]
+        for index in candidates:
+            if index == hint:
+                continue
+            match = self._match_in(index, needle)
+            if match and (best is None or match["keyakinan"] > best["keyakinan"]):
+                best = match
+                if best["keyakinan"] == 1.0:
+                    break
+        if best is None or best["keyakinan"] < self.min_confidence:
+            return None
+        return best
+
+    def find_term(self, index, term, start=0, end=None):
+        """Rentang (awal, akhir) `term` di paragraf `index`, diutamakan di dalam [start, end).
 
-    prompt = f"""
-    Anda adalah seorang auditor ahli... (Salin prompt 'restrukturisasi' Anda ke sini) ...
-    Berikan hasil dalam format JSON yang berisi sebuah list. Setiap objek harus memiliki tiga kunci: "misplaced_paragraph", "original_section", dan "recommended_section".
+        Huruf besar/kecil diabaikan jika tidak ada yang persis sama; di luar rentang
+        dipilih kemunculan yang paling dekat. None jika tidak ada.
+        """
+        text = self.texts[index]
+        end = len(text) if end is None else end
+        position = text.find(term, start, end)
+        if position >= 0:
+            return position, position + len(term)
+        pattern = re.compile(re.escape(term), re.IGNORECASE)
+        match = pattern.search(text, start, end)
+        if match:
+            return match.span()
+        spans = [match.span() for match in pattern.finditer(text)]
+        if not spans:
+            return None
+        return min(spans, key=lambda span: abs(span[0] - start))
 
-    Contoh Format JSON:
-    [
-      {{
-        "misplaced_paragraph": "Selain itu, audit internal juga bertugas memeriksa laporan keuangan setiap kuartal...",
-        "original_section": "Bab 2.1: Prosedur Whistleblowing",
-        "recommended_section": "Bab 4.2: Peran Audit Internal"
-      }}
-    ]
-    Jika dokumen sudah bagus, kembalikan list kosong: []
+def _resolve_findings(doc, errors):
+    """Memetakan setiap temuan ke kemunculan kata salah yang tepat di dokumen.
 
-    Teks Dokumen:
-    ---
-    {full_text}
+    Kalimat temuan dicari dengan ParagraphLocator (diawali paragraf `Lokasi.paragraf`
+    jika ada), lalu kata salah dicari di dalam kalimat itu. Mengembalikan
+    (paragraf, {indeks_paragraf: [(awal, akhir, benar)]}, temuan_yang_tidak_ditemukan).
     """
-    try:
-        response = model.generate_content(prompt)
-        cleaned_response = re.sub(r'```json\s*|\s*```', '', response.text.strip())
-        return json.loads(cleaned_response)
-    except Exception as e:
-        print(f"Failed to Generate Response from AI: {e}")
-        return [{"misplaced_paragraph": "ERROR", "original_section": str(e), "recommended_section": "Gagal menghubungi API"}]
+    paragraphs = list(_iter_docx_paragraphs(doc))
+    locator = None
+    targets = {}
+    unresolved = []
+    # Paragraf yang sudah dipakai per (kata salah, kalimat): temuan kembar tanpa lokasi
+    # (kalimat baku yang berulang) dipetakan ke kemunculan berikutnya, bukan yang sama
+    used = {}
+    for error in errors:
+        salah = error.get("Kata/Frasa Salah") or ""
+        if not salah.strip() or salah == "ERROR":
+            continue
+        if locator is None:
+            locator = ParagraphLocator(_paragraph_segments(para._p)[1] for para in paragraphs)
+        location = error.get("Lokasi")
+        hint = location.get("paragraf") if isinstance(location, dict) else None
+        used_key = (salah.lower(), _normalize_needle(error.get("Pada Kalimat")))
+        skip = used.setdefault(used_key, set())
+        found = locator.locate(error.get("Pada Kalimat") or "", hint, skip) if skip else None
+        found = found or locator.locate(error.get("Pada Kalimat") or "", hint)
+        if found is None and isinstance(hint, int) and 0 <= hint < len(paragraphs):
+            found = {"paragraf": hint, "awal": 0, "akhir": None}
+        span = found and locator.find_term(found["paragraf"], salah, found["awal"], found["akhir"])
+        if not span:
+            unresolved.append(error)
+            continue
+        skip.add(found["paragraf"])
+        # Temuan terakhir menang jika kemunculan yang sama dilaporkan lebih dari sekali
+        targets.setdefault(found["paragraf"], {})[span] = error.get("Perbaikan Sesuai KBBI") or ""
+    targets = {
+        index: _non_overlapping([span + (benar,) for span, benar in spans.items()])
+        for index, spans in targets.items()
+    }
+    return paragraphs, targets, unresolved
 
 # --- Fungsi Pemrosesan Dokumen (Disalin langsung) ---
 
-def generate_revised_docx(file_bytes, errors):
-    doc = docx.Document(io.BytesIO(file_bytes))
-    for error in reversed(errors):
-        salah = error["Kata/Frasa Salah"]
-        benar = error["Perbaikan Sesuai KBBI"]
-        for para in doc.paragraphs:
-            if salah in para.text:
-                # Logika penggantian teks sederhana
-                # Catatan: Logika Anda sebelumnya untuk mempertahankan font rumit
-                # dan mungkin perlu disempurnakan. Ini adalah versi sederhana.
-                para.text = para.text.replace(salah, benar) 
-    output_buffer = io.BytesIO()
-    doc.save(output_buffer)
-    return output_buffer.getvalue()
+def _apply_revisions(doc, errors, resolved=None):
+    """Mengganti kemunculan kata salah yang ditunjuk temuan; temuan yang tidak bisa
+    dipetakan ke satu kemunculan tetap diganti di semua tempat seperti sebelumnya."""
+    paragraphs, targets, unresolved = resolved or _resolve_findings(doc, errors)
+    for index, edits in targets.items():
+        _replace_spans(paragraphs[index]._p, edits)
+    replacements = _error_replacements(unresolved)
+    if replacements:
+        # Satu regex untuk semua kesalahan, satu kali jalan untuk semua paragraf
+        pattern = _compile_terms(replacements)
+        for para in paragraphs:
+            _replace_in_paragraph(para._p, pattern, replacements)
 
-def generate_highlighted_docx(file_bytes, errors):
-    doc = docx.Document(io.BytesIO(file_bytes))
-    unique_salah = set(error["Kata/Frasa Salah"] for error in errors)
-    for para in doc.paragraphs:
-        for term in unique_salah:
-            if term.lower() in para.text.lower():
-                full_text = para.text
-                para.clear()
-                parts = re.split(f'({re.escape(term)})', full_text, flags=re.IGNORECASE)
-                for part in parts:
-                    if part:
-                        run = para.add_run(part)
-                        if part.lower() == term.lower():
-                            run.font.highlight_color = WD_COLOR_INDEX.YELLOW
-                        # Pertahankan style dasar (jika perlu, logika bisa ditambahkan di sini)
+def _apply_highlights(doc, errors, previous_colors=None, resolved=None):
+    paragraphs, targets, unresolved = resolved or _resolve_findings(doc, errors)
+    for index, spans in targets.items():
+        _highlight_spans(paragraphs[index], [(start, end) for start, end, _ in spans],
+                         previous_colors=previous_colors)
+    unique_salah = set(_error_replacements(unresolved))
+    if unique_salah:
+        pattern = _compile_terms(unique_salah, ignore_case=True)
+        for para in paragraphs:
+            _highlight_in_paragraph(para, pattern, previous_colors=previous_colors)
+
+def _save_docx(doc, output=None):
+    """Menyimpan ke `output` (file object) jika diberikan, jika tidak mengembalikan bytes."""
+    if output is not None:
+        doc.save(output)
+        output.seek(0)
+        return output
     output_buffer = io.BytesIO()
     doc.save(output_buffer)
     return output_buffer.getvalue()
 
+@_stage("dokumen")
+def generate_revised_docx(source, errors, output=None):
+    doc = _open_docx(source)
+    _apply_revisions(doc, errors)
+    return _save_docx(doc, output)
+
+@_stage("dokumen")
+def generate_highlighted_docx(source, errors, output=None):
+    doc = _open_docx(source)
+    _apply_highlights(doc, errors)
+    return _save_docx(doc, output)
+
+@_stage("dokumen")
+def generate_proofread_docx_pair(source, errors, revised_output, highlighted_output):
+    """Versi revisi dan highlight dari satu kali parsing DOCX.
+
+    Highlight dipasang dan disimpan lebih dulu, lalu dikembalikan ke warna semula
+    sebelum teks diganti. Teks dan format hasilnya sama dengan dua fungsi terpisah
+    di atas; hanya run yang sempat dipecah untuk highlight tetap terpecah.
+    """
+    doc = _open_docx(source)
+    # Highlight tidak mengubah teks, jadi posisi temuan cukup dicari sekali untuk keduanya
+    resolved = _resolve_findings(doc, errors)
+    previous_colors = []
+    _apply_highlights(doc, errors, previous_colors, resolved)
+    _save_docx(doc, highlighted_output)
+    for run, color in reversed(previous_colors):
+        run.font.highlight_color = color
+    _apply_revisions(doc, errors, resolved)
+    _save_docx(doc, revised_output)
+    return revised_output, highlighted_output
+
+class _ZipChunkWriter:
+    """Tujuan tulis ZipFile tanpa seek: bytes yang sudah ditulis diambil dengan `drain()`."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_zip_archive(members):
+    """Membuat zip sambil dikirim: [(nama_di_zip, file_object), ...] -> potongan bytes.
+
+    Isi setiap file disalin per potongan, jadi zip utuh tidak pernah ada di memori.
+    """
+    writer = _ZipChunkWriter()
+    with _stage("zip"):
+        with zipfile.ZipFile(writer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for arcname, member in members:
+                with zip_file.open(arcname, 'w') as target:
+                    for chunk in iter(lambda: member.read(UPLOAD_CHUNK_BYTES), b""):
+                        target.write(chunk)
+                        data = writer.drain()
+                        if data:
+                            yield data
+        yield writer.drain()
+
+@_stage("zip")
 def create_zip_archive(revised_data, highlighted_data, original_filename):
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        zip_file.writestr(f"revisi_{original_filename}", revised_data)
-        zip_file.writestr(f"highlight_{original_filename}", highlighted_data)
-    return zip_buffer.getvalue()
+    return b"".join(iter_zip_archive([
+        (f"revisi_{original_filename}", io.BytesIO(revised_data)),
+        (f"highlight_{original_filename}", io.BytesIO(highlighted_data)),
+    ]))
 
-def extract_paragraphs(file_bytes):
+# --- Mesin Perbandingan Dokumen ---
+
+# Paragraf yang berubah dipasangkan jika kemiripan kata (Dice) minimal segini
+COMPARE_PAIR_THRESHOLD = float(os.getenv("COMPARE_PAIR_THRESHOLD", "0.5"))
+# Paragraf yang hilang di satu tempat dan muncul di tempat lain dianggap dipindah
+# jika kemiripannya minimal segini
+COMPARE_MOVE_THRESHOLD = float(os.getenv("COMPARE_MOVE_THRESHOLD", "0.8"))
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;:])\s+(?=["“(\[]?[A-Z0-9])')
+
+@_stage("ekstraksi")
+def extract_paragraphs(source, file_extension='docx'):
+    """Paragraf tidak kosong dari DOCX; untuk PDF dipakai kalimat karena baris PDF mengikuti tata letak."""
+    if file_extension == 'pdf':
+        pages = _extract_text_with_pages(source, 'pdf')
+        text = _normalize_text(" ".join(page['teks'] for page in pages))
+        return [sentence for sentence in _SENTENCE_BOUNDARY.split(text) if sentence]
+    if file_extension != 'docx':
+        raise ValueError("Format file tidak didukung. Harap unggah .pdf atau .docx")
     try:
-        source_stream = io.BytesIO(file_bytes)
-        doc = docx.Document(source_stream)
+        doc = _open_docx(source)
         return [p.text for p in doc.paragraphs if p.text.strip() != ""]
     except Exception as e:
         raise ValueError(f"Gagal membaca file docx: {e}")
 
-def find_word_diff(original_para, revised_para):
-    matcher = difflib.SequenceMatcher(None, original_para.split(), revised_para.split())
+def _longest_increasing_pairs(pairs):
+    """Patience sorting: subbarisan terpanjang dari (i, j) terurut i yang j-nya juga naik."""
+    tails = []
+    tail_pairs = []
+    previous = {}
+    for pair in pairs:
+        position = bisect.bisect_left(tails, pair[1])
+        if position == len(tails):
+            tails.append(pair[1])
+            tail_pairs.append(pair)
+        else:
+            tails[position] = pair[1]
+            tail_pairs[position] = pair
+        previous[pair] = tail_pairs[position - 1] if position else None
+    result = []
+    pair = tail_pairs[-1] if tail_pairs else None
+    while pair is not None:
+        result.append(pair)
+        pair = previous[pair]
+    return result[::-1]
+
+def _match_sequences(a, b):
+    """Mencocokkan dua list hash paragraf dengan patience diff, fallback ke histogram diff.
+
+    Paragraf yang unik di kedua sisi dipakai sebagai jangkar; jika tidak ada, dipakai
+    paragraf dengan kemunculan paling sedikit. Mengembalikan pasangan (i, j) terurut.
+    """
+    matches = []
+    regions = [(0, len(a), 0, len(b))]
+    while regions:
+        a_lo, a_hi, b_lo, b_hi = regions.pop()
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            matches.append((a_lo, b_lo))
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+            matches.append((a_hi, b_hi))
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+
+        a_positions = {}
+        for i in range(a_lo, a_hi):
+            a_positions.setdefault(a[i], []).append(i)
+        b_positions = {}
+        for j in range(b_lo, b_hi):
+            b_positions.setdefault(b[j], []).append(j)
+        common = [key for key in a_positions if key in b_positions]
+        if not common:
+            continue
+
+        unique = [(a_positions[key][0], b_positions[key][0]) for key in common
+                  if len(a_positions[key]) == 1 and len(b_positions[key]) == 1]
+        if unique:
+            anchors = _longest_increasing_pairs(sorted(unique))
+        else:
+            rarest = min(common, key=lambda key: len(a_positions[key]) + len(b_positions[key]))
+            anchors = list(zip(a_positions[rarest], b_positions[rarest]))
+
+        matches.extend(anchors)
+        previous_i, previous_j = a_lo, b_lo
+        for i, j in anchors:
+            regions.append((previous_i, i, previous_j, j))
+            previous_i, previous_j = i + 1, j + 1
+        regions.append((previous_i, a_hi, previous_j, b_hi))
+    return sorted(matches)
+
+def _similar_pairs(a_indices, b_indices, a_words, b_words, threshold):
+    """Memasangkan paragraf berdasarkan kemiripan himpunan kata (Dice), serakah dari skor tertinggi.
+
+    Kandidat dicari lewat indeks kata sehingga paragraf tanpa kata yang sama tidak pernah dibandingkan.
+    """
+    if not a_indices or not b_indices:
+        return []
+    postings = {}
+    for j in b_indices:
+        for word in b_words[j]:
+            postings.setdefault(word, []).append(j)
+    candidates = []
+    for i in a_indices:
+        shared = Counter()
+        for word in a_words[i]:
+            shared.update(postings.get(word, ()))
+        for j, count in shared.items():
+            score = 2 * count / (len(a_words[i]) + len(b_words[j]))
+            if score >= threshold:
+                candidates.append((score, i, j))
+    candidates.sort(key=lambda candidate: (-candidate[0], candidate[1], candidate[2]))
+    used_a, used_b, pairs = set(), set(), []
+    for score, i, j in candidates:
+        if i not in used_a and j not in used_b:
+            used_a.add(i)
+            used_b.add(j)
+            pairs.append((i, j))
+    return pairs
+
+def _word_diff(original_words, revised_words):
+    """Kata revisi yang diganti/ditambahkan, dari array kata yang sudah dipecah."""
+    matcher = difflib.SequenceMatcher(None, original_words, revised_words, autojunk=False)
     diffs = []
     for tag, i1, i2, j1, j2 in matcher.get_opcodes():
         if tag == 'replace' or tag == 'insert':
-            diffs.append(" ".join(revised_para.split()[j1:j2]))
+            diffs.append(" ".join(revised_words[j1:j2]))
     return ", ".join(diffs) if diffs else "Perubahan Minor"
 
-def create_comparison_docx(df):
-    doc = Document()
+def find_word_diff(original_para, revised_para):
+    return _word_diff(original_para.split(), revised_para.split())
+
+@_stage("perbandingan")
+def compare_paragraphs(original_paras, revised_paras):
+    """Membandingkan dua list paragraf: diubah, ditambah, dihapus, dan dipindah.
+
+    Hasil diurutkan mengikuti posisi di dokumen revisi.
+    """
+    hash_ids = {}
+    a = [hash_ids.setdefault(_normalize_text(p), len(hash_ids)) for p in original_paras]
+    b = [hash_ids.setdefault(_normalize_text(p), len(hash_ids)) for p in revised_paras]
+    a_tokens = [p.split() for p in original_paras]
+    b_tokens = [p.split() for p in revised_paras]
+    a_words = [set(tokens) for tokens in a_tokens]
+    b_words = [set(tokens) for tokens in b_tokens]
+
+    rows = []
+
+    def add_row(sort_key, kind, i=None, j=None):
+        rows.append((sort_key, {
+            "Jenis Perubahan": kind,
+            "Kalimat Awal": original_paras[i] if i is not None else "",
+            "Kalimat Revisi": revised_paras[j] if j is not None else "",
+            "Kata yang Direvisi": _word_diff(a_tokens[i], b_tokens[j]) if kind == "Diubah" or (
+                kind == "Dipindah" and a[i] != b[j]) else "",
+        }))
+
+    # Celah di antara paragraf yang cocok berisi paragraf yang berubah
+    # deleted: indeks awal -> posisi celah di dokumen revisi; inserted: indeks revisi (urut)
+    deleted, inserted = {}, {}
+    previous_i = previous_j = 0
+    for i, j in _match_sequences(a, b) + [(len(a), len(b))]:
+        gap_a = list(range(previous_i, i))
+        gap_b = list(range(previous_j, j))
+        pairs = _similar_pairs(gap_a, gap_b, a_words, b_words, COMPARE_PAIR_THRESHOLD)
+        for pair_i, pair_j in pairs:
+            add_row((pair_j, 1, pair_i), "Diubah", pair_i, pair_j)
+        paired_a = {pair_i for pair_i, _ in pairs}
+        paired_b = {pair_j for _, pair_j in pairs}
+        deleted.update((index, previous_j) for index in gap_a if index not in paired_a)
+        inserted.update(dict.fromkeys(index for index in gap_b if index not in paired_b))
+        previous_i, previous_j = i + 1, j + 1
+
+    # Paragraf yang hilang di satu celah dan muncul di celah lain: yang identik dulu
+    # (lewat hash), sisanya berdasarkan kemiripan
+    inserted_by_hash = {}
+    for j in inserted:
+        inserted_by_hash.setdefault(b[j], []).append(j)
+    moves = []
+    for i in deleted:
+        if inserted_by_hash.get(a[i]):
+            moves.append((i, inserted_by_hash[a[i]].pop(0)))
+    moved_a = {i for i, _ in moves}
+    moved_b = {j for _, j in moves}
+    moves += _similar_pairs([i for i in deleted if i not in moved_a], [j for j in inserted if j not in moved_b],
+                            a_words, b_words, COMPARE_MOVE_THRESHOLD)
+    for i, j in moves:
+        add_row((j, 1, i), "Dipindah", i, j)
+        del deleted[i]
+        del inserted[j]
+    for i, position in deleted.items():
+        add_row((position, 0, i), "Dihapus", i=i)
+    for j in inserted:
+        add_row((j, 1, -1), "Ditambah", j=j)
+
+    rows.sort(key=lambda row: row[0])
+    return [row for _, row in rows]
+
+@_stage("dokumen")
+def create_comparison_docx(rows):
+    """Tabel perbandingan dari list baris (dict); kolom mengikuti urutan kunci yang pertama muncul."""
+    import docx
+
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    doc = docx.Document()
     doc.add_heading('Hasil Perbandingan Dokumen', level=1)
     doc.add_paragraph()
-    table = doc.add_table(rows=1, cols=len(df.columns))
+    table = doc.add_table(rows=len(rows) + 1, cols=len(columns))
     table.style = 'Table Grid'
-    hdr_cells = table.rows[0].cells
-    for i, col_name in enumerate(df.columns):
-        hdr_cells[i].text = col_name
-    for index, row in df.iterrows():
-        row_cells = table.add_row().cells
-        for i, col_name in enumerate(df.columns):
-            row_cells[i].text = str(row[col_name])
+    for table_row, values in zip(table.rows, [columns] + [[row.get(column, "") for column in columns] for row in rows]):
+        for cell, value in zip(table_row.cells, values):
+            cell.text = str(value)
     output_buffer = io.BytesIO()
     doc.save(output_buffer)
     return output_buffer.getvalue()
 
-def create_recommendation_highlight_docx(file_bytes, recommendations):
-    doc = docx.Document(io.BytesIO(file_bytes))
-    misplaced_paragraphs = [rec.get("Paragraf yang Perlu Dipindah") for rec in recommendations]
-    for para in doc.paragraphs:
-        if para.text.strip() in [p.strip() for p in misplaced_paragraphs if p]:
-            for run in para.runs:
+@_stage("dokumen")
+def create_recommendation_highlight_docx(source, recommendations, output=None):
+    """Highlight paragraf yang disarankan untuk dipindah, dicari secara fuzzy dengan ParagraphLocator."""
+    from docx.enum.text import WD_COLOR_INDEX
+
+    doc = _open_docx(source)
+    paragraphs = list(_iter_docx_paragraphs(doc))
+    locator = ParagraphLocator(para.text for para in paragraphs)
+    for rec in recommendations:
+        found = locator.locate(rec.get("Paragraf yang Perlu Dipindah") or "")
+        if found is not None:
+            for run in paragraphs[found["paragraf"]].runs:
                 run.font.highlight_color = WD_COLOR_INDEX.YELLOW
-    output_buffer = io.BytesIO()
-    doc.save(output_buffer)
-    return output_buffer.getvalue()
+    return _save_docx(doc, output)
+
+# --- Antrean Job Asinkron ---
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(tempfile.gettempdir(), "proofread_jobs.sqlite3"))
+JOB_STORAGE_DIR = os.getenv("JOB_STORAGE_DIR", os.path.join(tempfile.gettempdir(), "proofread_jobs"))
+# Jumlah thread worker job di setiap proses web. Set 0 jika job hanya dikerjakan
+# oleh proses terpisah (`python app.py worker`).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+# Job "running" yang tidak ada kabarnya selama ini dianggap ditinggal worker yang mati
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+# Selama job berjalan, worker memperbarui updated_at sesering ini walau progress tidak
+# bergerak (mis. satu panggilan model atau tahap batch yang lama). Harus jauh di bawah JOB_STALE_SECONDS.
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+class JobQueue:
+    """Antrean job berbasis SQLite (tanpa broker eksternal).
+
+    File unggahan disimpan di `storage_dir`, status dan hasil job di SQLite,
+    sehingga proses web dan proses worker cukup berbagi disk yang sama.
+    """
+
+    def __init__(self, db_path, storage_dir, stale_seconds=900, retention_seconds=24 * 3600):
+        self.db_path = db_path
+        self.storage_dir = storage_dir
+        self.stale_seconds = stale_seconds
+        self.retention_seconds = retention_seconds
+        os.makedirs(self.storage_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                "files TEXT NOT NULL, progress_done INTEGER NOT NULL DEFAULT 0, "
+                "progress_total INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, "
+                "worker TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, kind, uploads):
+        """Memindahkan file unggahan [(nama_file, path_sementara), ...] dan mendaftarkan job baru."""
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.storage_dir, job_id)
+        os.makedirs(job_dir)
+        files = []
+        for index, (filename, upload_path) in enumerate(uploads):
+            path = os.path.join(job_dir, f"{index}_{secure_filename(filename) or 'upload'}")
+            shutil.move(upload_path, path)
+            files.append({"filename": filename, "path": path})
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, files, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(files), now, now)
+            )
+        return job_id
+
+    def claim(self, worker_name):
+        """Mengambil satu job antrean secara atomik; None jika antrean kosong."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND updated_at < ?) ORDER BY created_at LIMIT 1",
+                (now - self.stale_seconds,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, updated_at = ? WHERE id = ?",
+                (worker_name, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        return self.get(row["id"])
+
+    # Semua perubahan oleh worker hanya berlaku selama job masih miliknya: jika job sudah
+    # diambil alih worker lain (dianggap basi), update dari pemilik lama diabaikan.
+    # Mengembalikan False dalam kasus itu.
+
+    def _update_owned(self, job_id, worker_name, assignments="", values=()):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET updated_at = ?{assignments} WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), *values, job_id, worker_name)
+            )
+        return cursor.rowcount > 0
+
+    def heartbeat(self, job_id, worker_name):
+        return self._update_owned(job_id, worker_name)
+
+    def update_progress(self, job_id, worker_name, done, total):
+        return self._update_owned(job_id, worker_name, ", progress_done = ?, progress_total = ?", (done, total))
+
+    def finish(self, job_id, worker_name, result):
+        return self._update_owned(job_id, worker_name, ", status = 'done', result = ?, progress_done = progress_total",
+                                  (json.dumps(result),))
+
+    def fail(self, job_id, worker_name, message, details=None):
+        """`details` (opsional, mis. jeda coba lagi) disimpan di kolom result job yang gagal."""
+        return self._update_owned(job_id, worker_name, ", status = 'failed', error = ?, result = ?",
+                                  (message, json.dumps(details) if details is not None else None))
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["files"] = json.loads(job["files"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def cleanup(self):
+        """Menghapus job (beserta filenya) yang lebih tua dari masa simpan."""
+        cutoff = time.time() - self.retention_seconds
+        with self._connect() as conn:
+            old_ids = [row["id"] for row in conn.execute("SELECT id FROM jobs WHERE created_at < ?", (cutoff,))]
+            conn.execute("DELETE FROM jobs WHERE created_at < ?", (cutoff,))
+        for job_id in old_ids:
+            shutil.rmtree(os.path.join(self.storage_dir, job_id), ignore_errors=True)
+
+
+job_queue = JobQueue(JOB_DB_PATH, JOB_STORAGE_DIR, JOB_STALE_SECONDS, JOB_RETENTION_SECONDS)
+
+def _read_job_file(job, index=0):
+    """(path, ekstensi) file unggahan job; file dibaca langsung dari disk oleh pemakainya."""
+    job_file = job["files"][index]
+    return job_file["path"], job_file["filename"].split('.')[-1].lower()
+
+def _job_heartbeat(job, stop):
+    """Thread pendamping job: menjaga job tetap "hidup" di antrean selama handler berjalan."""
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            if not job_queue.heartbeat(job["id"], job["worker"]):
+                print(f"Job {job['id']} sudah diambil alih worker lain; hasil proses ini tidak akan disimpan")
+                return
+        except sqlite3.Error as e:
+            print(f"Heartbeat job {job['id']} gagal: {e}")
+
+def _run_job(job):
+    handler = JOB_HANDLERS[job["kind"]]
+    timings = StageTimings(f"job:{job['kind']}")
+    token = _stage_timings.set(timings)
+    status = "done"
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_job_heartbeat, args=(job, stop_heartbeat), daemon=True).start()
+    try:
+        result = handler(job, lambda done, total: job_queue.update_progress(job["id"], job["worker"], done, total))
+        job_queue.finish(job["id"], job["worker"], result)
+    except Exception as e:
+        status = "failed"
+        print(f"Job {job['id']} ({job['kind']}) gagal: {e}")
+        # Model tidak tersedia (circuit breaker, rate limit): klien boleh mengirim ulang setelah jeda ini
+        retry_after = getattr(e, "retry_after", None)
+        job_queue.fail(job["id"], job["worker"], str(e),
+                       {"coba_lagi_detik": round(retry_after, 1)} if retry_after else None)
+    finally:
+        stop_heartbeat.set()
+        _stage_timings.reset(token)
+        elapsed = time.perf_counter() - timings.started
+        metrics.observe("job_duration_seconds", elapsed, kind=job["kind"])
+        _log_timing("job", job_id=job["id"], jenis=job["kind"], status=status, detik=round(elapsed, 4),
+                    tahap=timings.as_dict())
+
+def _job_worker_loop(worker_name):
+    while True:
+        try:
+            job = job_queue.claim(worker_name)
+        except sqlite3.Error as e:
+            print(f"Worker {worker_name} gagal mengambil job: {e}")
+            job = None
+        if job is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        _run_job(job)
+
+_job_threads_pid = None
+_job_threads_lock = threading.Lock()
+
+def start_job_workers(count):
+    """Menjalankan `count` thread worker job di proses ini (sekali per proses)."""
+    global _job_threads_pid
+    with _job_threads_lock:
+        # Dicek per PID karena thread tidak ikut tersalin saat gunicorn melakukan fork
+        if _job_threads_pid == os.getpid() or count <= 0:
+            return []
+        _job_threads_pid = os.getpid()
+        threads = []
+        for index in range(count):
+            worker_name = f"{socket.gethostname()}:{os.getpid()}:{index}"
+            thread = threading.Thread(target=_job_worker_loop, args=(worker_name,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
 
 # ==============================================================================
 # ENDPOINTS API (Jembatan antara Frontend dan Backend)
 # ==============================================================================
 
+@app.before_request
+def _ensure_job_workers():
+    # Job yang masih antre (mis. setelah restart) dikerjakan tanpa menunggu ada job baru;
+    # di gunicorn worker sudah dijalankan lewat post_fork, ini untuk server lain
+    start_job_workers(JOB_WORKERS)
+
+@app.before_request
+def _start_request_timing():
+    g.stage_timings_token = _stage_timings.set(StageTimings(request.url_rule.rule if request.url_rule else "unmatched"))
+
+@app.after_request
+def _record_request_timing(response):
+    """Header Server-Timing, histogram per endpoint, dan satu log JSON per request."""
+    timings = _stage_timings.get()
+    if timings is None:
+        return response
+    elapsed = time.perf_counter() - timings.started
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe("http_request_duration_seconds", elapsed, endpoint=endpoint, method=request.method)
+    metrics.inc("http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    response.headers["Server-Timing"] = timings.server_timing()
+    if endpoint not in ("/metrics", "/api/jobs/<job_id>") and not endpoint.startswith("/static"):
+        _log_timing("request", endpoint=endpoint, method=request.method, status=response.status_code,
+                    detik=round(elapsed, 4), tahap=timings.as_dict())
+    return response
+
+@app.teardown_request
+def _end_request_timing(exc):
+    token = g.pop("stage_timings_token", None)
+    if token is not None:
+        _stage_timings.reset(token)
+
+# --- Batas Unggahan & Memori Worker ---
+
+# Ukuran unggahan maksimum per request (MB), di luar itu dijawab 413. 0 = tanpa batas.
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "100"))
+# Job batch menerima satu zip berisi banyak dokumen, jadi batasnya sendiri
+MAX_BATCH_UPLOAD_MB = int(os.getenv("MAX_BATCH_UPLOAD_MB", "1024"))
+# Batas bawaan Flask; _check_uploads menggantinya per request (mis. dengan batas batch)
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024 if MAX_UPLOAD_MB > 0 else None
+# Batas RSS per proses worker (MB). Di atas batas ini request POST baru ditolak (503)
+# dan worker gunicorn diminta berhenti dengan rapi agar diganti proses baru. 0 = tanpa batas.
+WORKER_MEMORY_LIMIT_MB = int(os.getenv("WORKER_MEMORY_LIMIT_MB", "0"))
+_worker_restart_requested = False
+
+def _current_rss_mb():
+    """RSS proses saat ini dari /proc (Linux); None jika tidak tersedia."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _over_memory_limit():
+    if WORKER_MEMORY_LIMIT_MB <= 0:
+        return False
+    rss = _current_rss_mb()
+    return rss is not None and rss > WORKER_MEMORY_LIMIT_MB
+
+@app.before_request
+def _reject_when_over_memory_limit():
+    if request.method == "POST" and _over_memory_limit():
+        response = jsonify({"error": "Server sedang penuh, silakan coba lagi sebentar lagi"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "30"
+        return response
+
+def _is_batch_upload():
+    return request.endpoint == "api_job_submit" and (request.view_args or {}).get("kind") == "batch"
+
+def _upload_limit_mb():
+    return MAX_BATCH_UPLOAD_MB if _is_batch_upload() else MAX_UPLOAD_MB
+
+def _upload_too_large_response():
+    return jsonify({"error": f"File terlalu besar (maksimum {_upload_limit_mb()} MB)"}), 413
+
+@app.before_request
+def _check_uploads():
+    """Menolak unggahan yang terlalu besar (413) atau berekstensi tidak didukung (400) sebelum disalin ke disk."""
+    if request.method != "POST":
+        return None
+    limit_mb = _upload_limit_mb()
+    # Batas keras saat body dibaca, juga untuk unggahan chunked tanpa Content-Length (Flask >= 3.1)
+    request.max_content_length = limit_mb * 1024 * 1024 if limit_mb > 0 else sys.maxsize
+    if limit_mb > 0 and (request.content_length or 0) > limit_mb * 1024 * 1024:
+        return _upload_too_large_response()
+    allowed = BATCH_UPLOAD_EXTENSIONS if _is_batch_upload() else UPLOAD_EXTENSIONS
+    for file in request.files.values():
+        if _upload_extension(file.filename, allowed) is None:
+            expected = " atau ".join(f".{extension}" for extension in allowed)
+            return jsonify({"error": f"Format file tidak didukung. Harap unggah {expected}"}), 400
+    return None
+
+@app.after_request
+def _recycle_worker_over_memory_limit(response):
+    global _worker_restart_requested
+    if (not _worker_restart_requested and request.environ.get("SERVER_SOFTWARE", "").startswith("gunicorn")
+            and _over_memory_limit()):
+        # SIGTERM = graceful shutdown di worker gunicorn: request berjalan diselesaikan dulu
+        _worker_restart_requested = True
+        print(f"RSS worker {os.getpid()} melewati {WORKER_MEMORY_LIMIT_MB} MB, worker akan diganti")
+        os.kill(os.getpid(), signal.SIGTERM)
+    return response
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        # Sudah dipindah (mis. menjadi file job) atau masih terbuka di Windows
+        pass
+
+@app.teardown_request
+def _remove_spooled_uploads(exc):
+    for path in g.pop("spooled_uploads", []):
+        _remove_file(path)
+
+@app.errorhandler(413)
+def _upload_too_large(e):
+    return _upload_too_large_response()
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrik format Prometheus: durasi per endpoint/tahap, panggilan Gemini, dan token."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route('/')
 def home():
     """Menyajikan halaman HTML utama."""
     return render_template('index.html')
 
 # --- Endpoint Fitur 1: Proofreading ---
+def _retry_after(errors):
+    """Jeda (detik) sebelum halaman yang gagal layak dicoba lagi, dari petunjuk API/circuit breaker."""
+    hints = [getattr(error, "retry_after", None) or _retry_hint(error) for error in errors]
+    return max([hint for hint in hints if hint] or [GEMINI_BACKOFF_BASE_SECONDS])
+
+def _failed_pages(units, failures):
+    """[(indeks_unit, error), ...] -> satu entri per halaman yang gagal diperiksa model."""
+    pages = OrderedDict()
+    for index, error in sorted(failures, key=lambda failure: failure[0]):
+        pages.setdefault(units[index]['halaman'], {
+            "halaman": units[index]['halaman'], "penyebab": _failure_reason(error), "pesan": str(error)
+        })
+    return list(pages.values())
+
+class ProofreadIncomplete(Exception):
+    """Sebagian halaman gagal diperiksa model (rate limit, timeout, API mati).
+
+    `rows` berisi temuan halaman yang berhasil. Halaman yang gagal tidak disimpan di
+    `finding_store`, jadi percobaan berikutnya hanya memeriksa ulang halaman itu.
+    """
+
+    def __init__(self, rows, units, failures):
+        self.rows = rows
+        self.failed_pages = _failed_pages(units, failures)
+        self.retry_after = _retry_after(error for _, error in failures)
+        pages = ", ".join(str(page["halaman"]) for page in self.failed_pages)
+        super().__init__(f"{len(self.failed_pages)} halaman gagal diperiksa (halaman {pages}); silakan coba lagi")
+
+
+@app.errorhandler(ProofreadIncomplete)
+def _proofread_incomplete(e):
+    """Unduhan tidak dibuat dari hasil yang bolong; klien diminta mencoba lagi."""
+    response = jsonify({"error": str(e), "halaman_gagal": e.failed_pages})
+    response.headers["Retry-After"] = str(int(e.retry_after + 0.999))
+    return response, 503
+
+@app.errorhandler(AnalysisUnavailable)
+def _analysis_unavailable(e):
+    response = jsonify({"error": str(e), "penyebab": e.penyebab})
+    response.headers["Retry-After"] = str(int(e.retry_after + 0.999))
+    return response, 503
+
+def _page_error_rows(page, found_errors_on_page):
+    rows = []
+    for error in found_errors_on_page:
+        row = {
+            "Kata/Frasa Salah": error['salah'],
+            "Perbaikan Sesuai KBBI": error['benar'],
+            "Pada Kalimat": error['kalimat'],
+            "Ditemukan di Halaman": page['halaman']
+        }
+        if page.get('lokasi'):
+            row["Lokasi"] = page['lokasi']
+        rows.append(row)
+    return rows
+
+def _group_units(indices, units, max_tokens, same_page=True):
+    """Mengelompokkan unit berurutan sampai batas token per panggilan.
+
+    Dengan `same_page`, satu kelompok juga tidak melewati batas halaman/bagian.
+    """
+    groups = []
+    current = []
+    current_tokens = 0
+    for index in indices:
+        tokens = _estimate_tokens(units[index]['teks'])
+        if current and (current_tokens + tokens > max_tokens
+                        or same_page and units[index]['halaman'] != units[current[0]]['halaman']
+                        or same_page and units[index].get('bagian') != units[current[0]].get('bagian')):
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+def _attribute_findings(group_units, findings):
+    """Membagikan temuan satu panggilan ke unit asalnya berdasarkan kalimat/kata yang ditemukan."""
+    per_unit = [[] for _ in group_units]
+    unit_texts = [_normalize_text(unit['teks']).lower() for unit in group_units]
+    for finding in findings:
+        target = 0
+        for needle in (finding.get('kalimat'), finding.get('salah')):
+            needle = _normalize_text(needle).lower()
+            match = next((k for k, text in enumerate(unit_texts) if needle and needle in text), None)
+            if match is not None:
+                target = match
+                break
+        per_unit[target].append(finding)
+    return per_unit
+
+def _proofread_batch(batch, units):
+    """Menjalankan satu batch JSON -> {indeks_unit: temuan}.
+
+    Jika respons tidak valid, batch dipecah dua dan masing-masing dicoba lagi;
+    unit tunggal yang tetap gagal diperiksa dengan format per halaman biasa.
+    Error lain (API, circuit breaker, konfigurasi) langsung menandai semua unit gagal.
+    """
+    ids = {f"u{index}": index for index in batch}
+    try:
+        results = proofread_batch_with_gemini({page_id: units[index]['teks'] for page_id, index in ids.items()})
+        return {ids[page_id]: findings for page_id, findings in results.items()}
+    except InvalidModelResponse as e:
+        print(f"Respons batch ({len(batch)} unit) tidak valid, dipecah ulang: {e}")
+        if len(batch) == 1:
+            return _proofread_group(batch, units)
+        middle = len(batch) // 2
+        findings_by_index = _proofread_batch(batch[:middle], units)
+        findings_by_index.update(_proofread_batch(batch[middle:], units))
+        return findings_by_index
+    except Exception as e:
+        print(f"Terjadi kesalahan saat menghubungi AI: {e}")
+        return {index: e for index in batch}
+
+def _proofread_group(group, units):
+    """Satu panggilan format per halaman untuk sekelompok unit -> {indeks_unit: temuan}.
+
+    Jika API gagal, nilai setiap unit adalah exception-nya (bukan temuan).
+    """
+    try:
+        findings = proofread_with_gemini("\n".join(units[index]['teks'] for index in group))
+    except Exception as e:
+        print(f"Terjadi kesalahan saat menghubungi AI: {e}")
+        return {index: e for index in group}
+    return dict(zip(group, _attribute_findings([units[index] for index in group], findings)))
+
+def _iter_proofread_units(units, stats=None):
+    """Menghasilkan (indeks_unit, unit, temuan, error) untuk setiap unit.
+
+    `error` bernilai None, atau exception jika unit gagal diperiksa model; temuannya
+    lalu hanya berisi hasil aturan lokal dan unit itu tidak disimpan.
+
+    Unit yang isinya sudah pernah diperiksa (sidik jari sama) langsung diambil dari
+    `finding_store`. Unit baru/berubah dicek dulu dengan `local_rules`; hanya unit
+    yang masih perlu model yang dikirim ke Gemini secara paralel.
+
+    `units` boleh berupa iterator (mis. halaman PDF yang masih diekstrak): setiap
+    kelompok unit dikirim ke model begitu lengkap, tanpa menunggu unit terakhir.
+    """
+    version = _analysis_version("proofread")
+    max_tokens = PROOFREAD_BATCH_TOKENS if PROOFREAD_BATCH_MODE else PROOFREAD_GROUP_TOKENS
+    received = []
+    fingerprints = []
+    origins = {}
+    # Hasil final per sidik jari: unit dengan isi identik (mis. paragraf boilerplate) cukup diperiksa sekali
+    resolved = {}
+    pending = {}
+    local_findings = {}
+    waiting = []
+    model_calls = 0
+
+    if PROOFREAD_BATCH_MODE:
+        # Beberapa halaman per panggilan, hasil JSON langsung per unit
+        def check(batch):
+            return _proofread_batch(batch, received)
+    else:
+        def check(group):
+            return _proofread_group(group, received)
+
+    pool = ThreadPoolExecutor(max_workers=GEMINI_MAX_IN_FLIGHT)
+    futures = set()
+
+    def submit(groups):
+        nonlocal model_calls
+        for group in groups:
+            # Setiap kelompok membawa salinan context (timing per request) ke thread pekerja
+            futures.add(pool.submit(contextvars.copy_context().run, check, group))
+        model_calls += len(groups)
+
+    def completed(done):
+        for future in done:
+            futures.discard(future)
+            findings_by_index = future.result()
+            storable = {}
+            for index, unit_findings in findings_by_index.items():
+                fingerprint = fingerprints[index]
+                if isinstance(unit_findings, Exception):
+                    resolved[fingerprint] = (local_findings[fingerprint], unit_findings)
+                    continue
+                resolved[fingerprint] = (local_rules.merge(local_findings[fingerprint], unit_findings), None)
+                storable[fingerprint] = resolved[fingerprint][0]
+            # Unit yang gagal menghubungi API tidak disimpan agar diperiksa ulang di unggahan berikutnya
+            if storable:
+                finding_store.put_many(storable, version)
+            for index in findings_by_index:
+                for same_index in pending.pop(fingerprints[index]):
+                    yield (same_index, received[same_index]) + resolved[fingerprints[index]]
+
+    # List diperiksa ke finding_store sekaligus; iterator per unit begitu unitnya tersedia
+    waves = [units] if isinstance(units, list) else ([unit] for unit in units)
+    try:
+        for wave in waves:
+            start = len(received)
+            received.extend(wave)
+            fingerprints.extend(_fingerprint(unit['teks']) for unit in wave)
+            unknown = set(fingerprints[start:]) - resolved.keys() - pending.keys()
+            stored = finding_store.get_many(unknown, version) if unknown else {}
+            local_only = {}
+            for index in range(start, len(received)):
+                fingerprint = fingerprints[index]
+                if fingerprint in pending:
+                    pending[fingerprint].append(index)
+                    continue
+                if fingerprint not in resolved:
+                    text = received[index]['teks']
+                    if fingerprint in stored:
+                        origins[fingerprint] = "tersimpan"
+                        resolved[fingerprint] = (stored[fingerprint], None)
+                    elif not text.strip() or not local_rules.needs_model(text):
+                        origins[fingerprint] = "lokal"
+                        local_only[fingerprint] = local_rules.check(text) if text.strip() else []
+                        resolved[fingerprint] = (local_only[fingerprint], None)
+                    else:
+                        origins[fingerprint] = "model"
+                        local_findings[fingerprint] = local_rules.check(text)
+                        pending[fingerprint] = [index]
+                        waiting.append(index)
+                        continue
+                yield (index, received[index]) + resolved[fingerprint]
+            if local_only:
+                finding_store.put_many(local_only, version)
+
+            # Kelompok yang sudah lengkap langsung dikirim; kelompok terakhir masih bisa bertambah
+            groups = _group_units(waiting, received, max_tokens, same_page=not PROOFREAD_BATCH_MODE)
+            submit(groups[:-1])
+            waiting = groups[-1] if groups else []
+            yield from completed([future for future in futures if future.done()])
+
+        if waiting:
+            submit([waiting])
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            yield from completed(done)
+    finally:
+        # Jika pemanggil berhenti di tengah jalan (mis. klien memutus stream), batalkan sisa kelompok
+        pool.shutdown(wait=False, cancel_futures=True)
+        if stats is not None:
+            counts = Counter(origins[fingerprint] for fingerprint in fingerprints)
+            stats.update({
+                "unit_total": len(received),
+                "unit_dilewati": counts["tersimpan"],
+                "unit_tanpa_model": counts["lokal"],
+                "panggilan_model": model_calls,
+            })
+
+def _proofread_document(source, file_extension, on_progress=None, stats=None, units=None):
+    """Proofread semua halaman dokumen. Hasil di-cache berdasarkan isi file.
+
+    `stats` (dict, opsional) diisi jumlah unit, unit yang dilewati, dan panggilan model.
+    `units` (opsional) adalah hasil _proofread_units yang sudah diekstrak lebih dulu
+    (mis. di proses lain pada mode batch).
+    Melempar ProofreadIncomplete (tanpa menyimpan ke cache) jika ada halaman yang gagal.
+    """
+    if stats is not None:
+        stats["dari_cache"] = True
+
+    def compute():
+        if stats is not None:
+            stats["dari_cache"] = False
+        source_units, total = (units, len(units)) if units is not None else _proofread_unit_source(source, file_extension)
+        document_units = {}
+        findings_per_unit = {}
+        failures = []
+        units_done = _iter_proofread_units(source_units, stats)
+        for done, (index, unit, findings, error) in enumerate(units_done, start=1):
+            document_units[index] = unit
+            findings_per_unit[index] = findings
+            if error is not None:
+                failures.append((index, error))
+            if on_progress:
+                on_progress(done, total)
+        document_units = [document_units[index] for index in range(len(document_units))]
+        all_errors = []
+        for index, unit in enumerate(document_units):
+            all_errors.extend(_page_error_rows(unit, findings_per_unit[index]))
+        if failures:
+            error = ProofreadIncomplete(all_errors, document_units, failures)
+            if stats is not None:
+                stats["halaman_gagal"] = error.failed_pages
+            raise error
+        return all_errors
+    return _cached("proofread", source, compute)
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_proofread_events(source, file_extension):
+    """Menghasilkan event SSE: satu event "page" per unit begitu selesai, lalu "summary"."""
+    started = time.time()
+    key = _cache_key("proofread", source)
+    stats = {"dari_cache": False}
+    # Isi stream dikirim setelah after_request, jadi durasi tahapnya dicatat sendiri
+    timings = StageTimings("/api/proofread/stream")
+    token = _stage_timings.set(timings)
+    try:
+        units, total = _proofread_unit_source(source, file_extension)
+        cached_errors = result_cache.get(key)
+
+        if cached_errors is not None:
+            stats["dari_cache"] = True
+            page_numbers = sorted(set(unit['halaman'] for unit in units))
+            for done, page_number in enumerate(page_numbers, start=1):
+                rows = [row for row in cached_errors if row["Ditemukan di Halaman"] == page_number]
+                yield _sse_event("page", {
+                    "halaman": page_number, "kesalahan": rows, "selesai": done, "total": len(page_numbers)
+                })
+            all_errors = cached_errors
+        else:
+            # Halaman PDF dikirim ke model selagi halaman berikutnya masih diekstrak
+            received = {}
+            rows_per_unit = {}
+            failures = []
+            units_done = _iter_proofread_units(units, stats)
+            for done, (index, unit, findings, error) in enumerate(units_done, start=1):
+                received[index] = unit
+                rows_per_unit[index] = _page_error_rows(unit, findings)
+                page = {
+                    "halaman": unit['halaman'], "kesalahan": rows_per_unit[index],
+                    "selesai": done, "total": total
+                }
+                if error is not None:
+                    failures.append((index, error))
+                    page.update(gagal=True, penyebab=_failure_reason(error))
+                yield _sse_event("page", page)
+            all_errors = [row for index in sorted(rows_per_unit) for row in rows_per_unit[index]]
+            if failures:
+                stats["halaman_gagal"] = _failed_pages(received, failures)
+                stats["coba_lagi_detik"] = round(_retry_after(error for _, error in failures), 1)
+            else:
+                result_cache.set(key, all_errors)
+
+        yield _sse_event("summary", dict(stats, **{
+            "total_kesalahan": len(all_errors),
+            "durasi_detik": round(time.time() - started, 2),
+            "durasi_tahap": timings.as_dict(),
+        }))
+    except Exception as e:
+        yield _sse_event("error", {"error": str(e)})
+    finally:
+        _stage_timings.reset(token)
+        _log_timing("stream", endpoint="/api/proofread/stream", detik=round(time.time() - started, 4),
+                    tahap=timings.as_dict())
+
 @app.route('/api/proofread/analyze', methods=['POST'])
 def api_proofread_analyze():
     if 'file' not in request.files:
@@ -291,51 +3110,83 @@ def api_proofread_analyze():
     file = request.files['file']
     
     try:
-        document_pages = _get_text_from_flask_file(file)
-        all_errors = []
-        for page in document_pages:
-            found_errors_on_page = proofread_with_gemini(page['teks'])
-            for error in found_errors_on_page:
-                all_errors.append({
-                    "Kata/Frasa Salah": error['salah'],
-                    "Perbaikan Sesuai KBBI": error['benar'],
-                    "Pada Kalimat": error['kalimat'],
-                    "Ditemukan di Halaman": page['halaman']
-                })
-        return jsonify(all_errors)
+        source, file_extension = _read_flask_file(file)
+        stats = {}
+        try:
+            all_errors = _proofread_document(source, file_extension, stats=stats)
+        except ProofreadIncomplete as e:
+            # Temuan halaman yang berhasil tetap dikirim; halaman yang gagal ditandai di header
+            all_errors = e.rows
+            stats["retry_after"] = e.retry_after
+        response = make_response(jsonify(all_errors))
+        if stats.get("halaman_gagal"):
+            response.headers["X-Proofread-Failed-Pages"] = ",".join(
+                str(page["halaman"]) for page in stats["halaman_gagal"])
+            response.headers["Retry-After"] = str(int(stats["retry_after"] + 0.999))
+        # Jumlah unit yang dilewati karena isinya sama dengan pemeriksaan sebelumnya
+        response.headers["X-Proofread-From-Cache"] = str(stats["dari_cache"]).lower()
+        for header, stat in (("X-Proofread-Units-Total", "unit_total"),
+                             ("X-Proofread-Units-Reused", "unit_dilewati"),
+                             ("X-Proofread-Model-Calls", "panggilan_model")):
+            if stat in stats:
+                response.headers[header] = str(stats[stat])
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def _generate_proofread_files(file, file_bytes):
-    """Helper internal untuk menghindari duplikasi kode di endpoint download."""
-    document_pages = _extract_text_with_pages(file_bytes, file.filename.split('.')[-1].lower())
-    all_errors = []
-    for page in document_pages:
-        found_errors = proofread_with_gemini(page['teks'])
-        for error in found_errors:
-             all_errors.append({
-                "Kata/Frasa Salah": error['salah'],
-                "Perbaikan Sesuai KBBI": error['benar'],
-             })
-    
-    revised_data = generate_revised_docx(file_bytes, all_errors)
-    highlighted_data = generate_highlighted_docx(file_bytes, all_errors)
-    return revised_data, highlighted_data, file.filename
+@app.route('/api/proofread/stream', methods=['POST'])
+def api_proofread_stream():
+    """Seperti /api/proofread/analyze, tetapi hasil tiap halaman dikirim via Server-Sent Events."""
+    if 'file' not in request.files:
+        return jsonify({"error": "Tidak ada file"}), 400
+    source, file_extension = _read_flask_file(request.files['file'])
+    # Isi stream dibuat setelah request selesai, jadi file unggahan dihapus oleh generator sendiri
+    g.spooled_uploads.remove(source)
+
+    def events():
+        try:
+            yield from _stream_proofread_events(source, file_extension)
+        finally:
+            _remove_file(source)
+    return Response(
+        events(),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _temp_output():
+    """File sementara anonim untuk hasil unduhan; terhapus sendiri saat ditutup."""
+    return tempfile.TemporaryFile(dir=UPLOAD_SPOOL_DIR)
+
+def _zip_response(members, download_name):
+    """Response zip yang dibuat sambil dikirim; file anggota ditutup setelah selesai."""
+    def generate():
+        try:
+            yield from iter_zip_archive(members)
+        finally:
+            for _, member in members:
+                member.close()
+    response = Response(generate(), mimetype='application/zip')
+    response.headers.set("Content-Disposition", "attachment", filename=download_name)
+    return response
+
+def _proofread_upload(file):
+    """Helper internal untuk endpoint download: unggahan di disk + hasil proofread-nya."""
+    source, file_extension = _read_flask_file(file)
+    return source, _proofread_document(source, file_extension)
 
 @app.route('/api/proofread/download/revised', methods=['POST'])
 def api_proofread_download_revised():
     if 'file' not in request.files:
         return jsonify({"error": "Tidak ada file"}), 400
     file = request.files['file']
-    file_bytes = file.read()
-    
-    revised_data, _, filename = _generate_proofread_files(file, file_bytes)
+    source, all_errors = _proofread_upload(file)
     
     return send_file(
-        io.BytesIO(revised_data),
+        generate_revised_docx(source, all_errors, _temp_output()),
         mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
         as_attachment=True,
-        download_name=f"revisi_{filename}"
+        download_name=f"revisi_{file.filename}"
     )
 
 @app.route('/api/proofread/download/highlighted', methods=['POST'])
@@ -343,15 +3194,13 @@ def api_proofread_download_highlighted():
     if 'file' not in request.files:
         return jsonify({"error": "Tidak ada file"}), 400
     file = request.files['file']
-    file_bytes = file.read()
-    
-    _, highlighted_data, filename = _generate_proofread_files(file, file_bytes)
+    source, all_errors = _proofread_upload(file)
     
     return send_file(
-        io.BytesIO(highlighted_data),
+        generate_highlighted_docx(source, all_errors, _temp_output()),
         mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
         as_attachment=True,
-        download_name=f"highlight_{filename}"
+        download_name=f"highlight_{file.filename}"
     )
 
 @app.route('/api/proofread/download/zip', methods=['POST'])
@@ -359,38 +3208,20 @@ def api_proofread_download_zip():
     if 'file' not in request.files:
         return jsonify({"error": "Tidak ada file"}), 400
     file = request.files['file']
-    file_bytes = file.read()
-    
-    revised_data, highlighted_data, filename = _generate_proofread_files(file, file_bytes)
-    zip_data = create_zip_archive(revised_data, highlighted_data, filename)
+    source, all_errors = _proofread_upload(file)
     
-    return send_file(
-        io.BytesIO(zip_data),
-        mimetype='application/zip',
-        as_attachment=True,
-        download_name=f"hasil_proofread_{filename.split('.')[0]}.zip"
+    # DOCX cukup di-parse sekali untuk kedua versi
+    revised_file, highlighted_file = generate_proofread_docx_pair(source, all_errors, _temp_output(), _temp_output())
+    return _zip_response(
+        [(f"revisi_{file.filename}", revised_file), (f"highlight_{file.filename}", highlighted_file)],
+        f"hasil_proofread_{file.filename.split('.')[0]}.zip"
     )
 
 # --- Endpoint Fitur 2: Perbandingan Dokumen ---
-def _analyze_comparison(file1_bytes, file2_bytes):
-    original_paras = extract_paragraphs(file1_bytes)
-    revised_paras = extract_paragraphs(file2_bytes)
-    comparison_results = []
-    matcher = difflib.SequenceMatcher(None, original_paras, revised_paras)
-    
-    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
-        if tag == 'replace':
-            for i in range(i1, i2):
-                original_para = original_paras[i]
-                revised_para = revised_paras[j1 + (i - i1)] if (j1 + (i - i1)) < j2 else ""
-                if revised_para:
-                    word_diff = find_word_diff(original_para, revised_para)
-                    comparison_results.append({
-                        "Kalimat Awal": original_para,
-                        "Kalimat Revisi": revised_para,
-                        "Kata yang Direvisi": word_diff,
-                    })
-    return comparison_results
+def _analyze_comparison(source1, source2, file1_extension='docx', file2_extension='docx'):
+    original_paras = extract_paragraphs(source1, file1_extension)
+    revised_paras = extract_paragraphs(source2, file2_extension)
+    return compare_paragraphs(original_paras, revised_paras)
 
 @app.route('/api/compare/analyze', methods=['POST'])
 def api_compare_analyze():
@@ -401,7 +3232,9 @@ def api_compare_analyze():
     file2 = request.files['file2']
     
     try:
-        results = _analyze_comparison(file1.read(), file2.read())
+        source1, file1_extension = _read_flask_file(file1)
+        source2, file2_extension = _read_flask_file(file2)
+        results = _analyze_comparison(source1, source2, file1_extension, file2_extension)
         return jsonify(results)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -415,13 +3248,13 @@ def api_compare_download():
     file2 = request.files['file2']
     
     try:
-        results = _analyze_comparison(file1.read(), file2.read())
-        df_comparison = pd.DataFrame(results)
-        
-        if df_comparison.empty:
+        source1, file1_extension = _read_flask_file(file1)
+        source2, file2_extension = _read_flask_file(file2)
+        results = _analyze_comparison(source1, source2, file1_extension, file2_extension)
+        if not results:
             return jsonify({"error": "Tidak ada perbedaan untuk diunduh"}), 400
             
-        docx_data = create_comparison_docx(df_comparison)
+        docx_data = create_comparison_docx(results)
         
         return send_file(
             io.BytesIO(docx_data),
@@ -433,6 +3266,15 @@ def api_compare_download():
         return jsonify({"error": str(e)}), 500
 
 # --- Endpoint Fitur 3: Analisis Koherensi ---
+def _analyze_coherence(source, file_extension, on_progress=None):
+    def compute():
+        chunks = _chunk_sections(_extract_sections(source, file_extension))
+        if len(chunks) <= 1:
+            return analyze_document_coherence("\n".join(chunks))
+        issues_per_chunk = _map_concurrently(analyze_document_coherence, chunks, on_progress)
+        return _merge_chunk_results(issues_per_chunk, "asli")
+    return _cached("coherence", source, compute)
+
 @app.route('/api/coherence/analyze', methods=['POST'])
 def api_coherence_analyze():
     if 'file' not in request.files:
@@ -440,16 +3282,29 @@ def api_coherence_analyze():
     file = request.files['file']
     
     try:
-        full_text = _get_full_text_from_file(file)
-        issues = analyze_document_coherence(full_text)
+        issues = _analyze_coherence(*_read_flask_file(file))
         return jsonify(issues)
+    except AnalysisUnavailable:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 # --- Endpoint Fitur 4: Restrukturisasi Koherensi ---
-def _analyze_restructure(file):
-    full_text = _get_full_text_from_file(file)
-    recommendations = get_structural_recommendations(full_text)
+def _get_recommendations(source, file_extension, on_progress=None):
+    def compute():
+        sections = _extract_sections(source, file_extension)
+        chunks = _chunk_sections(sections)
+        if len(chunks) <= 1:
+            return get_structural_recommendations("\n".join(chunks))
+        outline = [section["judul"] for section in sections if section["judul"]]
+        recommendations_per_chunk = _map_concurrently(
+            lambda chunk: get_structural_recommendations(chunk, outline), chunks, on_progress
+        )
+        return _merge_chunk_results(recommendations_per_chunk, "misplaced_paragraph")
+    return _cached("restructure", source, compute)
+
+def _analyze_restructure(source, file_extension, on_progress=None):
+    recommendations = _get_recommendations(source, file_extension, on_progress)
     processed_results = []
     for rec in recommendations:
         processed_results.append({
@@ -466,8 +3321,10 @@ def api_restructure_analyze():
     file = request.files['file']
     
     try:
-        results = _analyze_restructure(file)
+        results = _analyze_restructure(*_read_flask_file(file))
         return jsonify(results)
+    except AnalysisUnavailable:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -476,11 +3333,10 @@ def api_restructure_download():
     if 'file' not in request.files:
         return jsonify({"error": "Tidak ada file"}), 400
     file = request.files['file']
-    file_bytes = file.read() # Baca sekali
+    source, file_extension = _read_flask_file(file) # Baca sekali
     
     try:
-        full_text = "\n".join([p['teks'] for p in _extract_text_with_pages(file_bytes, file.filename.split('.')[-1].lower())])
-        recommendations = get_structural_recommendations(full_text)
+        recommendations = _get_recommendations(source, file_extension)
         processed_results = []
         for rec in recommendations:
             processed_results.append({
@@ -490,16 +3346,365 @@ def api_restructure_download():
         if not processed_results:
              return jsonify({"error": "Tidak ada rekomendasi untuk diunduh"}), 400
 
-        highlighted_data = create_recommendation_highlight_docx(file_bytes, processed_results)
-        
         return send_file(
-            io.BytesIO(highlighted_data),
+            create_recommendation_highlight_docx(source, processed_results, _temp_output()),
             mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
             as_attachment=True,
             download_name=f"highlight_rekomendasi_{file.filename}"
         )
+    except AnalysisUnavailable:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    
+
+# --- Mode Batch: Proofread Banyak Dokumen Sekaligus ---
+
+# Proses untuk tahap lokal (ekstraksi dan pembuatan DOCX). Panggilan model tetap di
+# proses induk sehingga GEMINI_MAX_IN_FLIGHT berlaku untuk seluruh batch.
+BATCH_PROCESSES = int(os.getenv("BATCH_PROCESSES", str(os.cpu_count() or 1)))
+# Jumlah dokumen yang tahap modelnya berjalan bersamaan
+BATCH_DOCUMENT_CONCURRENCY = int(os.getenv("BATCH_DOCUMENT_CONCURRENCY", "4"))
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "500"))
+BATCH_EXTENSIONS = ("pdf", "docx")
+BATCH_OUTPUT_NAME = "hasil_batch.zip"
+# Isi kolom "Keluaran" di ringkasan: PDF tidak bisa direvisi/di-highlight, hanya masuk daftar temuan
+BATCH_OUTPUT_DOCX = "temuan, revisi/, highlight/"
+BATCH_OUTPUT_PDF = "temuan saja (PDF tidak dibuatkan revisi/highlight)"
+
+def _is_batch_document(name):
+    basename = name.replace("\\", "/").split("/")[-1]
+    return basename.split('.')[-1].lower() in BATCH_EXTENSIONS and not basename.startswith("~$")
+
+def _collect_batch_documents(input_path, work_dir):
+    """Daftar (nama_relatif, path) dokumen PDF/DOCX dari file zip atau direktori.
+
+    Isi zip disalin satu per satu ke `work_dir` dengan nama yang sudah dibersihkan.
+    """
+    documents = []
+    if os.path.isdir(input_path):
+        for root, dirs, files in os.walk(input_path):
+            dirs.sort()
+            for filename in sorted(files):
+                path = os.path.join(root, filename)
+                if _is_batch_document(filename):
+                    documents.append((os.path.relpath(path, input_path).replace(os.sep, "/"), path))
+    elif zipfile.is_zipfile(input_path):
+        seen = set()
+        with zipfile.ZipFile(input_path) as archive:
+            for index, info in enumerate(archive.infolist()):
+                if info.is_dir() or info.filename.startswith("__MACOSX/") or not _is_batch_document(info.filename):
+                    continue
+                name = "/".join(filter(None, (secure_filename(part) for part in info.filename.split("/"))))
+                if not name or name in seen:
+                    name = f"{index}_{name or 'dokumen.' + info.filename.split('.')[-1].lower()}"
+                seen.add(name)
+                path = os.path.join(work_dir, f"{index}_{name.split('/')[-1]}")
+                with archive.open(info) as member, open(path, "wb") as f:
+                    shutil.copyfileobj(member, f, UPLOAD_CHUNK_BYTES)
+                documents.append((name, path))
+    else:
+        raise ValueError("Input batch harus berupa file .zip atau direktori")
+
+    if not documents:
+        raise ValueError("Tidak ada file .pdf atau .docx di input batch")
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        raise ValueError(f"Batch berisi {len(documents)} dokumen, maksimum {BATCH_MAX_DOCUMENTS}")
+    return documents
+
+def _batch_extract(path, file_extension):
+    """Tahap lokal pertama (di proses pool): unit proofread dokumen."""
+    return _proofread_units(path, file_extension)
+
+def _batch_render(path, errors, revised_path, highlighted_path):
+    """Tahap lokal terakhir (di proses pool): versi revisi dan highlight DOCX."""
+    with open(revised_path, "wb") as revised_file, open(highlighted_path, "wb") as highlighted_file:
+        generate_proofread_docx_pair(path, errors, revised_file, highlighted_file)
+
+def _format_location(location):
+    if not isinstance(location, dict):
+        return location or ""
+    return ", ".join(f"{key} {value}" for key, value in location.items())
+
+def _write_batch_archive(output_path, work_dir, documents, findings, rendered, summaries):
+    """Zip akhir: revisi/, highlight/, dan temuan_proofread.xlsx (ringkasan + semua temuan)."""
+    rows = []
+    for name, _ in documents:
+        for error in findings.get(name, []):
+            row = {"Dokumen": name}
+            row.update(error)
+            if "Lokasi" in row:
+                row["Lokasi"] = _format_location(row["Lokasi"])
+            rows.append(row)
+    columns = ["Dokumen", "Kata/Frasa Salah", "Perbaikan Sesuai KBBI", "Pada Kalimat", "Ditemukan di Halaman", "Lokasi"]
+    spreadsheet_path = os.path.join(work_dir, "temuan_proofread.xlsx")
+    import pandas as pd
+
+    with pd.ExcelWriter(spreadsheet_path) as writer:
+        pd.DataFrame([summaries[name] for name, _ in documents]).to_excel(writer, sheet_name="Ringkasan", index=False)
+        pd.DataFrame(rows, columns=columns).to_excel(writer, sheet_name="Temuan", index=False)
+
+    # Ditulis ke file sementara lalu os.replace: pengunduh (atau proses lain yang mengerjakan
+    # job yang sama) tidak pernah melihat zip yang setengah jadi
+    fd, partial_path = tempfile.mkstemp(prefix=".partial_", suffix=".zip",
+                                        dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(spreadsheet_path, "temuan_proofread.xlsx")
+            for name, _ in documents:
+                if name in rendered:
+                    revised_path, highlighted_path = rendered[name]
+                    archive.write(revised_path, f"revisi/{name}")
+                    archive.write(highlighted_path, f"highlight/{name}")
+        os.replace(partial_path, output_path)
+    except BaseException:
+        _remove_file(partial_path)
+        raise
+
+def run_batch(input_path, output_path, on_progress=None, processes=None):
+    """Proofread semua PDF/DOCX dalam zip/direktori menjadi satu zip hasil.
+
+    Setiap dokumen melewati tiga tahap yang saling tumpang tindih antar dokumen:
+    ekstraksi (proses pool) -> model (thread di proses ini, berbagi batas panggilan
+    Gemini) -> DOCX revisi/highlight (proses pool). Mengembalikan ringkasan per dokumen.
+    """
+    work_dir = tempfile.mkdtemp(prefix="batch_", dir=UPLOAD_SPOOL_DIR)
+    try:
+        documents = _collect_batch_documents(input_path, work_dir)
+        summaries = {name: {"Dokumen": name, "Status": "selesai", "Jumlah Temuan": 0,
+                            "Keluaran": BATCH_OUTPUT_DOCX if name.lower().endswith(".docx") else BATCH_OUTPUT_PDF}
+                     for name, _ in documents}
+        findings = {}
+        rendered = {}
+        done = 0
+        # "spawn": proses anak tidak mewarisi thread/lock dari worker web yang sedang berjalan
+        local_pool = ProcessPoolExecutor(max_workers=max(1, processes or BATCH_PROCESSES),
+                                         mp_context=multiprocessing.get_context("spawn"))
+        model_pool = ThreadPoolExecutor(max_workers=BATCH_DOCUMENT_CONCURRENCY)
+        try:
+            pending = {}
+            for name, path in documents:
+                file_extension = name.split('.')[-1].lower()
+                if result_cache.get(_cache_key("proofread", path)) is not None:
+                    # Sudah pernah diperiksa: ekstraksi dilewati, hasil diambil dari cache
+                    future = model_pool.submit(contextvars.copy_context().run, _proofread_document, path, file_extension)
+                    pending[future] = ("model", name, path)
+                else:
+                    pending[local_pool.submit(_batch_extract, path, file_extension)] = ("ekstraksi", name, path)
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, name, path = pending.pop(future)
+                    file_extension = name.split('.')[-1].lower()
+                    try:
+                        result = future.result()
+                    except ProofreadIncomplete as e:
+                        # Temuan halaman yang berhasil tetap dipakai; halaman gagal dicatat di ringkasan
+                        print(f"Batch: {name}: {e}")
+                        summaries[name]["Status"] = f"sebagian gagal (API): {e}"
+                        result = e.rows
+                    except Exception as e:
+                        print(f"Batch: {name} gagal pada tahap {stage}: {e}")
+                        summaries[name]["Status"] = f"gagal ({stage}): {e}"
+                        summaries[name]["Keluaran"] = "temuan saja" if stage == "dokumen" else "tidak ada"
+                        rendered.pop(name, None)
+                        result, stage = None, "gagal"
+
+                    if stage == "ekstraksi":
+                        future = model_pool.submit(contextvars.copy_context().run, _proofread_document,
+                                                   path, file_extension, None, None, result)
+                        pending[future] = ("model", name, path)
+                        continue
+                    if stage == "model":
+                        findings[name] = result
+                        summaries[name]["Jumlah Temuan"] = len(result)
+                        if file_extension == "docx":
+                            index = len(rendered)
+                            rendered[name] = (os.path.join(work_dir, f"revisi_{index}.docx"),
+                                              os.path.join(work_dir, f"highlight_{index}.docx"))
+                            pending[local_pool.submit(_batch_render, path, result, *rendered[name])] = ("dokumen", name, path)
+                            continue
+                    done += 1
+                    if on_progress:
+                        on_progress(done, len(documents))
+        finally:
+            model_pool.shutdown(wait=False, cancel_futures=True)
+            local_pool.shutdown(wait=True, cancel_futures=True)
+
+        _write_batch_archive(output_path, work_dir, documents, findings, rendered, summaries)
+        return [summaries[name] for name, _ in documents]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _batch_job(job, progress):
+    input_path, _ = _read_job_file(job)
+    return run_batch(input_path, os.path.join(os.path.dirname(input_path), BATCH_OUTPUT_NAME), progress)
+
+# --- Endpoint Job Asinkron ---
+def _compare_job(job, progress):
+    source1, file1_extension = _read_job_file(job, 0)
+    source2, file2_extension = _read_job_file(job, 1)
+    return _analyze_comparison(source1, source2, file1_extension, file2_extension)
+
+JOB_HANDLERS = {
+    "proofread": lambda job, progress: _proofread_document(*_read_job_file(job), progress),
+    "coherence": lambda job, progress: _analyze_coherence(*_read_job_file(job), progress),
+    "restructure": lambda job, progress: _analyze_restructure(*_read_job_file(job), progress),
+    "compare": _compare_job,
+    # Satu file .zip berisi banyak PDF/DOCX; hasil diunduh lewat /download/zip
+    "batch": _batch_job,
+}
+
+@app.route('/api/jobs/<kind>', methods=['POST'])
+def api_job_submit(kind):
+    """Menyimpan unggahan sebagai job dan langsung mengembalikan job id."""
+    if kind not in JOB_HANDLERS:
+        return jsonify({"error": f"Jenis job tidak dikenal: {kind}"}), 404
+    field_names = ['file1', 'file2'] if kind == 'compare' else ['file']
+    if any(name not in request.files for name in field_names):
+        return jsonify({"error": "Butuh dua file" if kind == 'compare' else "Tidak ada file"}), 400
+
+    try:
+        uploads = [(request.files[name].filename, _read_flask_file(request.files[name])[0]) for name in field_names]
+        job_id = job_queue.submit(kind, uploads)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    start_job_workers(JOB_WORKERS)
+    return jsonify({"job_id": job_id, "status": "queued"}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job tidak ditemukan"}), 404
+    status = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": {"done": job["progress_done"], "total": job["progress_total"]},
+    }
+    if job["status"] == "done":
+        status["result"] = job["result"]
+    if job["status"] == "failed":
+        status["error"] = job["error"]
+        if job["result"] and job["result"].get("coba_lagi_detik"):
+            status["coba_lagi_detik"] = job["result"]["coba_lagi_detik"]
+            response = jsonify(status)
+            response.headers["Retry-After"] = str(int(status["coba_lagi_detik"] + 0.999))
+            return response, 503
+    return jsonify(status)
+
+@app.route('/api/jobs/<job_id>/download/<variant>', methods=['GET'])
+def api_job_download(job_id, variant):
+    """Membuat file unduhan dari hasil job yang sudah selesai (tanpa memanggil AI lagi)."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job tidak ditemukan"}), 404
+    if job["status"] != "done":
+        return jsonify({"error": "Job belum selesai"}), 409
+
+    docx_mimetype = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    filename = job["files"][0]["filename"]
+    try:
+        source, _ = _read_job_file(job)
+        if job["kind"] == "proofread" and variant in ("revised", "highlighted", "zip"):
+            if variant == "revised":
+                return send_file(generate_revised_docx(source, job["result"], _temp_output()),
+                                 mimetype=docx_mimetype, as_attachment=True, download_name=f"revisi_{filename}")
+            if variant == "highlighted":
+                return send_file(generate_highlighted_docx(source, job["result"], _temp_output()),
+                                 mimetype=docx_mimetype, as_attachment=True, download_name=f"highlight_{filename}")
+            revised_file, highlighted_file = generate_proofread_docx_pair(
+                source, job["result"], _temp_output(), _temp_output())
+            return _zip_response([(f"revisi_{filename}", revised_file), (f"highlight_{filename}", highlighted_file)],
+                                 f"hasil_proofread_{filename.split('.')[0]}.zip")
+
+        if job["kind"] == "batch" and variant == "zip":
+            return send_file(os.path.join(os.path.dirname(source), BATCH_OUTPUT_NAME), mimetype='application/zip',
+                             as_attachment=True, download_name=f"hasil_batch_{filename.rsplit('.', 1)[0]}.zip")
+
+        if job["kind"] == "restructure" and variant == "highlighted":
+            if not job["result"]:
+                return jsonify({"error": "Tidak ada rekomendasi untuk diunduh"}), 400
+            return send_file(create_recommendation_highlight_docx(source, job["result"], _temp_output()),
+                             mimetype=docx_mimetype, as_attachment=True,
+                             download_name=f"highlight_rekomendasi_{filename}")
+
+        if job["kind"] == "compare" and variant == "report":
+            if not job["result"]:
+                return jsonify({"error": "Tidak ada perbedaan untuk diunduh"}), 400
+            return send_file(io.BytesIO(create_comparison_docx(job["result"])),
+                             mimetype=docx_mimetype, as_attachment=True, download_name=f"perbandingan_{filename}")
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"error": f"Unduhan '{variant}' tidak tersedia untuk job {job['kind']}"}), 404
+
+# --- Endpoint Status Cache ---
+@app.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    """Menampilkan jumlah hit/miss cache hasil analisis dan cache halaman PDF."""
+    return jsonify(dict(result_cache.stats(), halaman_pdf=page_cache.stats()))
+
+@app.route('/api/gemini/stats', methods=['GET'])
+def api_gemini_stats():
+    """Menampilkan sisa kuota bersama, jeda rate limit, dan status circuit breaker."""
+    return jsonify(gemini_limiter.stats())
+
+@app.route('/api/rules/stats', methods=['GET'])
+def api_rules_stats():
+    """Menampilkan seberapa banyak pekerjaan yang diselesaikan aturan lokal tanpa model."""
+    return jsonify(local_rules.stats())
+
+# --- Preload Worker ---
+
+def warm_up():
+    """Memuat dependensi berat dan model Gemini sekali, sebelum worker di-fork.
+
+    Dipanggil dari gunicorn.conf.py bila preload_app aktif: worker mewarisi modul yang
+    sudah diimpor (copy-on-write), tidak mengimpor ulang masing-masing. Tidak ada thread,
+    koneksi SQLite, atau channel gRPC yang dibuka (klien genai dibuat saat panggilan
+    pertama), jadi aman di-fork.
+    """
+    started = time.perf_counter()
+    import fitz  # PyMuPDF
+    import pandas
+    from docx.enum.text import WD_COLOR_INDEX
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+    from docx.text.run import Run
+
+    try:
+        for template in prompts.templates.values():
+            _model_for(template.system)
+    except Exception as e:
+        print(f"Error saat mengkonfigurasi Google AI: {e}")
+        # Aplikasi akan tetap berjalan, tetapi endpoint AI akan gagal
+    _log_timing("warm_up", detik=round(time.perf_counter() - started, 4))
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Proofread lokal")
+    subparsers = parser.add_subparsers(dest="command")
+    worker_parser = subparsers.add_parser("worker", help="Menjalankan worker job analisis tanpa web server")
+    worker_parser.add_argument("--threads", type=int, default=max(JOB_WORKERS, 1),
+                               help="Jumlah job yang dikerjakan bersamaan")
+    batch_parser = subparsers.add_parser("batch", help="Proofread semua PDF/DOCX dalam file zip atau direktori")
+    batch_parser.add_argument("input", help="File .zip atau direktori berisi dokumen")
+    batch_parser.add_argument("--output", default=BATCH_OUTPUT_NAME, help="File zip hasil")
+    batch_parser.add_argument("--processes", type=int, default=BATCH_PROCESSES,
+                              help="Jumlah proses untuk ekstraksi dan pembuatan DOCX")
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        summaries = run_batch(args.input, args.output,
+                              lambda done, total: print(f"{done}/{total} dokumen selesai"), args.processes)
+        for summary in summaries:
+            print(f"- {summary['Dokumen']}: {summary['Status']}, {summary['Jumlah Temuan']} temuan, "
+                  f"keluaran: {summary['Keluaran']}")
+        print(f"Hasil disimpan di {args.output}")
+    elif args.command == "worker":
+        print(f"Worker job berjalan dengan {args.threads} thread (DB: {JOB_DB_PATH})")
+        for thread in start_job_workers(args.threads):
+            thread.join()
+    else:
+        app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""Pengganti lokal `genai.GenerativeModel` untuk benchmark tanpa memakai kuota API.
+
+Model palsu ini meniru latensi, error rate limit, dan format jawaban Gemini yang
+dipakai app.py: baris `[SALAH] -> [BENAR] -> [KALIMAT]`, JSON batch per halaman,
+`[TOPIK UTAMA]` untuk koherensi, dan list JSON untuk restrukturisasi.
+"""
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+# Kesalahan yang disisipkan oleh synthetic_docs.py dan "ditemukan" oleh model palsu
+TYPOS = {
+    "dikarenakan": "karena",
+    "analisa": "analisis",
+    "resiko": "risiko",
+    "praktek": "praktik",
+    "merubah": "mengubah",
+    "sistim": "sistem",
+}
+
+_TYPO_PATTERN = re.compile(r"\b(" + "|".join(TYPOS) + r")\b", re.IGNORECASE)
+_PAGE_MARKER = re.compile(r'=== HALAMAN id="([^"]+)" ===\n')
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_TEXT_SEPARATOR = re.compile(r"\n[ \t]*---\n")
+
+
+class FakeRateLimitError(Exception):
+    """Meniru error 429 dari API (dikenali `_is_rate_limit_error` di app.py)."""
+
+    code = 429
+
+
+def _checked_text(prompt):
+    """Teks dokumen ada setelah pemisah `---` terakhir pada semua prompt app.py."""
+    return _TEXT_SEPARATOR.split(prompt)[-1]
+
+
+def _find_typos(text):
+    findings = []
+    for sentence in _SENTENCE_END.split(text):
+        for match in _TYPO_PATTERN.finditer(sentence):
+            findings.append({
+                "salah": match.group(0),
+                "benar": TYPOS[match.group(0).lower()],
+                "kalimat": sentence.strip(),
+            })
+    return findings
+
+
+class FakeGenerativeModel:
+    """Model palsu dengan latensi, jitter, dan error rate yang bisa diatur.
+
+    `response_format`:
+      - "auto": JSON jika diminta lewat generation_config, selain itu format sesuai prompt
+      - "salah": selalu baris [SALAH] (batch JSON akan gagal divalidasi -> jalur fallback)
+      - "json": selalu JSON batch untuk prompt proofread
+    `canned` (opsional): string atau fungsi `prompt -> string` yang menggantikan jawaban.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, error_rate=0.0, response_format="auto", canned=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.response_format = response_format
+        self.canned = canned
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompt_tokens = 0
+        self.system_tokens = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "panggilan": self.calls,
+                "error": self.errors,
+                "paralel_maks": self.max_in_flight,
+                "token_prompt": self.prompt_tokens,
+                "token_instruksi_sistem": self.system_tokens,
+            }
+
+    def with_system_instruction(self, system_instruction):
+        """Padanan `genai.GenerativeModel(..., system_instruction=...)`; statistik tetap di model ini."""
+        return _SystemInstructionModel(self, system_instruction)
+
+    def generate_content(self, prompt, request_options=None, generation_config=None, system_instruction="",
+                         **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.prompt_tokens += len(prompt) // 4
+            self.system_tokens += len(system_instruction) // 4
+            delay = self.latency * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+            failed = self._random.random() < self.error_rate
+        try:
+            time.sleep(max(delay, 0))
+            if failed:
+                with self._lock:
+                    self.errors += 1
+                raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+            text = self._respond(system_instruction, prompt, generation_config)
+            prompt_tokens = (len(system_instruction) + len(prompt)) // 4
+            return SimpleNamespace(
+                text=text,
+                usage_metadata=SimpleNamespace(
+                    prompt_token_count=prompt_tokens,
+                    candidates_token_count=len(text) // 4,
+                    total_token_count=prompt_tokens + len(text) // 4,
+                ),
+            )
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _respond(self, system_instruction, prompt, generation_config):
+        if self.canned is not None:
+            return self.canned(prompt) if callable(self.canned) else self.canned
+
+        instructions = system_instruction + "\n" + prompt
+        wants_json = (generation_config or {}).get("response_mime_type") == "application/json"
+        if "=== HALAMAN id=" in instructions and self.response_format != "salah" and (
+                wants_json or self.response_format == "json"):
+            parts = _PAGE_MARKER.split(_checked_text(prompt))
+            pages = [{"id": page_id, "kesalahan": _find_typos(text)} for page_id, text in zip(parts[1::2], parts[2::2])]
+            return json.dumps({"halaman": pages})
+        if "[SALAH]" in instructions:
+            findings = _find_typos(_checked_text(prompt))
+            if not findings:
+                return "TIDAK ADA KESALAHAN"
+            return "\n".join(f"[SALAH] {f['salah']} -> [BENAR] {f['benar']} -> [KALIMAT] {f['kalimat']}" for f in findings)
+        if "[TOPIK UTAMA]" in instructions:
+            findings = _find_typos(_checked_text(prompt))[:3]
+            return "\n".join(
+                f"[TOPIK UTAMA] Konsistensi istilah -> [TEKS ASLI] {f['kalimat']} -> [SARAN REVISI] "
+                f"{f['kalimat'].replace(f['salah'], f['benar'])}" for f in findings
+            )
+        return "[]"
+
+
+class _SystemInstructionModel:
+    """Model palsu dengan instruksi sistem terpasang (hasil `with_system_instruction`)."""
+
+    def __init__(self, base, system_instruction):
+        self.base = base
+        self.system_instruction = system_instruction
+
+    def generate_content(self, prompt, **kwargs):
+        return self.base.generate_content(prompt, system_instruction=self.system_instruction, **kwargs)
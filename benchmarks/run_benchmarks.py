@@ -0,0 +1,173 @@
+"""Benchmark seluruh pipeline app.py dengan model Gemini palsu (tanpa kuota API).
+
+Setiap tahap diukur terpisah: ekstraksi teks, orkestrasi LLM (proofread),
+pembuatan DOCX revisi/highlight, perbandingan dokumen, dan pembuatan zip.
+Hasil (durasi + puncak memori tracemalloc) ditulis ke file JSON agar bisa
+dibandingkan antar rilis.
+
+Contoh:
+    python benchmarks/run_benchmarks.py --pages 10 100 500 --latency 0.8 --output hasil.json
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+
+
+def _prepare_environment(work_dir):
+    """Semua penyimpanan app diarahkan ke direktori sementara sebelum app diimpor."""
+    os.environ["FINDINGS_DB_PATH"] = os.path.join(work_dir, "findings.sqlite3")
+    os.environ["JOB_DB_PATH"] = os.path.join(work_dir, "jobs.sqlite3")
+    os.environ["JOB_STORAGE_DIR"] = os.path.join(work_dir, "jobs")
+    os.environ["RESULT_CACHE_DB"] = ""
+    # Model palsu tidak punya kuota; limiter bersama hanya akan menambah jeda buatan
+    os.environ["GEMINI_LIMITER_DB"] = os.path.join(work_dir, "limiter.sqlite3")
+    os.environ["GEMINI_REQUESTS_PER_MINUTE"] = "0"
+    os.environ["GEMINI_TOKENS_PER_MINUTE"] = "0"
+    sys.path.insert(0, REPO_DIR)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _measure(func, trace_memory):
+    """Menjalankan `func` sekali -> (hasil, detik, puncak memori dalam MB atau None)."""
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="proofread_bench_")
+    _prepare_environment(work_dir)
+    import app
+    from fake_gemini import FakeGenerativeModel
+    from synthetic_docs import audit_report_blocks, render, revise_blocks
+
+    results = []
+
+    def record(file_extension, pages, stage, func, **extra):
+        result, elapsed, peak = _measure(func, not args.no_tracemalloc)
+        row = {
+            "format": file_extension,
+            "halaman": pages,
+            "tahap": stage,
+            "detik": round(elapsed, 4),
+            "memori_puncak_mb": round(peak, 2) if peak is not None else None,
+        }
+        row.update(extra)
+        results.append(row)
+        memory = f"{row['memori_puncak_mb']:>9} MB" if peak is not None else ""
+        print(f"{file_extension:>5} {pages:>5} hal  {stage:<16} {elapsed:>9.3f} s {memory}")
+        return result, row
+
+    for file_extension in args.formats:
+        for pages in args.pages:
+            blocks = audit_report_blocks(pages, args.seed)
+            original = render(blocks, file_extension)
+            revised_original = render(revise_blocks(blocks, args.seed), file_extension)
+
+            # Setiap ukuran dokumen dimulai tanpa cache hasil maupun temuan tersimpan
+            app.result_cache = app.ResultCache()
+            app.page_cache = app.ResultCache()
+            app.finding_store = app.FindingStore(os.path.join(work_dir, f"findings_{file_extension}_{pages}.sqlite3"))
+            fake_model = FakeGenerativeModel(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                             response_format=args.response_format, seed=args.seed)
+            app.model = fake_model
+
+            pages_content, row = record(file_extension, pages, "ekstraksi",
+                                        lambda: app._extract_text_with_pages(original, file_extension),
+                                        ukuran_file_kb=round(len(original) / 1024, 1))
+            row["unit"] = len(pages_content)
+
+            stats = {}
+            errors, row = record(file_extension, pages, "proofread_llm",
+                                 lambda: app._proofread_document(original, file_extension, stats=stats))
+            row.update(stats)
+            row["temuan"] = len(errors)
+            row["model"] = fake_model.stats()
+
+            record(file_extension, pages, "perbandingan",
+                   lambda: app._analyze_comparison(original, revised_original, file_extension, file_extension))
+
+            if file_extension != "docx":
+                # File revisi/highlight hanya dibuat untuk DOCX
+                continue
+            revised_data, _ = record(file_extension, pages, "revisi_docx",
+                                     lambda: app.generate_revised_docx(original, errors))
+            highlighted_data, _ = record(file_extension, pages, "highlight_docx",
+                                         lambda: app.generate_highlighted_docx(original, errors))
+            archive, row = record(file_extension, pages, "zip",
+                                  lambda: app.create_zip_archive(revised_data, highlighted_data, "laporan.docx"))
+            row["ukuran_zip_kb"] = round(len(archive) / 1024, 1)
+
+    return {
+        "dibuat": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "konfigurasi": {
+            "pages": args.pages,
+            "formats": args.formats,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "response_format": args.response_format,
+            "seed": args.seed,
+            "tracemalloc": not args.no_tracemalloc,
+            "GEMINI_MAX_IN_FLIGHT": app.GEMINI_MAX_IN_FLIGHT,
+            "PROOFREAD_BATCH_MODE": app.PROOFREAD_BATCH_MODE,
+            "PROOFREAD_BATCH_TOKENS": app.PROOFREAD_BATCH_TOKENS,
+            "prompt_versi": app.prompts.versions(),
+        },
+        "rss_maks_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "hasil": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pipeline proofread dengan model Gemini palsu")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--formats", nargs="+", choices=["docx", "pdf"], default=["docx", "pdf"])
+    parser.add_argument("--latency", type=float, default=0.5, help="Latensi rata-rata model palsu (detik)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Variasi latensi relatif (0.2 = +/-20%%)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang setiap panggilan gagal dengan 429")
+    parser.add_argument("--response-format", choices=["auto", "salah", "json"], default="auto")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="Tanpa pengukuran memori (durasi lebih akurat, tracemalloc menambah overhead)")
+    parser.add_argument("--output", default=None, help="File JSON hasil (default: benchmarks/results/<waktu>.json)")
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or os.path.join(
+        BENCHMARK_DIR, "results", datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {output}")
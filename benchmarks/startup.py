@@ -0,0 +1,129 @@
+"""Benchmark waktu start worker: impor app.py dan request pertama di proses baru.
+
+Setiap percobaan dijalankan di proses Python terpisah (seperti worker gunicorn
+atau container yang baru di-scale) dan mengukur:
+  - impor_app: `import app` (dependensi berat dimuat saat fitur dipakai)
+  - request_index / request_compare_download: request pertama setelah impor
+  - warm_up: app.warm_up() (biaya yang dibayar sekali di master dengan preload)
+Skenario "lazy" meniru worker tanpa preload; skenario "preload" memanggil warm_up()
+lebih dulu, sehingga impor_app + warm_up setara dengan impor eager sebelumnya.
+Selisihnya dengan impor_app "lazy" adalah waktu start yang dihemat setiap worker/cold start.
+
+Contoh:
+    python benchmarks/startup.py --runs 5 --output startup.json
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+HEAVY_MODULES = ("fitz", "docx", "pandas", "google.generativeai")
+SCENARIOS = ("lazy", "preload")
+
+
+def _loaded_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def _child(scenario):
+    """Dijalankan di proses baru; mencetak satu baris JSON hasil pengukuran."""
+    sys.path[:0] = [REPO_DIR, BENCHMARK_DIR]
+    result = {}
+    start = time.perf_counter()
+    import app
+    result["impor_app"] = time.perf_counter() - start
+    result["modul_setelah_impor"] = _loaded_modules()
+
+    if scenario == "preload":
+        start = time.perf_counter()
+        app.warm_up()
+        result["warm_up"] = time.perf_counter() - start
+
+    client = app.app.test_client()
+    start = time.perf_counter()
+    client.get("/")
+    result["request_index"] = time.perf_counter() - start
+    result["modul_setelah_index"] = _loaded_modules()
+
+    # synthetic_docs memakai python-docx, jadi baru diimpor setelah request "/" diukur
+    from synthetic_docs import audit_report_blocks, render, revise_blocks
+
+    blocks = audit_report_blocks(2, 0)
+    documents = (render(blocks, "docx"), render(revise_blocks(blocks, 0), "docx"))
+    files = {
+        "file1": (io.BytesIO(documents[0]), "asli.docx"),
+        "file2": (io.BytesIO(documents[1]), "revisi.docx"),
+    }
+    start = time.perf_counter()
+    response = client.post("/api/compare/download", data=files, content_type="multipart/form-data")
+    result["request_compare_download"] = time.perf_counter() - start
+    result["status_compare_download"] = response.status_code
+    result["modul_setelah_compare"] = _loaded_modules()
+    print(json.dumps(result))
+
+
+def _run_child(scenario, work_dir):
+    env = dict(os.environ,
+               FINDINGS_DB_PATH=os.path.join(work_dir, "findings.sqlite3"),
+               JOB_DB_PATH=os.path.join(work_dir, "jobs.sqlite3"),
+               JOB_STORAGE_DIR=os.path.join(work_dir, "jobs"),
+               GEMINI_LIMITER_DB=os.path.join(work_dir, "limiter.sqlite3"),
+               TIMING_LOG="0")
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", scenario], cwd=REPO_DIR,
+                               env=env, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["proses_total"] = time.perf_counter() - start
+    return result
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="proofread_startup_")
+    summary = {}
+    for scenario in SCENARIOS:
+        runs = [_run_child(scenario, work_dir) for _ in range(args.runs)]
+        row = {key: round(statistics.median(run[key] for run in runs), 4)
+               for key, value in runs[0].items() if isinstance(value, float)}
+        row.update({key: value for key, value in runs[0].items() if not isinstance(value, float)})
+        summary[scenario] = row
+        for key, value in row.items():
+            if isinstance(value, float):
+                print(f"{scenario:>8}  {key:<26} {value:>9.3f} s")
+
+    eager_import = summary["preload"]["impor_app"] + summary["preload"]["warm_up"]
+    summary["hemat_impor_per_worker_detik"] = round(eager_import - summary["lazy"]["impor_app"], 4)
+    print(f"Impor app per worker: {summary['lazy']['impor_app']:.3f} s (lazy) vs {eager_import:.3f} s (eager)")
+    return {
+        "dibuat": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "percobaan": args.runs,
+        "hasil": summary,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark waktu impor app dan request pertama di proses baru")
+    parser.add_argument("--runs", type=int, default=5, help="Jumlah proses per skenario (dilaporkan median)")
+    parser.add_argument("--output", default=None, help="File JSON hasil (default: benchmarks/results/startup-<waktu>.json)")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child)
+        sys.exit(0)
+
+    report = run(args)
+    output = args.output or os.path.join(
+        BENCHMARK_DIR, "results", "startup-" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Hasil disimpan di {output}")
@@ -0,0 +1,176 @@
+"""Generator laporan audit sintetis (PDF/DOCX) untuk benchmark.
+
+Dokumen berisi bab, subbab, paragraf, dan sesekali tabel, dengan kalimat berisi
+kesalahan ketik dari `fake_gemini.TYPOS` yang disisipkan secara acak
+(deterministik per seed).
+
+Contoh:
+    python benchmarks/synthetic_docs.py --pages 100 --format docx --out /tmp/laporan
+"""
+import argparse
+import io
+import os
+import random
+
+import docx
+import fitz  # PyMuPDF
+
+PARAGRAPHS_PER_PAGE = 5
+PAGES_PER_CHAPTER = 10
+
+_SUBJECTS = [
+    "Satuan Kerja Audit Internal", "Manajemen unit bisnis", "Tim pemeriksa", "Divisi keuangan",
+    "Komite audit", "Pemilik proses", "Fungsi manajemen risiko", "Unit kepatuhan",
+]
+_VERBS = [
+    "telah melakukan reviu atas", "belum sepenuhnya menerapkan", "perlu menyempurnakan",
+    "menemukan kelemahan pada", "melaporkan hasil pemantauan", "menyusun rencana perbaikan atas",
+]
+_OBJECTS = [
+    "prosedur pengadaan barang dan jasa", "pengendalian akses sistem informasi",
+    "rekonsiliasi rekening antarperusahaan", "pencatatan aset tetap", "proses persetujuan anggaran RKAP",
+    "dokumentasi kontrak dengan pihak ketiga", "pemantauan tindak lanjut temuan tahun sebelumnya",
+]
+_CLAUSES = [
+    "sesuai dengan ketentuan yang berlaku", "pada periode semester pertama", "di seluruh entitas anak",
+    "berdasarkan sampel transaksi yang dipilih", "sebagaimana tercantum dalam Surat Tugas",
+]
+_TYPO_SENTENCES = [
+    "Hal ini terjadi dikarenakan belum adanya kebijakan tertulis.",
+    "Tim melakukan analisa terhadap data transaksi yang tersedia.",
+    "Kondisi tersebut meningkatkan resiko kesalahan pencatatan.",
+    "Praktek tersebut belum selaras dengan pedoman perusahaan.",
+    "Manajemen berencana merubah alur persetujuan pada kuartal berikutnya.",
+    "Sistim aplikasi belum memiliki jejak audit yang memadai.",
+]
+_CHAPTERS = [
+    "Pendahuluan", "Ruang Lingkup Audit", "Hasil Pemeriksaan", "Pengendalian Internal",
+    "Manajemen Risiko", "Kepatuhan", "Tindak Lanjut", "Kesimpulan",
+]
+
+
+def _sentence(rng):
+    return f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_CLAUSES)}."
+
+
+def audit_report_blocks(pages, seed=0, typo_rate=0.3):
+    """List blok dokumen: ("judul", level, teks), ("paragraf", teks), ("tabel", baris), ("halaman",)."""
+    rng = random.Random(seed)
+    blocks = []
+    for page in range(pages):
+        if page:
+            blocks.append(("halaman",))
+        if page % PAGES_PER_CHAPTER == 0:
+            chapter = page // PAGES_PER_CHAPTER
+            blocks.append(("judul", 1, f"BAB {chapter + 1} {_CHAPTERS[chapter % len(_CHAPTERS)]}"))
+        blocks.append(("judul", 2, f"{page // PAGES_PER_CHAPTER + 1}.{page % PAGES_PER_CHAPTER + 1} "
+                                   f"Temuan atas {rng.choice(_OBJECTS)}"))
+        for _ in range(PARAGRAPHS_PER_PAGE):
+            sentences = [_sentence(rng) for _ in range(rng.randint(3, 6))]
+            if rng.random() < typo_rate:
+                sentences.insert(rng.randrange(len(sentences) + 1), rng.choice(_TYPO_SENTENCES))
+            blocks.append(("paragraf", " ".join(sentences)))
+        if page % 7 == 3:
+            rows = [["No", "Temuan", "Status"]]
+            rows += [[str(i + 1), rng.choice(_OBJECTS), rng.choice(["Selesai", "Proses", "Belum"])] for i in range(4)]
+            blocks.append(("tabel", rows))
+    return blocks
+
+
+def revise_blocks(blocks, seed=0, change_rate=0.1):
+    """Versi revisi dokumen: sebagian paragraf diubah, dihapus, ditambah, atau dipindah."""
+    rng = random.Random(seed + 1)
+    revised = []
+    for block in blocks:
+        if block[0] != "paragraf" or rng.random() >= change_rate:
+            revised.append(block)
+            continue
+        action = rng.choice(["ubah", "ubah", "hapus", "tambah"])
+        if action == "ubah":
+            words = block[1].split()
+            words[rng.randrange(len(words))] = rng.choice(["telah", "akan", "segera", "belum"])
+            revised.append(("paragraf", " ".join(words)))
+        elif action == "tambah":
+            revised.append(block)
+            revised.append(("paragraf", " ".join(_sentence(rng) for _ in range(3))))
+    paragraphs = [i for i, block in enumerate(revised) if block[0] == "paragraf"]
+    for _ in range(max(1, int(len(paragraphs) * change_rate / 10))):
+        if len(paragraphs) < 2:
+            break
+        moved = revised.pop(rng.choice(paragraphs))
+        paragraphs = [i for i, block in enumerate(revised) if block[0] == "paragraf"]
+        revised.insert(rng.choice(paragraphs), moved)
+    return revised
+
+
+def render_docx(blocks):
+    doc = docx.Document()
+    for block in blocks:
+        if block[0] == "halaman":
+            doc.add_page_break()
+        elif block[0] == "judul":
+            doc.add_heading(block[2], level=block[1])
+        elif block[0] == "paragraf":
+            doc.add_paragraph(block[1])
+        elif block[0] == "tabel":
+            table = doc.add_table(rows=len(block[1]), cols=len(block[1][0]))
+            table.style = "Table Grid"
+            for row, values in zip(table.rows, block[1]):
+                for cell, value in zip(row.cells, values):
+                    cell.text = value
+    output_buffer = io.BytesIO()
+    doc.save(output_buffer)
+    return output_buffer.getvalue()
+
+
+def render_pdf(blocks):
+    pdf_document = fitz.open()
+    page_blocks = [[]]
+    for block in blocks:
+        if block[0] == "halaman":
+            page_blocks.append([])
+        else:
+            page_blocks[-1].append(block)
+    for blocks_on_page in page_blocks:
+        page = pdf_document.new_page()
+        y = 50
+        for block in blocks_on_page:
+            if block[0] == "judul":
+                size, text = (16 if block[1] == 1 else 13), block[2]
+            elif block[0] == "tabel":
+                size, text = 9, "\n".join(" | ".join(row) for row in block[1])
+            else:
+                size, text = 9, block[1]
+            rect = fitz.Rect(50, y, page.rect.width - 50, page.rect.height - 40)
+            remaining = page.insert_textbox(rect, text, fontsize=size)
+            if remaining < 0:
+                break
+            y = rect.y1 - remaining + size * 0.6
+    data = pdf_document.tobytes()
+    pdf_document.close()
+    return data
+
+
+def render(blocks, file_extension):
+    if file_extension == "docx":
+        return render_docx(blocks)
+    if file_extension == "pdf":
+        return render_pdf(blocks)
+    raise ValueError(f"Format tidak didukung: {file_extension}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Membuat laporan audit sintetis")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--format", choices=["docx", "pdf"], default="docx")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=".")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    blocks = audit_report_blocks(args.pages, args.seed)
+    for name, document_blocks in (("asli", blocks), ("revisi", revise_blocks(blocks, args.seed))):
+        path = os.path.join(args.out, f"laporan_{args.pages}hal_{name}.{args.format}")
+        with open(path, "wb") as f:
+            f.write(render(document_blocks, args.format))
+        print(path)
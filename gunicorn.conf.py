@@ -0,0 +1,26 @@
+"""Konfigurasi gunicorn (dibaca otomatis dari direktori kerja): `gunicorn app:app`.
+
+app.py dimuat sekali di proses master dan dependensi beratnya dipanaskan lewat
+app.warm_up(), lalu setiap worker hasil fork langsung siap melayani request dan
+menjalankan thread worker job-nya sendiri (post_fork).
+Set GUNICORN_PRELOAD=0 agar setiap worker memuat app sendiri (mis. saat --reload).
+"""
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def when_ready(server):
+    # Dipanggil di master setelah app dimuat, sebelum worker pertama di-fork
+    if server.cfg.preload_app:
+        from app import warm_up
+
+        warm_up()
+
+
+def post_fork(server, worker):
+    # Thread worker job tidak ikut ter-fork; dijalankan di setiap worker agar job yang
+    # masih antre setelah restart langsung dikerjakan
+    from app import JOB_WORKERS, start_job_workers
+
+    start_job_workers(JOB_WORKERS)
@@ -33,6 +33,10 @@ document.addEventListener("DOMContentLoaded", () => {
   const restructureResultsTableDiv = document.getElementById("restructure-results-table");
   const restructureDownloadBtn = document.getElementById("restructure-download-btn");
 
+  // Job terakhir per fitur, agar tombol unduh bisa memakai hasil analisis yang sudah ada
+  const JOB_POLL_INTERVAL_MS = 1500;
+  const lastJobs = { proofread: null, compare: null, restructure: null };
+
   // =============================================
   // ---         FUNGSI-FUNGSI HELPER          ---
   // =============================================
@@ -68,6 +72,7 @@ document.addEventListener("DOMContentLoaded", () => {
         "Perbaikan Sesuai KBBI": "Perbaikan",
         "Pada Kalimat": "Konteks Kalimat",
         "Ditemukan di Halaman": "Halaman",
+        "Jenis Perubahan": "Jenis",
         "Kalimat Awal": "Kalimat Asli",
         "Kalimat Revisi": "Kalimat Revisi",
         "Kata yang Direvisi": "Perubahan",
@@ -104,19 +109,112 @@ document.addEventListener("DOMContentLoaded", () => {
     `;
   }
 
+  /**
+   * Mengirim file sebagai job latar belakang, lalu polling statusnya sampai selesai.
+   * @param {string} kind - Jenis job (proofread, compare, coherence, restructure).
+   * @param {FormData} formData - Data (file) yang akan dikirim.
+   * @param {HTMLElement} loadingEl - Elemen loading untuk menampilkan progres.
+   * @returns {Promise<{jobId: string, result: Array<Object>}>}
+   */
+  async function runJob(kind, formData, loadingEl) {
+    const response = await fetch(`/api/jobs/${kind}`, {
+      method: "POST",
+      body: formData,
+    });
+    if (!response.ok) {
+      const err = await response.json();
+      throw new Error(err.error || "Gagal membuat job analisis");
+    }
+    const { job_id: jobId } = await response.json();
+    const progressEl = loadingEl.querySelector(".loading-progress");
+    if (progressEl) progressEl.textContent = "";
+
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      const statusResponse = await fetch(`/api/jobs/${jobId}`);
+      const job = await statusResponse.json();
+      if (!statusResponse.ok) {
+        throw new Error(job.error || "Status job tidak dapat dibaca");
+      }
+      if (progressEl && job.progress.total > 0) {
+        progressEl.textContent = `(${job.progress.done} dari ${job.progress.total} bagian selesai)`;
+      }
+      if (job.status === "done") return { jobId, result: job.result };
+      if (job.status === "failed") throw new Error(job.error || "Analisis gagal");
+    }
+  }
+
+  /**
+   * Mengirim file ke endpoint streaming proofread dan membaca event SSE satu per satu.
+   * @param {FormData} formData - Data (file) yang akan dikirim.
+   * @param {function(Object): void} onPage - Dipanggil untuk setiap event "page".
+   * @returns {Promise<Object>} - Data event "summary".
+   */
+  async function streamProofread(formData, onPage) {
+    const response = await fetch("/api/proofread/stream", {
+      method: "POST",
+      body: formData,
+    });
+    if (!response.ok) {
+      const err = await response.json();
+      throw new Error(err.error || "Respon server tidak valid");
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let summary = null;
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let separator;
+      while ((separator = buffer.indexOf("\n\n")) !== -1) {
+        const rawEvent = buffer.slice(0, separator);
+        buffer = buffer.slice(separator + 2);
+        let eventName = "message";
+        let eventData = "";
+        rawEvent.split("\n").forEach(line => {
+          if (line.startsWith("event:")) eventName = line.slice(6).trim();
+          if (line.startsWith("data:")) eventData += line.slice(5).trim();
+        });
+        const data = eventData ? JSON.parse(eventData) : {};
+        if (eventName === "page") onPage(data);
+        if (eventName === "summary") summary = data;
+        if (eventName === "error") throw new Error(data.error || "Analisis gagal");
+      }
+    }
+    return summary;
+  }
+
+  /**
+   * Mengambil URL unduhan dari job terakhir jika file yang dipilih masih sama.
+   * @param {string} kind - Nama fitur di `lastJobs`.
+   * @param {Array<File>} files - File yang sedang dipilih.
+   * @param {string} variant - Jenis unduhan.
+   * @returns {string|null}
+   */
+  function jobDownloadUrl(kind, files, variant) {
+    const job = lastJobs[kind];
+    if (!job || job.files.length !== files.length || job.files.some((f, i) => f !== files[i])) {
+      return null;
+    }
+    return `/api/jobs/${job.jobId}/download/${variant}`;
+  }
+
   /**
    * Menangani proses download file dari API.
    * @param {string} url - Endpoint API untuk download.
-   * @param {FormData} formData - Data (file) yang akan dikirim.
+   * @param {FormData|null} formData - Data (file) yang akan dikirim; null untuk unduhan job (GET).
    ** @param {string} defaultFilename - Nama file jika header tidak ada.
    */
   async function handleDownload(url, formData, defaultFilename = "download.dat") {
     clearError();
     try {
-      const response = await fetch(url, {
-        method: "POST",
-        body: formData,
-      });
+      const response = formData
+        ? await fetch(url, { method: "POST", body: formData })
+        : await fetch(url);
 
       if (!response.ok) {
         const err = await response.json();
@@ -169,25 +267,37 @@ document.addEventListener("DOMContentLoaded", () => {
       formData.append("file", file);
 
       try {
-        const response = await fetch("/api/proofread/analyze", {
-          method: "POST",
-          body: formData,
-        });
-
-        if (!response.ok) {
-          const err = await response.json();
-          throw new Error(err.error || "Respon server tidak valid");
-        }
+        // Tabel diisi bertahap setiap kali satu halaman selesai diperiksa
+        const headers = ["Kata/Frasa Salah", "Perbaikan Sesuai KBBI", "Pada Kalimat", "Ditemukan di Halaman"];
+        const data = [];
+        const progressEl = proofreadLoading.querySelector(".loading-progress");
+        if (progressEl) progressEl.textContent = "";
+        lastJobs.proofread = null;
+        proofreadResultsTableDiv.innerHTML = "";
+        proofreadResultsContainer.classList.remove("hidden");
 
-        const data = await response.json();
+        const summary = await streamProofread(formData, page => {
+          if (progressEl) progressEl.textContent = `(${page.selesai} dari ${page.total} bagian selesai)`;
+          if (page.kesalahan.length > 0) {
+            data.push(...page.kesalahan);
+            // sort() stabil, jadi urutan temuan di dalam satu halaman tetap terjaga
+            data.sort((a, b) => a["Ditemukan di Halaman"] - b["Ditemukan di Halaman"]);
+            proofreadResultsTableDiv.innerHTML = createTable(data, headers);
+          }
+        });
 
         if (data.length === 0) {
           proofreadResultsTableDiv.innerHTML = "<p>Tidak ada kesalahan yang ditemukan.</p>";
-        } else {
-          const headers = ["Kata/Frasa Salah", "Perbaikan Sesuai KBBI", "Pada Kalimat", "Ditemukan di Halaman"];
-          proofreadResultsTableDiv.innerHTML = createTable(data, headers);
         }
-        proofreadResultsContainer.classList.remove("hidden");
+        if (summary && summary.halaman_gagal && summary.halaman_gagal.length > 0) {
+          const pages = summary.halaman_gagal.map(page => page.halaman).join(", ");
+          showError(`Halaman ${pages} gagal diperiksa karena API sedang sibuk/tidak tersedia. ` +
+            "Silakan jalankan analisis lagi; hanya halaman tersebut yang akan diperiksa ulang.");
+        }
+        if (summary && summary.unit_dilewati > 0) {
+          proofreadResultsTableDiv.insertAdjacentHTML("afterbegin",
+            `<p>${summary.unit_dilewati} dari ${summary.unit_total} bagian tidak berubah sejak pemeriksaan sebelumnya; hasilnya dipakai ulang.</p>`);
+        }
 
       } catch (error) {
         showError(error.message);
@@ -201,6 +311,8 @@ document.addEventListener("DOMContentLoaded", () => {
     proofreadDownloadRevisedBtn.addEventListener("click", () => {
       const file = proofreadFileInput.files[0];
       if (!file) { showError("File asli tidak ditemukan."); return; }
+      const jobUrl = jobDownloadUrl("proofread", [file], "revised");
+      if (jobUrl) { handleDownload(jobUrl, null, `revisi_${file.name}`); return; }
       const formData = new FormData();
       formData.append("file", file);
       handleDownload("/api/proofread/download/revised", formData, `revisi_${file.name}`);
@@ -209,6 +321,8 @@ document.addEventListener("DOMContentLoaded", () => {
     proofreadDownloadHighlightedBtn.addEventListener("click", () => {
       const file = proofreadFileInput.files[0];
       if (!file) { showError("File asli tidak ditemukan."); return; }
+      const jobUrl = jobDownloadUrl("proofread", [file], "highlighted");
+      if (jobUrl) { handleDownload(jobUrl, null, `highlight_${file.name}`); return; }
       const formData = new FormData();
       formData.append("file", file);
       handleDownload("/api/proofread/download/highlighted", formData, `highlight_${file.name}`);
@@ -217,6 +331,8 @@ document.addEventListener("DOMContentLoaded", () => {
     proofreadDownloadZipBtn.addEventListener("click", () => {
       const file = proofreadFileInput.files[0];
       if (!file) { showError("File asli tidak ditemukan."); return; }
+      const jobUrl = jobDownloadUrl("proofread", [file], "zip");
+      if (jobUrl) { handleDownload(jobUrl, null, `hasil_proofread_${file.name}.zip`); return; }
       const formData = new FormData();
       formData.append("file", file);
       handleDownload("/api/proofread/download/zip", formData, `hasil_proofread_${file.name}.zip`);
@@ -245,22 +361,13 @@ document.addEventListener("DOMContentLoaded", () => {
       formData.append("file2", file2);
 
       try {
-        const response = await fetch("/api/compare/analyze", {
-          method: "POST",
-          body: formData,
-        });
-
-        if (!response.ok) {
-          const err = await response.json();
-          throw new Error(err.error || "Respon server tidak valid");
-        }
-
-        const data = await response.json();
+        const { jobId, result: data } = await runJob("compare", formData, compareLoading);
+        lastJobs.compare = { jobId, files: [file1, file2] };
 
         if (data.length === 0) {
           compareResultsTableDiv.innerHTML = "<p>Tidak ada perbedaan signifikan yang ditemukan.</p>";
         } else {
-          const headers = ["Kalimat Awal", "Kalimat Revisi", "Kata yang Direvisi"];
+          const headers = ["Jenis Perubahan", "Kalimat Awal", "Kalimat Revisi", "Kata yang Direvisi"];
           compareResultsTableDiv.innerHTML = createTable(data, headers);
         }
         compareResultsContainer.classList.remove("hidden");
@@ -277,6 +384,8 @@ document.addEventListener("DOMContentLoaded", () => {
       const file1 = compareFileInput1.files[0];
       const file2 = compareFileInput2.files[0];
       if (!file1 || !file2) { showError("File asli tidak ditemukan."); return; }
+      const jobUrl = jobDownloadUrl("compare", [file1, file2], "report");
+      if (jobUrl) { handleDownload(jobUrl, null, `perbandingan_${file1.name}`); return; }
       const formData = new FormData();
       formData.append("file1", file1);
       formData.append("file2", file2);
@@ -303,17 +412,7 @@ document.addEventListener("DOMContentLoaded", () => {
       formData.append("file", file);
 
       try {
-        const response = await fetch("/api/coherence/analyze", {
-          method: "POST",
-          body: formData,
-        });
-
-        if (!response.ok) {
-          const err = await response.json();
-          throw new Error(err.error || "Respon server tidak valid");
-        }
-
-        const data = await response.json();
+        const { result: data } = await runJob("coherence", formData, coherenceLoading);
 
         if (data.length === 0) {
           coherenceResultsTableDiv.innerHTML = "<p>Tidak ada masalah koherensi yang ditemukan.</p>";
@@ -351,17 +450,8 @@ document.addEventListener("DOMContentLoaded", () => {
       formData.append("file", file);
 
       try {
-        const response = await fetch("/api/restructure/analyze", {
-          method: "POST",
-          body: formData,
-        });
-
-        if (!response.ok) {
-          const err = await response.json();
-          throw new Error(err.error || "Respon server tidak valid");
-        }
-
-        const data = await response.json();
+        const { jobId, result: data } = await runJob("restructure", formData, restructureLoading);
+        lastJobs.restructure = { jobId, files: [file] };
 
         if (data.length === 0) {
           restructureResultsTableDiv.innerHTML = "<p>Tidak ada saran restrukturisasi.</p>";
@@ -382,6 +472,8 @@ document.addEventListener("DOMContentLoaded", () => {
     restructureDownloadBtn.addEventListener("click", () => {
       const file = restructureFileInput.files[0];
       if (!file) { showError("File asli tidak ditemukan."); return; }
+      const jobUrl = jobDownloadUrl("restructure", [file], "highlighted");
+      if (jobUrl) { handleDownload(jobUrl, null, `highlight_rekomendasi_${file.name}`); return; }
       const formData = new FormData();
       formData.append("file", file);
       handleDownload("/api/restructure/download", formData, `highlight_rekomendasi_${file.name}`);
@@ -0,0 +1,65 @@
+"""Fixture bersama: penyimpanan app diarahkan ke direktori sementara dan Gemini diganti model palsu."""
+import io
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_WORK_DIR = tempfile.mkdtemp(prefix="proofread_test_")
+
+# Harus diisi sebelum app diimpor: semua path dibaca saat impor modul
+os.environ.update({
+    "FINDINGS_DB_PATH": os.path.join(_WORK_DIR, "findings.sqlite3"),
+    "JOB_DB_PATH": os.path.join(_WORK_DIR, "jobs.sqlite3"),
+    "JOB_STORAGE_DIR": os.path.join(_WORK_DIR, "jobs"),
+    "GEMINI_LIMITER_DB": os.path.join(_WORK_DIR, "limiter.sqlite3"),
+    "RESULT_CACHE_DB": "",
+    "GEMINI_REQUESTS_PER_MINUTE": "0",
+    "GEMINI_TOKENS_PER_MINUTE": "0",
+    "JOB_WORKERS": "0",
+    "TIMING_LOG": "0",
+})
+sys.path[:0] = [REPO_DIR, os.path.join(REPO_DIR, "benchmarks")]
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """Modul app dengan cache hasil dan penyimpanan temuan yang kosong untuk setiap test."""
+    import app
+
+    monkeypatch.setattr(app, "result_cache", app.ResultCache())
+    monkeypatch.setattr(app, "page_cache", app.ResultCache())
+    monkeypatch.setattr(app, "finding_store", app.FindingStore(str(tmp_path / "findings.sqlite3")))
+    return app
+
+
+@pytest.fixture
+def fake_model(app_module, monkeypatch):
+    from fake_gemini import FakeGenerativeModel
+
+    model = FakeGenerativeModel(latency=0, jitter=0, seed=0)
+    monkeypatch.setattr(app_module, "model", model)
+    return model
+
+
+def make_docx(paragraphs, table_rows=None):
+    """Bytes DOCX berisi paragraf (str atau list run (teks, tebal, miring)) dan tabel opsional."""
+    import docx
+
+    document = docx.Document()
+    for paragraph in paragraphs:
+        para = document.add_paragraph()
+        for text, bold, italic in ([(paragraph, False, False)] if isinstance(paragraph, str) else paragraph):
+            run = para.add_run(text)
+            run.bold = bold
+            run.italic = italic
+    if table_rows:
+        table = document.add_table(rows=len(table_rows), cols=len(table_rows[0]))
+        for row, values in zip(table.rows, table_rows):
+            for cell, value in zip(row.cells, values):
+                cell.text = value
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
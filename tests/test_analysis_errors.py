@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+from conftest import make_docx
+
+
+@pytest.fixture
+def circuit_open(app_module, monkeypatch):
+    def unavailable(prompt, **kwargs):
+        raise app_module.GeminiUnavailable(12)
+
+    monkeypatch.setattr(app_module, "_generate_content", unavailable)
+
+
+@pytest.mark.parametrize("endpoint", ["/api/coherence/analyze", "/api/restructure/analyze",
+                                      "/api/restructure/download"])
+def test_open_circuit_is_a_503_not_a_finding(app_module, circuit_open, endpoint):
+    document = make_docx(["Pendahuluan laporan audit.", "Kesimpulan pemeriksaan."])
+
+    response = app_module.app.test_client().post(
+        endpoint, data={"file": (io.BytesIO(document), "laporan.docx")}, content_type="multipart/form-data")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "12"
+    assert response.get_json()["penyebab"] == "circuit_open"
+    assert app_module.result_cache.stats()["entries"] == 0
+
+
+def test_failed_analysis_job_reports_retry_after(app_module, circuit_open, tmp_path, monkeypatch):
+    queue = app_module.JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "jobs"))
+    monkeypatch.setattr(app_module, "job_queue", queue)
+    upload = tmp_path / "unggahan.docx"
+    upload.write_bytes(make_docx(["Pendahuluan laporan audit."]))
+    job_id = queue.submit("coherence", [("laporan.docx", str(upload))])
+
+    app_module._run_job(queue.claim("w1"))
+
+    response = app_module.app.test_client().get(f"/api/jobs/{job_id}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "12"
+    assert response.get_json()["status"] == "failed"
+    assert "ERROR" not in str(response.get_json())
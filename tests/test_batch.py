@@ -0,0 +1,27 @@
+import zipfile
+
+import pandas as pd
+
+from synthetic_docs import audit_report_blocks, render
+
+
+def test_batch_summary_says_pdfs_only_get_findings(app_module, fake_model, tmp_path):
+    blocks = audit_report_blocks(2, seed=0, typo_rate=1.0)
+    archive = tmp_path / "dokumen.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.docx", render(blocks, "docx"))
+        zf.writestr("b.pdf", render(blocks, "pdf"))
+    output = tmp_path / "hasil" / "hasil_batch.zip"
+    output.parent.mkdir()
+
+    summaries = {summary["Dokumen"]: summary for summary in app_module.run_batch(str(archive), str(output), processes=1)}
+
+    assert summaries["a.docx"]["Keluaran"] == app_module.BATCH_OUTPUT_DOCX
+    assert summaries["b.pdf"]["Keluaran"] == app_module.BATCH_OUTPUT_PDF
+    assert summaries["b.pdf"]["Status"] == "selesai" and summaries["b.pdf"]["Jumlah Temuan"] > 0
+    with zipfile.ZipFile(output) as zf:
+        assert {"revisi/a.docx", "highlight/a.docx"} <= set(zf.namelist())
+        assert not any(name.endswith("b.pdf") for name in zf.namelist())
+        with zf.open("temuan_proofread.xlsx") as f:
+            ringkasan = pd.read_excel(f, sheet_name="Ringkasan")
+    assert list(ringkasan["Keluaran"]) == [app_module.BATCH_OUTPUT_DOCX, app_module.BATCH_OUTPUT_PDF]
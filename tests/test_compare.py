@@ -0,0 +1,52 @@
+ANCHORS = [f"Paragraf jangkar nomor {n} tentang prosedur audit internal perusahaan." for n in range(6)]
+MOVED = "Laporan keuangan kuartalan diperiksa oleh tim audit internal setiap periode."
+
+
+def _kinds(rows):
+    return [(row["Jenis Perubahan"], row["Kalimat Awal"], row["Kalimat Revisi"]) for row in rows]
+
+
+def test_identical_documents_have_no_changes(app_module):
+    assert app_module.compare_paragraphs(ANCHORS, list(ANCHORS)) == []
+
+
+def test_changed_added_and_deleted_paragraphs(app_module):
+    original = ANCHORS[:2] + ["Tim melakukan analisa resiko terhadap seluruh unit kerja."] + ANCHORS[2:4] \
+        + ["Paragraf ini akan dihapus dari dokumen revisi."] + ANCHORS[4:]
+    revised = ANCHORS[:2] + ["Tim melakukan analisis risiko terhadap seluruh unit kerja."] + ANCHORS[2:4] \
+        + ANCHORS[4:5] + ["Paragraf baru yang tidak ada di dokumen awal sama sekali."] + ANCHORS[5:]
+
+    rows = app_module.compare_paragraphs(original, revised)
+
+    assert _kinds(rows) == [
+        ("Diubah", original[2], revised[2]),
+        ("Dihapus", original[5], ""),
+        ("Ditambah", "", revised[6]),
+    ]
+    assert rows[0]["Kata yang Direvisi"] == "analisis risiko"
+
+
+def test_moved_paragraph_is_reported_once_as_moved(app_module):
+    original = ANCHORS[:1] + [MOVED] + ANCHORS[1:]
+    revised = ANCHORS[:5] + [MOVED] + ANCHORS[5:]
+
+    rows = app_module.compare_paragraphs(original, revised)
+
+    assert _kinds(rows) == [("Dipindah", MOVED, MOVED)]
+    assert rows[0]["Kata yang Direvisi"] == ""
+
+
+def test_moved_and_edited_paragraph_lists_revised_words(app_module):
+    edited = MOVED.replace("setiap periode", "setiap bulan")
+    original = ANCHORS[:1] + [MOVED] + ANCHORS[1:]
+    revised = ANCHORS[:5] + [edited] + ANCHORS[5:]
+
+    rows = app_module.compare_paragraphs(original, revised)
+
+    assert _kinds(rows) == [("Dipindah", MOVED, edited)]
+    assert rows[0]["Kata yang Direvisi"] == "bulan."
+
+
+def test_whitespace_only_changes_are_ignored(app_module):
+    revised = [paragraph.replace(" ", "  ") for paragraph in ANCHORS]
+    assert app_module.compare_paragraphs(ANCHORS, revised) == []
@@ -0,0 +1,49 @@
+import io
+
+import docx
+from docx.enum.text import WD_COLOR_INDEX
+
+from conftest import make_docx
+
+SPLIT_TYPO = [("Hal ini terjadi dika", True, False), ("renakan", False, True), (" kelalaian petugas.", False, False)]
+ERRORS = [{
+    "Kata/Frasa Salah": "dikarenakan",
+    "Perbaikan Sesuai KBBI": "karena",
+    "Pada Kalimat": "Hal ini terjadi dikarenakan kelalaian petugas.",
+}]
+
+
+def _runs(data):
+    paragraph = docx.Document(io.BytesIO(data)).paragraphs[0]
+    return paragraph.text, [(run.text, bool(run.bold), bool(run.italic), run.font.highlight_color)
+                            for run in paragraph.runs]
+
+
+def test_revision_across_runs_keeps_surrounding_formatting(app_module):
+    text, runs = _runs(app_module.generate_revised_docx(make_docx([SPLIT_TYPO]), ERRORS))
+
+    assert text == "Hal ini terjadi karena kelalaian petugas."
+    # Perbaikan masuk ke run tempat kata salah dimulai; teks di sekitarnya tetap di run aslinya
+    assert ("Hal ini terjadi karena", True, False, None) in runs
+    assert (" kelalaian petugas.", False, False, None) in runs
+    assert all(not italic for run_text, _, italic, _ in runs if run_text)
+
+
+def test_highlight_across_runs_splits_only_the_matched_text(app_module):
+    text, runs = _runs(app_module.generate_highlighted_docx(make_docx([SPLIT_TYPO]), ERRORS))
+
+    assert text == "Hal ini terjadi dikarenakan kelalaian petugas."
+    highlighted = [run for run in runs if run[3] == WD_COLOR_INDEX.YELLOW]
+    assert "".join(run[0] for run in highlighted) == "dikarenakan"
+    # Potongan tebal/miring tetap tebal/miring setelah run dipecah
+    assert highlighted == [("dika", True, False, WD_COLOR_INDEX.YELLOW), ("renakan", False, True, WD_COLOR_INDEX.YELLOW)]
+    assert ("Hal ini terjadi ", True, False, None) in runs
+
+
+def test_revised_and_highlighted_pair_matches_separate_outputs(app_module):
+    source = make_docx([SPLIT_TYPO])
+    revised, highlighted = io.BytesIO(), io.BytesIO()
+    app_module.generate_proofread_docx_pair(source, ERRORS, revised, highlighted)
+
+    assert _runs(revised.getvalue())[0] == _runs(app_module.generate_revised_docx(source, ERRORS))[0]
+    assert _runs(highlighted.getvalue()) == _runs(app_module.generate_highlighted_docx(source, ERRORS))
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from fake_gemini import FakeRateLimitError
+
+
+class ServerError(Exception):
+    code = 500
+
+
+@pytest.fixture
+def limiter(app_module, tmp_path):
+    return app_module.GeminiLimiter(str(tmp_path / "limiter.sqlite3"), failure_threshold=3, open_seconds=0.3)
+
+
+def test_circuit_opens_after_consecutive_failures(app_module, limiter):
+    for _ in range(2):
+        assert limiter.record_failure(ServerError("500 Internal")) is None
+        limiter.acquire(1)
+
+    limiter.record_failure(ServerError("500 Internal"))
+    with pytest.raises(app_module.GeminiUnavailable) as raised:
+        limiter.acquire(1)
+    assert 0 < raised.value.retry_after <= 0.3
+    assert limiter.stats()["circuit_open"]
+
+
+def test_half_open_lets_one_probe_through(app_module, limiter):
+    for _ in range(3):
+        limiter.record_failure(ServerError("500 Internal"))
+    time.sleep(0.35)
+
+    limiter.acquire(1)
+    # Selama percobaan berjalan, pemanggil lain tetap ditolak
+    with pytest.raises(app_module.GeminiUnavailable):
+        limiter.acquire(1)
+
+    # Percobaan gagal: circuit terbuka lagi untuk satu jeda penuh
+    limiter.record_failure(ServerError("500 Internal"))
+    with pytest.raises(app_module.GeminiUnavailable):
+        limiter.acquire(1)
+    time.sleep(0.35)
+
+    # Percobaan berhasil: circuit tertutup dan semua pemanggil lolos lagi
+    limiter.acquire(1)
+    limiter.record_success()
+    for _ in range(3):
+        limiter.acquire(1)
+    assert limiter.stats()["consecutive_failures"] == 0
+
+
+def test_rate_limits_pause_callers_without_opening_the_circuit(app_module, limiter, monkeypatch):
+    monkeypatch.setattr(app_module, "GEMINI_BACKOFF_BASE_SECONDS", 0.01)
+    for _ in range(5):
+        assert limiter.record_failure(FakeRateLimitError("429 Resource has been exhausted")) > 0
+    assert not limiter.stats()["circuit_open"]
+    assert limiter.stats()["consecutive_failures"] == 0
+
+
+def test_open_circuit_stops_calls_before_they_reach_the_model(app_module, limiter, monkeypatch):
+    class FailingModel:
+        calls = 0
+
+        def generate_content(self, prompt, **kwargs):
+            FailingModel.calls += 1
+            raise ServerError("500 Internal")
+
+    monkeypatch.setattr(app_module, "gemini_limiter", limiter)
+    monkeypatch.setattr(app_module, "model", FailingModel())
+    monkeypatch.setattr(app_module, "GEMINI_MAX_RETRIES", 0)
+
+    for _ in range(3):
+        with pytest.raises(ServerError):
+            app_module._generate_content("teks")
+    with pytest.raises(app_module.GeminiUnavailable):
+        app_module._generate_content("teks")
+    assert FailingModel.calls == 3
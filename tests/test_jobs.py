@@ -0,0 +1,91 @@
+import os
+import time
+import zipfile
+
+import pytest
+
+
+@pytest.fixture
+def queue(app_module, tmp_path, monkeypatch):
+    job_queue = app_module.JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "jobs"), stale_seconds=0.3)
+    monkeypatch.setattr(app_module, "job_queue", job_queue)
+    return job_queue
+
+
+def _submit(queue, tmp_path, kind="proofread"):
+    upload = tmp_path / "unggahan.docx"
+    upload.write_bytes(b"isi")
+    return queue.submit(kind, [("laporan.docx", str(upload))])
+
+
+def test_heartbeat_keeps_a_running_job_from_being_reclaimed(queue, tmp_path):
+    job_id = _submit(queue, tmp_path)
+    assert queue.claim("w1")["id"] == job_id
+
+    time.sleep(0.2)
+    assert queue.heartbeat(job_id, "w1")
+    time.sleep(0.2)
+    assert queue.claim("w2") is None
+
+    time.sleep(0.4)
+    assert queue.claim("w2")["id"] == job_id
+    # Pemilik lama tidak lagi bisa mengubah job yang sudah diambil alih
+    assert not queue.heartbeat(job_id, "w1")
+    assert not queue.finish(job_id, "w1", ["lama"])
+    assert queue.finish(job_id, "w2", ["baru"])
+    assert queue.get(job_id)["result"] == ["baru"]
+
+
+def test_silent_long_job_is_not_run_twice(app_module, queue, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "JOB_HEARTBEAT_SECONDS", 0.05)
+    claims_during_run = []
+
+    def slow_handler(job, progress):
+        # Tidak ada update progress selama lebih lama dari stale_seconds
+        deadline = time.time() + 0.8
+        while time.time() < deadline:
+            claims_during_run.append(queue.claim("w2"))
+            time.sleep(0.1)
+        return ["selesai"]
+
+    monkeypatch.setitem(app_module.JOB_HANDLERS, "proofread", slow_handler)
+    job_id = _submit(queue, tmp_path)
+    app_module._run_job(queue.claim("w1"))
+
+    assert claims_during_run and all(claim is None for claim in claims_during_run)
+    job = queue.get(job_id)
+    assert (job["status"], job["worker"], job["result"]) == ("done", "w1", ["selesai"])
+
+
+def test_job_workers_start_without_a_new_submission(app_module, queue, tmp_path, monkeypatch):
+    started = []
+    monkeypatch.setattr(app_module, "JOB_WORKERS", 3)
+    monkeypatch.setattr(app_module, "start_job_workers", started.append)
+    job_id = _submit(queue, tmp_path)
+
+    # Request apa saja (mis. polling status setelah restart) menjalankan worker job
+    response = app_module.app.test_client().get(f"/api/jobs/{job_id}")
+    assert response.status_code == 200
+    assert started == [3]
+
+
+def test_batch_archive_is_replaced_atomically(app_module, tmp_path):
+    work_dir = tmp_path / "kerja"
+    work_dir.mkdir()
+    output_dir = tmp_path / "keluaran"
+    output_dir.mkdir()
+    output = output_dir / "hasil_batch.zip"
+    output.write_bytes(b"zip lama")
+    documents = [("a.docx", str(tmp_path / "a.docx"))]
+    summaries = {"a.docx": {"Dokumen": "a.docx", "Status": "selesai", "Jumlah Temuan": 0}}
+
+    # Berkas revisi hilang: penulisan gagal dan zip lama tetap utuh
+    rendered = {"a.docx": (str(work_dir / "tidak_ada.docx"), str(work_dir / "tidak_ada.docx"))}
+    with pytest.raises(OSError):
+        app_module._write_batch_archive(str(output), str(work_dir), documents, {}, rendered, summaries)
+    assert output.read_bytes() == b"zip lama"
+    assert os.listdir(output_dir) == ["hasil_batch.zip"]
+
+    app_module._write_batch_archive(str(output), str(work_dir), documents, {}, {}, summaries)
+    assert zipfile.ZipFile(output).namelist() == ["temuan_proofread.xlsx"]
+    assert os.listdir(output_dir) == ["hasil_batch.zip"]
@@ -0,0 +1,46 @@
+from conftest import make_docx
+
+
+def test_short_paragraphs_still_reach_the_model(app_module, fake_model):
+    source = make_docx(
+        [
+            "Hal ini terjadi dikarenakan kelalaian.",
+            "Kami melakukan analisa resiko terhadap sistim.",
+            "2024",
+        ],
+        table_rows=[["Praktek pengadaan barang.", "SKAI"]],
+    )
+    stats = {}
+    rows = app_module._proofread_document(source, "docx", stats=stats)
+
+    found = {row["Kata/Frasa Salah"] for row in rows}
+    assert {"dikarenakan", "analisa", "resiko", "sistim", "Praktek"} <= found
+    # Hanya unit tanpa kata biasa sama sekali (angka, istilah dilindungi) yang dilewati
+    assert stats["unit_tanpa_model"] == 2
+
+
+def test_needs_model_only_skips_units_without_ordinary_words(app_module):
+    rules = app_module.LocalRules({"istilah_dilindungi": ["SKAI", "IFG"], "nama_staf": ["Fajar Setianto"]})
+
+    assert rules.needs_model("Praktek pengadaan.")
+    assert not rules.needs_model("SKAI IFG 2024")
+    assert not rules.needs_model("Fajar Setianto")
+    assert not rules.needs_model("IV.")
+
+
+def test_names_and_terms_only_count_as_whole_phrases(app_module):
+    rules = app_module.LocalRules({
+        "istilah_dilindungi": ["Satuan Kerja Audit Internal", "Indonesia Financial Group (IFG)"],
+        "kata_diizinkan": ["reviu"],
+        "nama_staf": ["Hari Sundoro", "Rizky Ananda Putra"],
+    })
+
+    # Kata umum yang kebetulan bagian dari nama/istilah tetap diperiksa model
+    assert rules.needs_model("hari kerja")
+    assert rules.needs_model("Audit internal")
+    assert rules.needs_model("Putra")
+    assert rules.needs_model("Hari Sundoro hadir")
+
+    assert not rules.needs_model("Hari  Sundoro, Rizky Ananda Putra")
+    assert not rules.needs_model("Satuan Kerja Audit Internal (reviu)")
+    assert not rules.needs_model("Indonesia Financial Group (IFG) 2024")
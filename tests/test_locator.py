@@ -0,0 +1,60 @@
+import io
+
+import docx
+
+from conftest import make_docx
+
+
+def _error(salah, benar, kalimat, **extra):
+    return dict({"Kata/Frasa Salah": salah, "Perbaikan Sesuai KBBI": benar, "Pada Kalimat": kalimat}, **extra)
+
+
+def _texts(data):
+    return [paragraph.text for paragraph in docx.Document(io.BytesIO(data)).paragraphs]
+
+
+def test_only_the_located_paragraph_is_fixed(app_module):
+    source = make_docx(["Kami menilai resiko kredit setiap bulan.", "Kami menilai resiko pasar setiap kuartal."])
+
+    revised = app_module.generate_revised_docx(
+        source, [_error("resiko", "risiko", "Kami menilai resiko pasar setiap kuartal.")])
+
+    assert _texts(revised) == ["Kami menilai resiko kredit setiap bulan.", "Kami menilai risiko pasar setiap kuartal."]
+
+
+def test_only_the_located_occurrence_within_a_paragraph_is_fixed(app_module):
+    source = make_docx(["Analisa awal sudah benar. Tim lalu menulis analisa akhir."])
+
+    revised = app_module.generate_revised_docx(source, [_error("analisa", "analisis", "Tim lalu menulis analisa akhir.")])
+
+    assert _texts(revised) == ["Analisa awal sudah benar. Tim lalu menulis analisis akhir."]
+
+
+def test_repeated_boilerplate_findings_map_to_successive_paragraphs(app_module):
+    sentence = "Hal ini terjadi dikarenakan kelalaian."
+    source = make_docx([sentence, "Paragraf lain.", sentence, sentence])
+
+    # Dua temuan untuk kalimat yang sama: dua kemunculan pertama diperbaiki, yang ketiga tidak
+    revised = app_module.generate_revised_docx(source, [_error("dikarenakan", "karena", sentence)] * 2)
+
+    fixed = "Hal ini terjadi karena kelalaian."
+    assert _texts(revised) == [fixed, "Paragraf lain.", fixed, sentence]
+
+
+def test_locator_tolerates_small_differences_in_model_quotes(app_module):
+    locator = app_module.ParagraphLocator([
+        "Bagian pertama membahas tata kelola.",
+        "Audit dilakukan pada tanggal 5 Januari 2024 oleh tim SKAI.",
+    ])
+
+    found = locator.locate("Audit  dilakukan pada tanggal 5 Januari 2024 oleh tim SKAI")
+    assert found["paragraf"] == 1 and found["keyakinan"] >= 0.8
+    assert locator.locate("Kalimat yang sama sekali tidak ada di dokumen ini.") is None
+
+
+def test_unresolved_findings_fall_back_to_replacing_everywhere(app_module):
+    source = make_docx(["Sistim informasi.", "Sistim pelaporan."])
+
+    revised = app_module.generate_revised_docx(source, [_error("Sistim", "Sistem", "kalimat yang tidak ditemukan")])
+
+    assert _texts(revised) == ["Sistem informasi.", "Sistem pelaporan."]
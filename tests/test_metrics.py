@@ -0,0 +1,31 @@
+import io
+
+from conftest import make_docx
+
+
+def _stage_count(app_module, stage, endpoint):
+    label = f'proofread_stage_duration_seconds_count{{endpoint="{endpoint}",stage="{stage}"}} '
+    lines = [line for line in app_module.metrics.render().splitlines() if line.startswith(label)]
+    return int(lines[0].rsplit(" ", 1)[1]) if lines else 0
+
+
+def test_stage_histogram_is_labelled_per_endpoint_and_job_kind(app_module, fake_model, tmp_path, monkeypatch):
+    document = make_docx(["Pendahuluan laporan audit.", "Kesimpulan pemeriksaan."])
+    before = _stage_count(app_module, "model", "/api/coherence/analyze")
+
+    response = app_module.app.test_client().post(
+        "/api/coherence/analyze", data={"file": (io.BytesIO(document), "laporan.docx")},
+        content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert _stage_count(app_module, "model", "/api/coherence/analyze") == before + 1
+
+    queue = app_module.JobQueue(str(tmp_path / "jobs.sqlite3"), str(tmp_path / "jobs"))
+    monkeypatch.setattr(app_module, "job_queue", queue)
+    upload = tmp_path / "unggahan.docx"
+    upload.write_bytes(make_docx(["Analisa data keuangan."]))
+    queue.submit("proofread", [("laporan.docx", str(upload))])
+    before = _stage_count(app_module, "ekstraksi", "job:proofread")
+
+    app_module._run_job(queue.claim("w1"))
+    assert _stage_count(app_module, "ekstraksi", "job:proofread") == before + 1
+    assert _stage_count(app_module, "model", "job:proofread") >= 1
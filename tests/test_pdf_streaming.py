@@ -0,0 +1,56 @@
+import json
+import threading
+
+import pytest
+
+PAGES = [f"Halaman {number}: analisa data keuangan sudah selesai diperiksa oleh tim." for number in range(1, 7)]
+
+
+@pytest.fixture
+def slow_pdf(app_module, fake_model, tmp_path, monkeypatch):
+    """PDF palsu: halaman terakhir baru diekstrak setelah model menerima panggilan pertama."""
+    model_called = threading.Event()
+    extraction = {"model_sebelum_halaman_terakhir": False}
+    generate_content = fake_model.generate_content
+
+    def recording_generate(prompt, **kwargs):
+        model_called.set()
+        return generate_content(prompt, **kwargs)
+
+    def pages(source, layout=False):
+        for number, text in enumerate(PAGES, start=1):
+            if number == len(PAGES):
+                extraction["model_sebelum_halaman_terakhir"] = model_called.wait(5)
+            yield {"halaman": number, "teks": text}
+
+    monkeypatch.setattr(fake_model, "generate_content", recording_generate)
+    monkeypatch.setattr(app_module, "iter_pdf_pages", pages)
+    monkeypatch.setattr(app_module, "_pdf_page_count", lambda source: len(PAGES))
+    monkeypatch.setattr(app_module, "PROOFREAD_BATCH_TOKENS", 40)
+    path = tmp_path / "laporan.pdf"
+    path.write_bytes(b"%PDF palsu")
+    return str(path), extraction
+
+
+def test_first_pdf_pages_reach_the_model_while_extraction_continues(app_module, slow_pdf):
+    source, extraction = slow_pdf
+
+    events = list(app_module._stream_proofread_events(source, "pdf"))
+
+    assert extraction["model_sebelum_halaman_terakhir"]
+    pages = [json.loads(event.split("data: ", 1)[1]) for event in events if event.startswith("event: page")]
+    assert sorted(page["halaman"] for page in pages) == list(range(1, 7))
+    assert all(page["total"] == 6 and len(page["kesalahan"]) == 1 for page in pages)
+
+
+def test_proofread_document_keeps_page_order_for_streamed_pdf(app_module, slow_pdf):
+    source, extraction = slow_pdf
+    progress = []
+    stats = {}
+
+    rows = app_module._proofread_document(source, "pdf", lambda done, total: progress.append((done, total)), stats)
+
+    assert extraction["model_sebelum_halaman_terakhir"]
+    assert [row["Ditemukan di Halaman"] for row in rows] == list(range(1, 7))
+    assert progress[-1] == (6, 6)
+    assert stats["unit_total"] == 6 and stats["panggilan_model"] == 3
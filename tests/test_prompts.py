@@ -0,0 +1,23 @@
+def test_proofread_templates_share_one_rules_block(app_module):
+    with open(app_module.os.path.join(app_module.PROMPTS_DIR, "proofread_rules.txt"), encoding="utf-8") as f:
+        rules = f.read().strip()
+
+    for name in ("proofread", "proofread_batch"):
+        system = app_module.prompts[name].system
+        assert system.startswith(rules)
+        assert "@sertakan" not in system
+
+
+def test_editing_shared_rules_changes_both_versions(app_module, tmp_path):
+    (tmp_path / "aturan.txt").write_text("Aturan A", encoding="utf-8")
+    for name in ("satu", "dua"):
+        (tmp_path / f"{name}.txt").write_text(f"@sertakan aturan.txt\n\nFormat {name}\n--- PESAN ---\n{{teks}}\n",
+                                              encoding="utf-8")
+    specs = {"satu": {"parse": str}, "dua": {"parse": str}}
+    before = app_module.PromptRegistry.load(str(tmp_path), specs)
+    assert before["satu"].system == "Aturan A\n\nFormat satu"
+
+    (tmp_path / "aturan.txt").write_text("Aturan B", encoding="utf-8")
+    after = app_module.PromptRegistry.load(str(tmp_path), specs)
+    assert before["satu"].version != after["satu"].version
+    assert before["dua"].version != after["dua"].version
@@ -0,0 +1,30 @@
+def _units(*texts):
+    return [{"teks": text, "halaman": page} for page, text in enumerate(texts, start=1)]
+
+
+def test_invalid_batch_response_is_split_and_retried(app_module, fake_model):
+    fake_model.response_format = "salah"
+    units = _units("Analisa data selesai.", "Resiko sudah dinilai.", "Praktek baik diteruskan.")
+
+    findings = app_module._proofread_batch([0, 1, 2], units)
+
+    assert [finding["benar"] for index in range(3) for finding in findings[index]] == ["analisis", "risiko", "praktik"]
+    # 3 unit -> [1] + [2] -> [1] + [1]: 5 panggilan batch, lalu 3 fallback per unit
+    assert fake_model.calls == 8
+
+
+def test_configuration_error_fails_the_batch_without_splitting(app_module, monkeypatch):
+    calls = []
+
+    def missing_key(prompt, **kwargs):
+        calls.append(prompt)
+        raise ValueError("GOOGLE_API_KEY tidak ditemukan di file .env")
+
+    monkeypatch.setattr(app_module, "_generate_content", missing_key)
+    units = _units("Analisa data selesai.", "Resiko sudah dinilai.", "Praktek baik diteruskan.")
+
+    results = app_module._proofread_batch([0, 1, 2], units)
+
+    assert len(calls) == 1
+    assert all(isinstance(results[index], ValueError) for index in range(3))
+    assert not any(isinstance(results[index], app_module.InvalidModelResponse) for index in range(3))
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("filename", ["laporan.exe", "laporan", "../../etc/passwd", "laporan.docx/../x", ".docx",
+                                      "arsip.zip", "a." + "x" * 300])
+def test_unsupported_extensions_are_rejected_before_spooling(client, app_module, monkeypatch, filename):
+    spooled = []
+    monkeypatch.setattr(app_module.tempfile, "mkstemp", lambda *args, **kwargs: spooled.append(kwargs))
+
+    response = client.post("/api/proofread/analyze", data={"file": (io.BytesIO(b"isi"), filename)},
+                           content_type="multipart/form-data")
+
+    assert response.status_code == 400
+    assert "Format file tidak didukung" in response.get_json()["error"]
+    assert spooled == []
+
+
+def test_upload_extension_is_whitelisted(app_module):
+    assert app_module._upload_extension("Laporan.Final.DOCX", app_module.UPLOAD_EXTENSIONS) == "docx"
+    assert app_module._upload_extension("laporan.pdf/../../x", app_module.UPLOAD_EXTENSIONS) is None
+    assert app_module._upload_extension("arsip.zip", app_module.UPLOAD_EXTENSIONS) is None
+
+
+def test_batch_uploads_have_their_own_size_limit(client, app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "MAX_UPLOAD_MB", 1)
+    monkeypatch.setattr(app_module, "MAX_BATCH_UPLOAD_MB", 4)
+    payload = b"0" * (2 * 1024 * 1024)
+
+    response = client.post("/api/proofread/analyze", data={"file": (io.BytesIO(payload), "laporan.docx")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 413
+    assert "1 MB" in response.get_json()["error"]
+
+    monkeypatch.setattr(app_module, "job_queue", app_module.JobQueue(
+        str(tmp_path / "jobs.sqlite3"), str(tmp_path / "jobs"), app_module.JOB_STALE_SECONDS,
+        app_module.JOB_RETENTION_SECONDS))
+    response = client.post("/api/jobs/batch", data={"file": (io.BytesIO(payload), "dokumen.zip")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 202
+
+    response = client.post("/api/jobs/batch", data={"file": (io.BytesIO(b"isi"), "laporan.docx")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+
+
+def _chunked_upload(client, path, filename, size):
+    """POST multipart tanpa Content-Length, seperti unggahan chunked di belakang gunicorn."""
+    from werkzeug.test import EnvironBuilder
+
+    environ = EnvironBuilder(path=path, method="POST",
+                             data={"file": (io.BytesIO(b"0" * size), filename)}).get_environ()
+    del environ["CONTENT_LENGTH"]
+    environ["wsgi.input_terminated"] = True
+    return client.open(environ)
+
+
+def test_chunked_upload_without_content_length_uses_the_endpoint_limit(client, app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "MAX_UPLOAD_MB", 1)
+    monkeypatch.setattr(app_module, "MAX_BATCH_UPLOAD_MB", 4)
+    monkeypatch.setattr(app_module, "job_queue", app_module.JobQueue(
+        str(tmp_path / "jobs.sqlite3"), str(tmp_path / "jobs")))
+
+    response = _chunked_upload(client, "/api/proofread/analyze", "laporan.docx", 2 * 1024 * 1024)
+    assert response.status_code == 413
+    assert "1 MB" in response.get_json()["error"]
+
+    assert _chunked_upload(client, "/api/jobs/batch", "dokumen.zip", 2 * 1024 * 1024).status_code == 202
+    assert _chunked_upload(client, "/api/jobs/batch", "dokumen.zip", 5 * 1024 * 1024).status_code == 413